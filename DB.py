@@ -1,173 +1,550 @@
-import pandas as pd
-import numpy as np
-
-def generate_full_database():
-    print("🚀 Генерация базы данных Цифрового Двойника (Scientific_Data_Extended.csv)...")
-    
-    # Настройки времени: 50 точек от 0 до 10 часов
-    n_points = 50
-    time = np.linspace(0, 10, n_points) 
-
-    # ==========================================
-    # 1. МОДЕЛЬ АЙРАНА (Ферментация)
-    # ==========================================
-    # Старт pH: 5.98 (по вашему протоколу)
-    # Финиш (10ч): ~4.33 (Контроль), ~4.21 (Опыт 2)
-    
-    ayran_data = []
-    
-    # Сценарии
-    scenarios_ayran = [
-        # Название              Тип      Доза%   Цель pH(10ч)  k (Скорость)
-        ('Контроль',           'dry',   0.0,    4.33,         0.688), 
-        ('Опыт 1 (Сухая 1%)',  'dry',   1.0,    4.35,         0.680),
-        ('Опыт 1 (Сухая 2%)',  'dry',   2.0,    4.37,         0.671),
-        ('Опыт 1 (Сухая 3%)',  'dry',   3.0,    4.40,         0.659), # Буфер (медленнее)
-        ('Опыт 2 (Сироп 1%)',  'wet',   1.0,    4.30,         0.700),
-        ('Опыт 2 (Сироп 2%)',  'wet',   2.0,    4.27,         0.713),
-        ('Опыт 2 (Сироп 3%)',  'wet',   3.0,    4.24,         0.725),
-        ('Опыт 2 (Сироп 4%)',  'wet',   4.0,    4.21,         0.738)  # Сахар (быстрее)
-    ]
-
-    for name, type_, dose, target_ph, k in scenarios_ayran:
-        # Формула: pH = 5.98 - k * ln(t + 1)
-        ph_curve = 5.98 - k * np.log(time + 1)
-        
-        for t, p in zip(time, ph_curve):
-            # Расчет сухих веществ с учетом добавки
-            # Молоко ~12% с.в. Добавка сухая (92% с.в.), Сироп (60% с.в.)
-            base_dm = 12.0
-            added_dm = (dose * 0.92) if type_ == 'dry' else (dose * 0.60)
-            
-            ayran_data.append({
-                'productname': 'Айран',
-                'process_stage': 'Ферментация',
-                'duration_hours': t,
-                'ph': p,
-                'temperature_c': 42.0, # Термостат
-                'experiment_type': name,
-                'additive_dose_pct': dose,
-                'влага': 100 - (base_dm + added_dm), 
-                'сухие_вещества': base_dm + added_dm
-            })
-
-    # ==========================================
-    # 2. МОДЕЛЬ САРЫ ІРІМШІК (Варка)
-    # ==========================================
-    # Процесс: Уваривание. Влага падает, pH меняется слабо (концентрация).
-    
-    irimshik_data = []
-    scenarios_irim = [
-        ('Контроль', 0.0),
-        ('Опыт (4%)', 4.0),
-        ('Опыт (5%)', 5.0)
-    ]
-    
-    for name, dose in scenarios_irim:
-        # Влага: Контроль старт 75%, Опыт (с сухой добавкой) - меньше.
-        w_start = 75.0 - (dose * 0.8)
-        w_final = 18.0
-        # Скорость сушки (k) растет с добавкой (рыхлая структура)
-        k_speed = 0.3 + (0.02 * dose) 
-        
-        # Экспоненциальная модель сушки
-        moisture_curve = w_final + (w_start - w_final) * np.exp(-k_speed * time)
-        
-        # pH: Старт 5.98 -> Финиш ~5.50 (из-за уваривания кислот)
-        ph_curve = 5.98 - (0.48 * (time / 10.0))
-        
-        for t, m, p in zip(time, moisture_curve, ph_curve):
-            irimshik_data.append({
-                'productname': 'Сары ірімшік',
-                'process_stage': 'Варка',
-                'duration_hours': t,
-                'ph': p,
-                'temperature_c': 96.0, # Кипение
-                'experiment_type': name,
-                'additive_dose_pct': dose,
-                'влага': m,
-                'сухие_вещества': 100.0 - m
-            })
-
-    # ==========================================
-    # 3. РАСЧЕТ 14 ПЕРЕМЕННЫХ (ФИЗИКА + ХИМИЯ)
-    # ==========================================
-    df = pd.DataFrame(ayran_data + irimshik_data)
-    
-    # --- 3.1 Химический состав (БЖУ) ---
-    # База: Молоко (Жир 3.2, Белок 3.0, Углев 4.7)
-    # Добавка 1 (Сухая): Жир 3.0, Белок 12.0, Углев 65.0 (из вашего фото)
-    
-    dose_frac = df['additive_dose_pct'] / 100.0
-    
-    # Если это Айран с сухой добавкой (Опыт 1)
-    is_dry_exp = df['experiment_type'].str.contains('Сухая') | df['experiment_type'].str.contains('Опыт \(')
-    
-    # Жир (смешение)
-    df['fat_pct'] = np.where(is_dry_exp, 
-                             3.2 * (1 - dose_frac) + 3.0 * dose_frac, 
-                             3.2) # Для сиропа жир почти 0, пренебрегаем
-    
-    # Белок (существенный рост от добавки!)
-    df['protein_pct'] = np.where(is_dry_exp, 
-                                 3.0 * (1 - dose_frac) + 12.0 * dose_frac, 
-                                 3.0)
-    
-    # Углеводы (расчетно для плотности)
-    carbs = np.where(is_dry_exp, 
-                     4.7 * (1 - dose_frac) + 65.0 * dose_frac, 
-                     4.7 + (df['additive_dose_pct'] * 0.6)) # В сиропе сахара
-                     
-    # --- 3.2 Физические свойства ---
-    
-    # Плотность (кг/м3) = 1000 + (Жир*1.2 + СОМО*3.8)
-    somo = df['protein_pct'] + carbs + 0.7 # Минералы
-    df['density_kg_m3'] = 1000 + (df['fat_pct'] * 1.2 + somo * 3.8)
-    
-    # Кислотность (°T) - обратна pH
-    # Айран: 5.98 -> 20°T, 4.2 -> 90°T
-    df['кислотность'] = np.where(df['productname']=='Айран', 
-                                 20 + (5.98 - df['ph']) * 40, 
-                                 20 + (5.98 - df['ph']) * 10) # Иримшик киснет слабее
-    
-    # OrP (Окислительно-восстановительный потенциал, мВ)
-    # Зависит от pH (Нернст) и жизнедеятельности бактерий
-    df['orp_mv'] = 200 - (df['ph'] * 30) + np.random.normal(0, 2, len(df))
-    
-    # Вязкость (mPa*s)
-    # Айран: Растет экспоненциально при pH < 4.6 (сгусток) + вклад загустителя (углеводы)
-    visc_base = 1.5 + 500 * np.exp(-1.5 * (df['ph'] - 3.8))
-    visc_add = df['additive_dose_pct'] * 50 # Влияние крахмала/углеводов добавки
-    
-    # Иримшик: Растет при выкипании воды
-    visc_irim = 100 * np.exp(0.05 * (100 - df['влага']))
-    
-    df['viscosity_mpa_s'] = np.where(df['productname']=='Айран', 
-                                     visc_base + visc_add, 
-                                     visc_irim)
-    
-    # Активность воды (aw)
-    df['water_activity'] = df['влага'] / 100 * 0.99
-    
-    # Микробиология (КМАФАнМ)
-    # Айран: Рост бактерий. Иримшик: Гибель при варке.
-    df['kmafanm'] = np.where(df['productname']=='Айран',
-                             10000 * np.exp(df['duration_hours']), # Рост
-                             10000 * np.exp(-df['duration_hours'])) # Гибель
-                             
-    df['lactic_bacteria'] = 10**7 # Стартовая закваска
-    
-    # Технологические параметры
-    df['pressure_mpa'] = 0.1 # Атмосферное (в танке)
-    df['humidity_pct'] = 80.0
-
-    # Сохранение
-    filename = "Scientific_Data_Extended.csv"
-    df.to_csv(filename, index=False)
-    print(f"✅ Готово! Файл '{filename}' успешно создан.")
-    print(f"   - Строк: {len(df)}")
-    print(f"   - Продукты: {df['productname'].unique()}")
-    print(f"   - Сценарии: {df['experiment_type'].unique()}")
-
-if __name__ == "__main__":
-    generate_full_database()
\ No newline at end of file
+import json
+import os
+import time as time_mod
+import pandas as pd
+import numpy as np
+
+# ==========================================
+# СЦЕНАРИИ ЭКСПЕРИМЕНТОВ
+# ==========================================
+# Старт pH: 5.98 (по вашему протоколу)
+# Финиш (10ч): ~4.33 (Контроль), ~4.21 (Опыт 2)
+SCENARIOS_AYRAN = [
+    # Название              Тип      Доза%   Цель pH(10ч)  k (Скорость)
+    ('Контроль',           'dry',   0.0,    4.33,         0.688),
+    ('Опыт 1 (Сухая 1%)',  'dry',   1.0,    4.35,         0.680),
+    ('Опыт 1 (Сухая 2%)',  'dry',   2.0,    4.37,         0.671),
+    ('Опыт 1 (Сухая 3%)',  'dry',   3.0,    4.40,         0.659), # Буфер (медленнее)
+    ('Опыт 2 (Сироп 1%)',  'wet',   1.0,    4.30,         0.700),
+    ('Опыт 2 (Сироп 2%)',  'wet',   2.0,    4.27,         0.713),
+    ('Опыт 2 (Сироп 3%)',  'wet',   3.0,    4.24,         0.725),
+    ('Опыт 2 (Сироп 4%)',  'wet',   4.0,    4.21,         0.738)  # Сахар (быстрее)
+]
+
+SCENARIOS_IRIM = [
+    ('Контроль', 0.0),
+    ('Опыт (4%)', 4.0),
+    ('Опыт (5%)', 5.0)
+]
+
+# Порядок колонок базовой таблицы (как в исходном генераторе)
+BASE_COLUMNS = ['productname', 'process_stage', 'duration_hours', 'ph', 'temperature_c',
+                'experiment_type', 'additive_dose_pct', 'влага', 'сухие_вещества']
+
+# Теги бинарного хранилища траекторий (float32, порядок колонок в .npy)
+SERIES_TAGS = ['duration_hours', 'ph', 'temperature_c', 'влага', 'сухие_вещества', 'fat_pct',
+               'protein_pct', 'density_kg_m3', 'кислотность', 'orp_mv', 'viscosity_mpa_s',
+               'water_activity', 'kmafanm', 'pressure_mpa']
+
+
+def _is_dry_experiment(names):
+    """Признак сухой добавки по названию сценария (Опыт 1 Айрана и все опыты Иримшика)"""
+    names = pd.Series(names)
+    return (names.str.contains('Сухая') | names.str.contains(r'Опыт \(')).to_numpy()
+
+
+def _build_base_loop(time):
+    """Эталонная сборка: по одной строке-словарю на точку (исходный алгоритм)"""
+    # ==========================================
+    # 1. МОДЕЛЬ АЙРАНА (Ферментация)
+    # ==========================================
+    ayran_data = []
+
+    for name, type_, dose, target_ph, k in SCENARIOS_AYRAN:
+        # Формула: pH = 5.98 - k * ln(t + 1)
+        ph_curve = 5.98 - k * np.log(time + 1)
+
+        for t, p in zip(time, ph_curve):
+            # Расчет сухих веществ с учетом добавки
+            # Молоко ~12% с.в. Добавка сухая (92% с.в.), Сироп (60% с.в.)
+            base_dm = 12.0
+            added_dm = (dose * 0.92) if type_ == 'dry' else (dose * 0.60)
+
+            ayran_data.append({
+                'productname': 'Айран',
+                'process_stage': 'Ферментация',
+                'duration_hours': t,
+                'ph': p,
+                'temperature_c': 42.0, # Термостат
+                'experiment_type': name,
+                'additive_dose_pct': dose,
+                'влага': 100 - (base_dm + added_dm),
+                'сухие_вещества': base_dm + added_dm
+            })
+
+    # ==========================================
+    # 2. МОДЕЛЬ САРЫ ІРІМШІК (Варка)
+    # ==========================================
+    # Процесс: Уваривание. Влага падает, pH меняется слабо (концентрация).
+    irimshik_data = []
+
+    for name, dose in SCENARIOS_IRIM:
+        # Влага: Контроль старт 75%, Опыт (с сухой добавкой) - меньше.
+        w_start = 75.0 - (dose * 0.8)
+        w_final = 18.0
+        # Скорость сушки (k) растет с добавкой (рыхлая структура)
+        k_speed = 0.3 + (0.02 * dose)
+
+        # Экспоненциальная модель сушки
+        moisture_curve = w_final + (w_start - w_final) * np.exp(-k_speed * time)
+
+        # pH: Старт 5.98 -> Финиш ~5.50 (из-за уваривания кислот)
+        ph_curve = 5.98 - (0.48 * (time / 10.0))
+
+        for t, m, p in zip(time, moisture_curve, ph_curve):
+            irimshik_data.append({
+                'productname': 'Сары ірімшік',
+                'process_stage': 'Варка',
+                'duration_hours': t,
+                'ph': p,
+                'temperature_c': 96.0, # Кипение
+                'experiment_type': name,
+                'additive_dose_pct': dose,
+                'влага': m,
+                'сухие_вещества': 100.0 - m
+            })
+
+    df = pd.DataFrame(ayran_data + irimshik_data)
+    is_dry_exp = _is_dry_experiment(df['experiment_type'])
+    is_ayran = (df['productname'] == 'Айран').to_numpy()
+    return df, is_dry_exp, is_ayran
+
+
+def _build_base_vectorized(time):
+    """Векторная сборка: все сценарии × вся сетка времени одним broadcast-расчетом"""
+    n_t = len(time)
+    n_a = len(SCENARIOS_AYRAN)
+    n_i = len(SCENARIOS_IRIM)
+    n_rows_a = n_a * n_t
+    n_rows = n_rows_a + n_i * n_t
+
+    # Параметры сценариев -> столбцы (сценарий, 1) для broadcast по времени
+    dose_a = np.array([s[2] for s in SCENARIOS_AYRAN])
+    k_a = np.array([s[4] for s in SCENARIOS_AYRAN])
+    dry_a = np.array([s[1] == 'dry' for s in SCENARIOS_AYRAN])
+    dose_i = np.array([s[1] for s in SCENARIOS_IRIM])
+
+    # Предвыделенные колонки; блоки Айрана/Иримшика заполняются через reshape-виды
+    duration = np.empty(n_rows)
+    ph = np.empty(n_rows)
+    temperature = np.empty(n_rows)
+    dose = np.empty(n_rows)
+    moisture = np.empty(n_rows)
+    dry_matter = np.empty(n_rows)
+
+    def block(arr, start, n_sc):
+        return arr[start:start + n_sc * n_t].reshape(n_sc, n_t)
+
+    # --- 1. Айран: pH = 5.98 - k * ln(t + 1) ---
+    block(duration, 0, n_a)[:] = time
+    block(ph, 0, n_a)[:] = 5.98 - k_a[:, None] * np.log(time + 1)
+    block(temperature, 0, n_a)[:] = 42.0 # Термостат
+    block(dose, 0, n_a)[:] = dose_a[:, None]
+    # Молоко ~12% с.в. Добавка сухая (92% с.в.), Сироп (60% с.в.)
+    dm_a = 12.0 + np.where(dry_a, dose_a * 0.92, dose_a * 0.60)
+    block(dry_matter, 0, n_a)[:] = dm_a[:, None]
+    block(moisture, 0, n_a)[:] = (100 - dm_a)[:, None]
+
+    # --- 2. Сары ірімшік: экспоненциальная сушка ---
+    w_start = 75.0 - (dose_i * 0.8)
+    w_final = 18.0
+    k_speed = 0.3 + (0.02 * dose_i)
+    m_i = block(moisture, n_rows_a, n_i)
+    m_i[:] = w_final + (w_start - w_final)[:, None] * np.exp(-k_speed[:, None] * time)
+    block(dry_matter, n_rows_a, n_i)[:] = 100.0 - m_i
+    block(duration, n_rows_a, n_i)[:] = time
+    block(ph, n_rows_a, n_i)[:] = 5.98 - (0.48 * (time / 10.0))
+    block(temperature, n_rows_a, n_i)[:] = 96.0 # Кипение
+    block(dose, n_rows_a, n_i)[:] = dose_i[:, None]
+
+    # Текстовые колонки: категории из кодов, без построчных объектов
+    product_codes = np.repeat(np.array([0, 1], dtype=np.int8), [n_rows_a, n_rows - n_rows_a])
+    scenario_names = [s[0] for s in SCENARIOS_AYRAN] + [s[0] for s in SCENARIOS_IRIM]
+    exp_categories = list(dict.fromkeys(scenario_names))
+    scenario_codes = np.array([exp_categories.index(n) for n in scenario_names], dtype=np.int16)
+
+    df = pd.DataFrame({
+        'productname': pd.Categorical.from_codes(product_codes, ['Айран', 'Сары ірімшік']),
+        'process_stage': pd.Categorical.from_codes(product_codes, ['Ферментация', 'Варка']),
+        'duration_hours': duration,
+        'ph': ph,
+        'temperature_c': temperature,
+        'experiment_type': pd.Categorical.from_codes(np.repeat(scenario_codes, n_t), exp_categories),
+        'additive_dose_pct': dose,
+        'влага': moisture,
+        'сухие_вещества': dry_matter,
+    }, columns=BASE_COLUMNS)
+
+    # Флаги считаются по сценариям (11 строк) и размножаются по времени
+    is_dry_exp = np.repeat(_is_dry_experiment(scenario_names), n_t)
+    is_ayran = product_codes == 0
+    return df, is_dry_exp, is_ayran
+
+
+def _add_state_variables(df, is_dry_exp, is_ayran):
+    """Расчет 14 переменных (физика + химия) поверх базовой таблицы"""
+    # --- 3.1 Химический состав (БЖУ) ---
+    # База: Молоко (Жир 3.2, Белок 3.0, Углев 4.7)
+    # Добавка 1 (Сухая): Жир 3.0, Белок 12.0, Углев 65.0 (из вашего фото)
+
+    dose_frac = df['additive_dose_pct'] / 100.0
+
+    # Жир (смешение)
+    df['fat_pct'] = np.where(is_dry_exp,
+                             3.2 * (1 - dose_frac) + 3.0 * dose_frac,
+                             3.2) # Для сиропа жир почти 0, пренебрегаем
+
+    # Белок (существенный рост от добавки!)
+    df['protein_pct'] = np.where(is_dry_exp,
+                                 3.0 * (1 - dose_frac) + 12.0 * dose_frac,
+                                 3.0)
+
+    # Углеводы (расчетно для плотности)
+    carbs = np.where(is_dry_exp,
+                     4.7 * (1 - dose_frac) + 65.0 * dose_frac,
+                     4.7 + (df['additive_dose_pct'] * 0.6)) # В сиропе сахара
+
+    # --- 3.2 Физические свойства ---
+
+    # Плотность (кг/м3) = 1000 + (Жир*1.2 + СОМО*3.8)
+    somo = df['protein_pct'] + carbs + 0.7 # Минералы
+    df['density_kg_m3'] = 1000 + (df['fat_pct'] * 1.2 + somo * 3.8)
+
+    # Кислотность (°T) - обратна pH
+    # Айран: 5.98 -> 20°T, 4.2 -> 90°T
+    df['кислотность'] = np.where(is_ayran,
+                                 20 + (5.98 - df['ph']) * 40,
+                                 20 + (5.98 - df['ph']) * 10) # Иримшик киснет слабее
+
+    # OrP (Окислительно-восстановительный потенциал, мВ)
+    # Зависит от pH (Нернст) и жизнедеятельности бактерий
+    df['orp_mv'] = 200 - (df['ph'] * 30) + np.random.normal(0, 2, len(df))
+
+    # Вязкость (mPa*s)
+    # Айран: Растет экспоненциально при pH < 4.6 (сгусток) + вклад загустителя (углеводы)
+    visc_base = 1.5 + 500 * np.exp(-1.5 * (df['ph'] - 3.8))
+    visc_add = df['additive_dose_pct'] * 50 # Влияние крахмала/углеводов добавки
+
+    # Иримшик: Растет при выкипании воды
+    visc_irim = 100 * np.exp(0.05 * (100 - df['влага']))
+
+    df['viscosity_mpa_s'] = np.where(is_ayran,
+                                     visc_base + visc_add,
+                                     visc_irim)
+
+    # Активность воды (aw)
+    df['water_activity'] = df['влага'] / 100 * 0.99
+
+    # Микробиология (КМАФАнМ)
+    # Айран: Рост бактерий. Иримшик: Гибель при варке.
+    df['kmafanm'] = np.where(is_ayran,
+                             10000 * np.exp(df['duration_hours']), # Рост
+                             10000 * np.exp(-df['duration_hours'])) # Гибель
+
+    df['lactic_bacteria'] = 10**7 # Стартовая закваска
+
+    # Технологические параметры
+    df['pressure_mpa'] = 0.1 # Атмосферное (в танке)
+    df['humidity_pct'] = 80.0
+    return df
+
+
+def build_dataframe(n_points=50, t_max=10.0, mode="vectorized"):
+    """Полная таблица 14 переменных в памяти.
+
+    mode='vectorized' — broadcast-расчет (сценарий × время) в предвыделенные колонки;
+    mode='loop' — исходная построчная сборка (эталон для сверки);
+    mode='kinetic' — pH и численность бактерий из кинетики закваски (kinetics.py, RK4).
+    """
+    # Настройки времени: n_points точек от 0 до t_max часов
+    time = np.linspace(0, t_max, n_points)
+
+    kin = None
+    if mode == "vectorized":
+        df, is_dry_exp, is_ayran = _build_base_vectorized(time)
+    elif mode == "loop":
+        df, is_dry_exp, is_ayran = _build_base_loop(time)
+    elif mode == "kinetic":
+        df, is_dry_exp, is_ayran = _build_base_vectorized(time)
+        kin = _kinetic_ph(df, time)
+    else:
+        raise ValueError(f"Неизвестный режим генерации: {mode}")
+
+    # ==========================================
+    # 3. РАСЧЕТ 14 ПЕРЕМЕННЫХ (ФИЗИКА + ХИМИЯ)
+    # ==========================================
+    df = _add_state_variables(df, is_dry_exp, is_ayran)
+    if kin is not None:
+        _kinetic_counts(df, kin, is_ayran)
+    return df
+
+
+def _kinetic_ph(df, time):
+    """pH базовой таблицы (сценарий × время) из кинетики; кривые нужны и для _kinetic_counts"""
+    import kinetics
+
+    kin = kinetics.scenario_curves(time)
+    df['ph'] = kin['ph'].ravel()
+    return kin
+
+
+def _kinetic_counts(df, kin, is_ayran):
+    """Численность X из кинетики: закваска Айрана -> lactic_bacteria,
+    гибель КМАФАнМ при варке Иримшика -> kmafanm (остальное - формулы DB.py).
+
+    КМАФАнМ Айрана растет вместе с закваской в той же среде: 10000·X/X0 вместо
+    неограниченного 10000·exp(t) - та же логистика и торможение кислотой, предел
+    10000·XMAX/X0 = 1e6 КОЕ/мл.
+    """
+    import kinetics
+
+    x = np.tile(kin['x'].ravel(), len(df) // kin['x'].size)
+    df['lactic_bacteria'] = np.where(is_ayran, x, df['lactic_bacteria'])
+    df['kmafanm'] = np.where(is_ayran, kinetics.X0_IRIM * x / kinetics.X0, x)
+
+
+def _time_grid(horizon, step):
+    """Число точек и фактический шаг равномерной сетки 0..horizon (как np.linspace)"""
+    n_points = int(round(horizon / step)) + 1
+    return n_points, (horizon / (n_points - 1) if n_points > 1 else 0.0)
+
+
+def iter_chunks(n_batches=1, horizon=10.0, step=10.0 / 49, chunk_rows=1_000_000, mode="vectorized"):
+    """Поток DataFrame-чанков (не больше chunk_rows строк) для флота партий.
+
+    Порядок строк: партия -> отрезок времени -> сценарий -> время.
+    Сетка времени не материализуется целиком: каждый отрезок считается по индексам.
+    mode - 'vectorized' (формулы) или 'kinetic' (pH и бактерии из kinetics.py).
+    """
+    if mode not in ("vectorized", "kinetic"):
+        raise ValueError(f"Потоковый режим поддерживает vectorized/kinetic, а не {mode}")
+    n_points, dt = _time_grid(horizon, step)
+    n_scen = len(SCENARIOS_AYRAN) + len(SCENARIOS_IRIM)
+
+    # Отрезок времени, при котором одна партия укладывается в чанк
+    t_span = max(1, min(n_points, chunk_rows // n_scen))
+    t_slices = [(i0, min(i0 + t_span, n_points)) for i0 in range(0, n_points, t_span)]
+    # Если партия целиком в одном отрезке - несколько партий в чанке
+    batches_per_chunk = max(1, chunk_rows // (n_scen * n_points)) if len(t_slices) == 1 else 1
+
+    base_cache = {}
+    for b0 in range(0, n_batches, batches_per_chunk):
+        nb = min(batches_per_chunk, n_batches - b0)
+        for i0, i1 in t_slices:
+            if (i0, i1) not in base_cache:
+                time = np.arange(i0, i1) * dt
+                if i1 == n_points:
+                    time[-1] = horizon
+                # Кэшируем базу только когда отрезок один (иначе память растет)
+                base = _build_base_vectorized(time)
+                if mode == "kinetic":
+                    base += (_kinetic_ph(base[0], time),)
+                if len(t_slices) == 1:
+                    base_cache[(i0, i1)] = base
+            else:
+                base = base_cache[(i0, i1)]
+            df, is_dry_exp, is_ayran = base[:3]
+            kin = base[3] if mode == "kinetic" else None
+
+            if nb > 1:
+                df = df.iloc[np.tile(np.arange(len(df)), nb)].reset_index(drop=True)
+                is_dry_exp = np.tile(is_dry_exp, nb)
+                is_ayran = np.tile(is_ayran, nb)
+            else:
+                df = df.copy()
+            df.insert(df.columns.get_loc('experiment_type') + 1, 'batch_id',
+                      np.repeat(np.arange(b0, b0 + nb, dtype=np.int64), len(df) // nb))
+            df = _add_state_variables(df, is_dry_exp, is_ayran)
+            if kin is not None:
+                _kinetic_counts(df, kin, is_ayran)
+            yield df
+
+
+def write_parquet(df, filename):
+    """Колоночная копия таблицы: категории -> dictionary-колонки, float -> float64"""
+    df.to_parquet(filename, index=False, compression="zstd")
+
+
+def _scenario_keys():
+    """(продукт, этап, опыт) в порядке генератора - порядок блоков в хранилище"""
+    return ([('Айран', 'Ферментация', s[0]) for s in SCENARIOS_AYRAN] +
+            [('Сары ірімшік', 'Варка', s[0]) for s in SCENARIOS_IRIM])
+
+
+def open_series_store(prefix, n_batches, n_points):
+    """Предвыделенный memmap под все траектории: строки = точки, колонки = SERIES_TAGS"""
+    n_rows = len(_scenario_keys()) * n_batches * n_points
+    return np.lib.format.open_memmap(prefix + ".npy", mode="w+", dtype=np.float32,
+                                     shape=(n_rows, len(SERIES_TAGS)))
+
+
+def scatter_series(store, chunk, n_batches, n_points, dt):
+    """Раскладка чанка по адресам: блок (сценарий, партия) непрерывен и отсортирован по времени"""
+    lut = {(p, e): i for i, (p, _, e) in enumerate(_scenario_keys())}
+    prod = chunk['productname'].astype('category')
+    exp = chunk['experiment_type'].astype('category')
+    # Таблица (код продукта, код опыта) -> номер сценария: без построчных строк
+    table = np.array([[lut.get((p, e), -1) for e in exp.cat.categories] for p in prod.cat.categories],
+                     dtype=np.int64)
+    scen = table[prod.cat.codes.to_numpy(), exp.cat.codes.to_numpy()]
+    if (scen < 0).any():
+        raise ValueError("В чанке есть сценарий, которого нет в SCENARIOS_AYRAN/SCENARIOS_IRIM")
+    t_idx = np.rint(chunk['duration_hours'].to_numpy() / dt).astype(np.int64) if dt else 0
+    pos = (scen * n_batches + chunk['batch_id'].to_numpy()) * n_points + t_idx
+    store[pos] = chunk[SERIES_TAGS].to_numpy(np.float32)
+
+
+def close_series_store(store, prefix, n_batches, n_points):
+    """Сброс данных + индекс: prefix_offsets.npy (CSR-смещения) и prefix_index.json"""
+    store.flush()
+    keys = _scenario_keys()
+    # Блок k = сценарий * n_batches + партия занимает строки offsets[k]:offsets[k + 1]
+    offsets = np.arange(len(keys) * n_batches + 1, dtype=np.int64) * n_points
+    np.save(prefix + "_offsets.npy", offsets)
+    with open(prefix + "_index.json", "w", encoding="utf-8") as f:
+        json.dump({'tags': SERIES_TAGS, 'n_batches': n_batches,
+                   'scenarios': [list(k) for k in keys]}, f, ensure_ascii=False, indent=1)
+    return sum(os.path.getsize(prefix + suffix) for suffix in (".npy", "_offsets.npy", "_index.json"))
+
+
+def write_series_store(df, prefix="Scientific_Data_Series", n_batches=1, n_points=50, t_max=10.0):
+    """Хранилище траекторий из готовой таблицы с колонкой batch_id"""
+    store = open_series_store(prefix, n_batches, n_points)
+    scatter_series(store, df, n_batches, n_points, t_max / (n_points - 1) if n_points > 1 else 0.0)
+    size = close_series_store(store, prefix, n_batches, n_points)
+    del store
+    return size
+
+
+def write_historian(df, filename="Scientific_Data.sqlite"):
+    """Историан SQLite из готовой таблицы (старый файл и его WAL удаляются)"""
+    from historian import Historian
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(filename + suffix):
+            os.remove(filename + suffix)
+    hist = Historian(filename)
+    hist.ingest(df)
+    hist.checkpoint()
+    hist.close()
+    return filename
+
+
+def generate_stream(filename="Scientific_Data_Fleet.csv", n_batches=1, horizon=10.0,
+                    step=10.0 / 49, chunk_rows=1_000_000, float_format=None, mode="vectorized"):
+    """Потоковая запись флота партий чанками фиксированного размера (память не растет).
+
+    Формат выбирается по расширению: .parquet - каждый чанк пишется отдельной
+    row group, .npy - бинарное хранилище траекторий (memmap + индекс),
+    .sqlite - историан (executemany чанка одной транзакцией), иначе CSV.
+    float_format (например '%.6g') сокращает CSV и ускоряет запись: форматирование
+    float в текст - основная стоимость CSV.
+    """
+    print(f"🚀 Потоковая генерация: {n_batches} партий, {horizon} ч, шаг {step:.4g} ч -> '{filename}'")
+
+    rows = 0
+    t0 = time_mod.perf_counter()
+    chunks = iter_chunks(n_batches, horizon, step, chunk_rows, mode)
+
+    if filename.endswith(".npy"):
+        prefix = filename[:-len(".npy")]
+        n_points, dt = _time_grid(horizon, step)
+        store = open_series_store(prefix, n_batches, n_points)
+        for i, chunk in enumerate(chunks):
+            scatter_series(store, chunk, n_batches, n_points, dt)
+            rows += len(chunk)
+            elapsed = time_mod.perf_counter() - t0
+            print(f"   - чанк {i + 1}: {rows:,} строк, {rows / elapsed:,.0f} строк/с")
+        bytes_written = close_series_store(store, prefix, n_batches, n_points)
+        del store
+    elif filename.endswith(".sqlite"):
+        from historian import Historian
+
+        hist = Historian(filename)
+        for i, chunk in enumerate(chunks):
+            rows += hist.ingest(chunk)
+            elapsed = time_mod.perf_counter() - t0
+            print(f"   - чанк {i + 1}: {rows:,} строк, {rows / elapsed:,.0f} строк/с")
+        hist.checkpoint()
+        hist.close()
+        bytes_written = os.path.getsize(filename)
+    else:
+        as_parquet = filename.endswith(".parquet")
+        with open(filename, "wb" if as_parquet else "w",
+                  **({} if as_parquet else {"encoding": "utf-8", "newline": ""})) as f:
+            writer = None
+            for i, chunk in enumerate(chunks):
+                if as_parquet:
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(f, table.schema, compression="zstd")
+                    writer.write_table(table)
+                else:
+                    chunk.to_csv(f, index=False, header=(i == 0), float_format=float_format)
+                rows += len(chunk)
+                elapsed = time_mod.perf_counter() - t0
+                print(f"   - чанк {i + 1}: {rows:,} строк, {rows / elapsed:,.0f} строк/с, {f.tell() / 1e6:,.1f} МБ")
+            if writer is not None:
+                writer.close()
+            bytes_written = f.tell()
+
+    elapsed = time_mod.perf_counter() - t0
+    stats = {'rows': rows, 'seconds': elapsed, 'rows_per_s': rows / elapsed if elapsed else 0.0,
+             'bytes': bytes_written}
+    print(f"✅ Готово! {rows:,} строк за {elapsed:.1f} с ({stats['rows_per_s']:,.0f} строк/с), "
+          f"{bytes_written / 1e6:,.1f} МБ записано.")
+    return stats
+
+
+def generate_full_database(mode="vectorized", n_points=50):
+    print("🚀 Генерация базы данных Цифрового Двойника (Scientific_Data_Extended.csv)...")
+
+    df = build_dataframe(n_points=n_points, mode=mode)
+
+    # Сохранение
+    filename = "Scientific_Data_Extended.csv"
+    df.to_csv(filename, index=False)
+    # Колоночная копия рядом с CSV (страницы читают только нужные колонки)
+    parquet_name = filename.replace(".csv", ".parquet")
+    try:
+        write_parquet(df, parquet_name)
+    except ImportError:
+        parquet_name = None
+    # Бинарное хранилище траекторий (одна партия на сценарий)
+    series_prefix = "Scientific_Data_Series"
+    write_series_store(df.assign(batch_id=0), series_prefix, n_points=n_points)
+    # Историан SQLite: страницы берут окна и агрегаты запросами (файл пересоздается)
+    historian_name = write_historian(df)
+    print(f"✅ Готово! Файл '{filename}' успешно создан.")
+    if parquet_name:
+        print(f"   - Колоночная копия: '{parquet_name}'")
+    print(f"   - Хранилище траекторий: '{series_prefix}.npy'")
+    print(f"   - Историан: '{historian_name}'")
+    print(f"   - Строк: {len(df)}")
+    print(f"   - Продукты: {df['productname'].unique()}")
+    print(f"   - Сценарии: {df['experiment_type'].unique()}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Генератор базы данных Цифрового Двойника")
+    parser.add_argument("--batches", type=int, help="Потоковый режим: число партий на сценарий")
+    parser.add_argument("--horizon", type=float, default=10.0, help="Длительность процесса, ч")
+    parser.add_argument("--step", type=float, default=10.0 / 49, help="Шаг дискретизации, ч")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Строк в одном чанке")
+    parser.add_argument("--out", default="Scientific_Data_Fleet.csv", help="Файл потокового режима")
+    parser.add_argument("--float-format", help="Формат float для CSV, например %%.6g")
+    parser.add_argument("--mode", choices=["vectorized", "loop", "kinetic"], default="vectorized",
+                        help="Генератор кривых: формулы (vectorized/loop) или кинетика закваски")
+    args = parser.parse_args()
+    if args.batches and args.mode == "loop":
+        parser.error("--mode loop - только эталон для полной базы; потоковый режим: vectorized или kinetic")
+
+    if args.batches:
+        generate_stream(args.out, args.batches, args.horizon, args.step, args.chunk_rows, args.float_format,
+                        mode=args.mode)
+    else:
+        generate_full_database(mode=args.mode)
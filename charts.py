@@ -0,0 +1,103 @@
+# charts.py
+# ============================================
+# Кэш готовых картинок графиков (PNG) для детерминированных matplotlib-графиков
+# ============================================
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+_lock = threading.Lock()
+_cache = OrderedDict()          # ключ -> PNG (LRU)
+_MAX_BYTES = 64 * 2 ** 20       # предел памяти кэша
+_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+
+def chart_key(*parts):
+    """Ключ графика по его входам: коэффициенты, массивы данных, цели, подписи"""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            arr = np.ascontiguousarray(part)
+            h.update(f"{arr.dtype}{arr.shape}".encode())
+            h.update(arr.tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def render_png(key, draw):
+    """PNG графика из кэша; при промахе draw() строит фигуру, она кодируется и закрывается.
+
+    Кодирование как у st.pyplot (dpi=200, bbox_inches='tight'), поэтому картинка
+    на странице не отличается от прежней.
+    """
+    with _lock:
+        png = _cache.get(key)
+        if png is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return png
+
+    fig = draw()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight", facecolor=fig.get_facecolor())
+    plt.close(fig)
+    png = buf.getvalue()
+
+    with _lock:
+        _stats['misses'] += 1
+        if key not in _cache:
+            _cache[key] = png
+            _stats['bytes'] += len(png)
+        while _stats['bytes'] > _MAX_BYTES and len(_cache) > 1:
+            _, old = _cache.popitem(last=False)
+            _stats['bytes'] -= len(old)
+    return png
+
+
+def cache_stats():
+    """Попадания, промахи, число картинок и занятая память"""
+    with _lock:
+        return {**_stats, 'entries': len(_cache)}
+
+
+def cache_note():
+    """Короткая подпись для сайдбара страницы"""
+    s = cache_stats()
+    total = s['hits'] + s['misses']
+    rate = s['hits'] / total if total else 0.0
+    return (f"🖼 Кэш графиков: {s['entries']} шт., {s['bytes'] / 1e6:.1f} МБ, "
+            f"попаданий {s['hits']} / промахов {s['misses']} ({rate:.0%})")
+
+
+if __name__ == "__main__":
+    # Замер: построение графика pages/4 (plt.subplots + PNG) vs отдача байтов из кэша
+    import time
+
+    matplotlib.use("Agg")
+    t = np.linspace(2, 10, 100)
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(10, 6))
+        for a, b in ((4.605, 0.125), (4.535, 0.102), (4.506, 0.125)):
+            ax.plot(t, a - b * np.log(t), linewidth=2.5)
+        ax.axhline(y=4.6, linestyle=':')
+        return fig
+
+    key = chart_key('bench', t, (4.605, 0.125))
+    t0 = time.perf_counter()
+    render_png(key, draw)
+    t_miss = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(100):
+        render_png(key, draw)
+    t_hit = (time.perf_counter() - t0) / 100
+    print(f"📊 График 10×6: построение {t_miss * 1e3:.0f} мс, из кэша {t_hit * 1e6:.1f} мкс "
+          f"(x{t_miss / t_hit:,.0f}); {cache_note()}")
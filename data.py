@@ -0,0 +1,395 @@
+# data.py
+# ============================================
+# Чтение базы Цифрового Двойника (общий слой данных для страниц)
+# ============================================
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from historian import HISTORIAN_FILE, Historian
+
+PARQUET_FILE = "Scientific_Data_Extended.parquet"
+CSV_FILES = ["Scientific_Data_Extended.csv", "Scientific_Data.csv"]
+SERIES_PREFIX = "Scientific_Data_Series"
+
+# Текстовые измерения хранятся как категории, измерения - float32
+# (модели переводят свои выборки в float64 сами: models.fit_groups, fit_*_batches, get_model)
+CATEGORY_COLUMNS = ['productname', 'process_stage', 'experiment_type']
+
+# Общий кадр делится между страницами и сессиями: Copy-on-Write гарантирует,
+# что правки на странице не меняют общий экземпляр (в pandas >= 3 включен всегда)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+_lock = threading.Lock()
+_shared = {}              # сигнатура файла -> типизированный DataFrame
+_views = OrderedDict()    # (сигнатура, колонки, фильтры) -> выборка (LRU)
+_MAX_VIEWS = 64
+_page_usage = {}          # страница -> (сигнатура, байт в выборке)
+_stores = {}              # сигнатура .npy -> SeriesStore
+_historians = {}          # (путь, inode) -> Historian
+_query_log = {}           # страница -> (источник, строк, мс)
+
+
+def _normalize(name):
+    return name.lower().strip()
+
+
+def _read_parquet(path, columns, filters):
+    """Parquet: проекция колонок и фильтры выполняются внутри pyarrow (до pandas)"""
+    pa_filters = None
+    if filters:
+        pa_filters = [(col, "in", list(val)) if isinstance(val, (list, tuple, set)) else (col, "==", val)
+                      for col, val in filters.items()]
+    return pd.read_parquet(path, columns=columns, filters=pa_filters)
+
+
+def _read_csv(path, columns, filters):
+    """CSV: парсятся только нужные колонки, фильтр применяется после чтения"""
+    wanted = None
+    if columns is not None:
+        wanted = set(columns) | set(filters or {})
+    df = pd.read_csv(path, usecols=(lambda c: _normalize(c) in wanted) if wanted else None)
+    # Приводим названия колонок к нижнему регистру
+    df.columns = [_normalize(c) for c in df.columns]
+    for col, val in (filters or {}).items():
+        if col not in df.columns:
+            continue
+        if isinstance(val, (list, tuple, set)):
+            df = df[df[col].isin(list(val))]
+        else:
+            df = df[df[col] == val]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df.reset_index(drop=True)
+
+
+def read_dataset(columns=None, filters=None):
+    """Загрузка базы: только нужные колонки и строки.
+
+    columns - список колонок (None = все); filters - {колонка: значение или список},
+    например {'productname': 'Айран'}. Приоритет: Parquet -> расширенный CSV -> обычный CSV.
+    """
+    if os.path.exists(PARQUET_FILE):
+        try:
+            return _read_parquet(PARQUET_FILE, columns, filters)
+        except ImportError:
+            pass
+    for path in CSV_FILES:
+        if os.path.exists(path):
+            return _read_csv(path, columns, filters)
+    return pd.DataFrame()
+
+
+def _source_path():
+    for path in [PARQUET_FILE] + CSV_FILES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def file_signature(path, verify_hash=False):
+    """Ключ инвалидации кэша: mtime + размер (опционально - хэш содержимого)"""
+    st_ = os.stat(path)
+    sig = (path, st_.st_mtime_ns, st_.st_size)
+    if verify_hash:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        sig += (h.hexdigest(),)
+    return sig
+
+
+def _to_typed(df):
+    """Категории для текстовых колонок, float32 для измерений"""
+    df.columns = [_normalize(c) for c in df.columns]
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    floats = df.select_dtypes(include="float64").columns
+    return df.astype({c: np.float32 for c in floats})
+
+
+def _shared_frame(verify_hash=False):
+    path = _source_path()
+    if path is None:
+        return None, pd.DataFrame()
+    sig = file_signature(path, verify_hash)
+    frame = _shared.get(sig)
+    if frame is None:
+        with _lock:
+            frame = _shared.get(sig)
+            if frame is None:
+                frame = _to_typed(read_dataset())
+                # Файл изменился - старые версии и выборки больше не нужны
+                _shared.clear()
+                _views.clear()
+                _shared[sig] = frame
+    return sig, frame
+
+
+def _filters_key(filters):
+    """Фильтры -> хэшируемый ключ кэша: списки и множества значений - отсортированные кортежи"""
+    return tuple(sorted(
+        (col, tuple(sorted(val, key=str)) if isinstance(val, (list, tuple, set)) else val)
+        for col, val in (filters or {}).items()))
+
+
+def get_dataset(columns=None, filters=None, page=None, verify_hash=False):
+    """Общая (одна на процесс) типизированная база и выборки из нее.
+
+    Файл читается один раз и перечитывается только при смене mtime/размера
+    (или хэша при verify_hash=True). Выборки по columns/filters кэшируются в LRU
+    и отдаются всем страницам и сессиям без копирования - их нельзя менять на месте.
+    page - имя страницы для отчета memory_report().
+    """
+    sig, frame = _shared_frame(verify_hash)
+    if sig is None:
+        return frame
+
+    key = (sig, tuple(columns) if columns else None, _filters_key(filters))
+    with _lock:
+        view = _views.get(key)
+        if view is not None:
+            _views.move_to_end(key)
+    if view is None:
+        view = frame
+        for col, val in (filters or {}).items():
+            if col not in view.columns:
+                continue
+            if isinstance(val, (list, tuple, set)):
+                view = view[view[col].isin(list(val))]
+            else:
+                view = view[view[col] == val]
+        if columns:
+            view = view[[c for c in columns if c in view.columns]]
+        if view is not frame:
+            view = view.reset_index(drop=True)
+        with _lock:
+            _views[key] = view
+            while len(_views) > _MAX_VIEWS:
+                _views.popitem(last=False)
+
+    if page is not None:
+        # Выборка без фильтров делит буферы с общим кадром и не стоит памяти
+        own = 0 if not filters else int(view.memory_usage(deep=True, index=False).sum())
+        _page_usage[page] = (sig, own)
+    return view
+
+
+class SeriesStore:
+    """Хранилище траекторий DB.py на memmap: открытие читает только заголовок и индекс.
+
+    Траектория (продукт, опыт, партия) - непрерывный блок строк data[offsets[k]:offsets[k + 1]],
+    отсортированный по времени; колонки - tags.
+    """
+
+    def __init__(self, prefix):
+        self.data = np.load(prefix + ".npy", mmap_mode="r")
+        self.offsets = np.load(prefix + "_offsets.npy", mmap_mode="r")
+        with open(prefix + "_index.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.tags = meta['tags']
+        self.n_batches = meta['n_batches']
+        self.scenarios = [tuple(s) for s in meta['scenarios']]
+        self._tag_idx = {t: i for i, t in enumerate(self.tags)}
+        self._scen_idx = {(p, e): i for i, (p, _, e) in enumerate(self.scenarios)}
+
+    def products(self):
+        return list(dict.fromkeys(p for p, _, _ in self.scenarios))
+
+    def experiments(self, product):
+        return [e for p, _, e in self.scenarios if p == product]
+
+    def stage(self, product, experiment):
+        return self.scenarios[self._scen_idx[(product, experiment)]][1]
+
+    def view(self, product, experiment, batch=0):
+        """Zero-copy срез (точки × теги) одной партии"""
+        k = self._scen_idx[(product, experiment)] * self.n_batches + batch
+        return self.data[self.offsets[k]:self.offsets[k + 1]]
+
+    def frame(self, product, experiment, batch=0, columns=None):
+        """DataFrame поверх среза: колонки - виды memmap, без копирования"""
+        view = self.view(product, experiment, batch)
+        cols = [c for c in (columns or self.tags) if c in self._tag_idx]
+        return pd.DataFrame({c: view[:, self._tag_idx[c]] for c in cols}, copy=False)
+
+
+def open_series_store(prefix=SERIES_PREFIX):
+    """Общий (на процесс) экземпляр хранилища; None, если DB.py его не создал"""
+    path = prefix + ".npy"
+    if not os.path.exists(path):
+        return None
+    sig = file_signature(path)
+    store = _stores.get(sig)
+    if store is None:
+        with _lock:
+            store = _stores.get(sig)
+            if store is None:
+                store = SeriesStore(prefix)
+                _stores.clear()
+                _stores[sig] = store
+    return store
+
+
+def open_historian(path=HISTORIAN_FILE):
+    """Общий (на процесс) историан SQLite; None, если DB.py его не создал.
+
+    Ключ - inode: дозапись в WAL не пересоздает объект, новый файл DB.py - пересоздает.
+    """
+    if not os.path.exists(path):
+        return None
+    st_ = os.stat(path)
+    key = (path, st_.st_ino)
+    hist = _historians.get(key)
+    if hist is None:
+        with _lock:
+            hist = _historians.get(key)
+            if hist is None:
+                hist = Historian(path)
+                _historians.clear()
+                _historians[key] = hist
+    return hist
+
+
+def _log_query(page, source, frame, t0):
+    if page is not None:
+        _query_log[page] = (source, len(frame), (time.perf_counter() - t0) * 1e3)
+
+
+def query_dataset(columns=None, filters=None, batch=None, t_range=None, page=None):
+    """Диапазонный запрос к историану (ряды filters, партия batch, окно t_range, ч).
+
+    Без историана - та же выборка из общего кадра (get_dataset) с маской по времени.
+    """
+    t0 = time.perf_counter()
+    hist = open_historian()
+    if hist is not None:
+        frame = _to_typed(hist.query(columns, filters, batch, t_range))
+        _log_query(page, "SQLite", frame, t0)
+        return frame
+    frame = get_dataset(columns, filters, page=page)
+    mask = np.ones(len(frame), dtype=bool)
+    if batch is not None and 'batch_id' in frame.columns:
+        lo, hi = batch if isinstance(batch, tuple) else (batch, batch)
+        mask &= frame['batch_id'].between(lo, hi).to_numpy()
+    if t_range is not None and 'duration_hours' in frame.columns:
+        mask &= frame['duration_hours'].between(*t_range).to_numpy()
+    if not mask.all():
+        frame = frame[mask].reset_index(drop=True)
+    _log_query(page, "кадр", frame, t0)
+    return frame
+
+
+def aggregate_dataset(columns, by=('process_stage',), filters=None, page=None):
+    """Средние columns по измерениям by: сводки историана (O(групп)) или groupby общего кадра"""
+    t0 = time.perf_counter()
+    hist = open_historian()
+    if hist is not None:
+        frame = hist.aggregate(columns, by, filters)
+        _log_query(page, f"SQLite, {frame.attrs['source']}", frame, t0)
+        return frame
+    frame = get_dataset(list(by) + list(columns), filters)
+    cols = [c for c in columns if c in frame.columns]
+    if by:
+        frame = frame.groupby(list(by), observed=True)[cols].mean().reset_index()
+    else:
+        frame = frame[cols].mean().to_frame().T
+    _log_query(page, "кадр", frame, t0)
+    return frame
+
+
+def query_note(page):
+    """Подпись для сайдбара: источник и задержка последнего запроса страницы"""
+    if page not in _query_log:
+        return ""
+    source, rows, ms = _query_log[page]
+    rows = f"{rows:,}".replace(",", " ")
+    return f"🗄 Запрос ({source}): {rows} строк за {ms:.1f} мс"
+
+
+def _legacy_nbytes(frame):
+    """Оценка прежней копии страницы: float64 + строки-объекты (как после read_csv)"""
+    total = 0
+    n = len(frame)
+    for col in frame.columns:
+        dtype = frame[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            counts = frame[col].value_counts(sort=False)
+            total += 8 * n + sum(sys.getsizeof(str(c)) * int(k) for c, k in counts.items())
+        else:
+            total += 8 * n
+    return total
+
+
+def memory_report():
+    """Экономия памяти по страницам: прежняя приватная копия vs доля в общем кадре"""
+    sig, frame = _shared_frame()
+    if sig is None:
+        return pd.DataFrame()
+    shared = int(frame.memory_usage(deep=True, index=False).sum())
+    legacy = _legacy_nbytes(frame)
+    rows = [{'страница': page, 'прежняя копия, МБ': legacy / 1e6, 'своя выборка, МБ': own / 1e6,
+             'экономия, МБ': (legacy - own) / 1e6}
+            for page, (page_sig, own) in sorted(_page_usage.items()) if page_sig == sig]
+    report = pd.DataFrame(rows)
+    report.attrs['shared_mb'] = shared / 1e6
+    return report
+
+
+def memory_note(page):
+    """Короткая подпись для сайдбара страницы"""
+    report = memory_report()
+    if report.empty or page not in set(report['страница']):
+        return ""
+    saved = report.loc[report['страница'] == page, 'экономия, МБ'].iloc[0]
+    return f"💾 Общая база: {report.attrs['shared_mb']:.2f} МБ на процесс, экономия страницы: {saved:.2f} МБ"
+
+
+if __name__ == "__main__":
+    # Замер: холодная загрузка CSV vs Parquet на 1M+ строк (каждый замер в отдельном процессе)
+    import subprocess
+    import tempfile
+
+    import DB
+
+    n_batches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # VmHWM (а не ru_maxrss): ru_maxrss на Linux наследуется от родителя через fork/exec
+    probe = """
+import sys, time
+t0 = time.perf_counter()
+import pandas as pd
+import data
+data.PARQUET_FILE = sys.argv[1]; data.CSV_FILES = [sys.argv[2]]
+if sys.argv[3] == 'full':
+    df = pd.read_csv(sys.argv[2]); df = df[df['productname'] == 'Айран']
+else:
+    df = data.read_dataset(columns=['productname', 'duration_hours', 'ph', 'влага'],
+                           filters={'productname': 'Айран'})
+hwm = [l for l in open('/proc/self/status') if l.startswith('VmHWM')][0].split()[1]
+print(f"{time.perf_counter() - t0:.2f} {int(hwm) / 1024:.0f} {len(df)}")
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "bench.csv")
+        pq_path = os.path.join(tmp, "bench.parquet")
+        DB.generate_stream(csv_path, n_batches=n_batches, chunk_rows=500_000)
+        DB.generate_stream(pq_path, n_batches=n_batches, chunk_rows=500_000)
+
+        print(f"\n📊 Холодная загрузка (4 колонки, productname='Айран'):")
+        for label, args in (("CSV весь", ["missing.parquet", csv_path, "full"]),
+                            ("CSV", ["missing.parquet", csv_path, "proj"]),
+                            ("Parquet", [pq_path, csv_path, "proj"])):
+            out = subprocess.run([sys.executable, "-c", probe, *args], capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+            size = os.path.getsize(args[0] if label == "Parquet" else csv_path) / 1e6
+            print(f"   - {label:9s}: {out[0]} с, пик RSS {out[1]} МБ, строк {out[2]}, файл {size:,.1f} МБ")
@@ -0,0 +1,183 @@
+# downsample.py
+# ============================================
+# Прореживание трендов: LTTB и мин-макс огибающая под бюджет точек графика
+# ============================================
+#
+# График шириной ~1000 пикселей не покажет больше ~1000 точек, а каждая лишняя
+# точка сериализуется в браузер. Пирамида уровней: уровень L делит ряд на 2^L
+# равных кусков по BUDGET точек, поэтому окно любого масштаба берется срезом
+# готового уровня (бинарный поиск), без пересчета при прокрутке.
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+BUDGET = 1000               # точек на ширину графика
+MODES = ('lttb', 'minmax')
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # (ключ ряда, режим, бюджет, длина) -> ZoomPyramid (LRU)
+_MAX_CACHE = 64
+
+
+def _lttb_chains(x, y, n_chains, n_bkt):
+    """LTTB сразу в n_chains независимых кусках по n_bkt корзин.
+
+    Выбор точки зависит от выбранной в предыдущей корзине, поэтому цикл идет по
+    номеру корзины, а куски обрабатываются одним векторным шагом.
+    """
+    n = len(x)
+    n_b = n_chains * n_bkt
+    edges = np.linspace(0, n, n_b + 1).astype(np.int64)
+    start, size = edges[:-1], np.diff(edges)
+    cols = np.arange(size.max())
+    # Центры корзин - третья вершина треугольника
+    cx = np.add.reduceat(x, start) / size
+    cy = np.add.reduceat(y, start) / size
+    cx = np.append(cx, x[-1])
+    cy = np.append(cy, y[-1])
+
+    out = np.empty((n_chains, n_bkt), dtype=np.int64)
+    chain = np.arange(n_chains) * n_bkt
+    out[:, 0] = start[chain]                # первая точка куска закреплена
+    ax, ay = x[out[:, 0]], y[out[:, 0]]
+    for j in range(1, n_bkt):
+        b = chain + j
+        rows = np.minimum(start[b][:, None] + cols, n - 1)
+        px, py = x[rows], y[rows]
+        nx, ny = cx[b + 1][:, None], cy[b + 1][:, None]
+        area = np.abs((ax[:, None] - nx) * (py - ay[:, None]) - (ax[:, None] - px) * (ny - ay[:, None]))
+        area[cols >= size[b][:, None]] = -1.0
+        sel = rows[np.arange(n_chains), area.argmax(1)]
+        out[:, j] = sel
+        ax, ay = x[sel], y[sel]
+    out[-1, -1] = n - 1                     # последняя точка ряда закреплена
+    return out.ravel()
+
+
+def _minmax(y, n_out):
+    """Мин. и макс. каждой из n_out/2 корзин в порядке времени (огибающая)"""
+    n = len(y)
+    n_b = max(n_out // 2, 1)
+    start = np.linspace(0, n, n_b + 1).astype(np.int64)[:-1]
+    bucket = np.repeat(np.arange(n_b), np.diff(np.append(start, n)))
+    idx = []
+    for reduce in (np.minimum, np.maximum):
+        hit = np.flatnonzero(y == reduce.reduceat(y, start)[bucket])
+        b = bucket[hit]
+        idx.append(hit[np.r_[True, b[1:] != b[:-1]]])   # первое совпадение в корзине
+    return np.unique(np.concatenate(idx + [[0, n - 1]]))
+
+
+def thin(x, y, n_out=BUDGET, mode='lttb'):
+    """Индексы не более ~n_out точек ряда (x по возрастанию); короткий ряд - без изменений"""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if mode == 'minmax':
+        return _minmax(y, n_out)
+    return _lttb_chains(x, y, 1, n_out)
+
+
+class ZoomPyramid:
+    """Уровни прореживания ряда: уровень L - 2^L кусков по budget точек.
+
+    Самый подробный уровень - сам ряд. view(x0, x1) берет самый грубый уровень,
+    у которого в окне не меньше budget точек, и отдает срез его индексов.
+    """
+
+    def __init__(self, x, y, budget=BUDGET, mode='lttb'):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.budget = budget
+        self.mode = mode
+        n = len(self.x)
+        self.levels = []
+        chains = 1
+        while budget >= 3 and chains * budget * 2 <= n:
+            if mode == 'minmax':
+                idx = _minmax(self.y, chains * budget)
+            else:
+                idx = _lttb_chains(self.x, self.y, chains, budget)
+            self.levels.append(idx)
+            chains *= 2
+        self.levels.append(np.arange(n))
+
+    @property
+    def nbytes(self):
+        return sum(idx.nbytes for idx in self.levels) + self.x.nbytes + self.y.nbytes
+
+    def level_for(self, x0, x1):
+        """Номер уровня для окна [x0, x1]"""
+        n = len(self.x)
+        i0, i1 = np.searchsorted(self.x, [x0, x1], side='left')
+        frac = max(i1 - i0, 1) / max(n, 1)
+        return min(max(math.ceil(math.log2(1.0 / frac)), 0), len(self.levels) - 1)
+
+    def view(self, x0=None, x1=None):
+        """Индексы точек окна (с соседями за краями, чтобы линия не обрывалась)"""
+        if len(self.x) == 0:
+            return np.arange(0)
+        x0 = self.x[0] if x0 is None else x0
+        x1 = self.x[-1] if x1 is None else x1
+        idx = self.levels[self.level_for(x0, x1)]
+        xs = self.x[idx]
+        lo = max(int(np.searchsorted(xs, x0, side='left')) - 1, 0)
+        hi = int(np.searchsorted(xs, x1, side='right')) + 1
+        return idx[lo:hi]
+
+
+def pyramid(key, x, y, budget=BUDGET, mode='lttb'):
+    """Пирамида ряда из кэша (ключ - например, (продукт, опыт, партия, колонка))"""
+    cache_key = (key, mode, budget, len(x))
+    with _lock:
+        pyr = _cache.get(cache_key)
+        if pyr is not None:
+            _cache.move_to_end(cache_key)
+            return pyr
+    pyr = ZoomPyramid(x, y, budget, mode)
+    with _lock:
+        _cache[cache_key] = pyr
+        while len(_cache) > _MAX_CACHE:
+            _cache.popitem(last=False)
+    return pyr
+
+
+if __name__ == "__main__":
+    # Замер: ряд pH на 2·10^6 точек (формула DB.py + шум датчика) -> бюджет графика
+    import time
+
+    n = 2_000_000
+    rng = np.random.default_rng(0)
+    t = np.linspace(0.0, 10.0, n)
+    ph = 5.98 - 0.688 * np.log(t + 1) + rng.normal(0, 0.01, n)
+    ph[n // 3] -= 0.5                       # одиночный выброс датчика
+
+    for mode in MODES:
+        t0 = time.perf_counter()
+        idx = thin(t, ph, mode=mode)
+        t_thin = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pyr = ZoomPyramid(t, ph, mode=mode)
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for x0 in np.linspace(0.0, 9.0, 100):
+            view = pyr.view(x0, x0 + 1.0)
+        t_pan = (time.perf_counter() - t0) / 100
+        print(f"📊 {mode}: {n:,} -> {len(idx):,} точек за {t_thin * 1e3:.0f} мс, выброс сохранен: "
+              f"{n // 3 in set(idx)}; пирамида {len(pyr.levels)} уровней за {t_build:.2f} с "
+              f"({pyr.nbytes / 1e6:.0f} МБ), прокрутка окна 1 ч: {t_pan * 1e6:.0f} мкс, {len(view):,} точек")
+
+    # Сериализация в браузер: весь ряд vs прореженный
+    import pandas as pd
+    full = pd.DataFrame({'duration_hours': t, 'ph': ph})
+    t0 = time.perf_counter()
+    payload_full = full.to_json(orient='split')
+    t_full = time.perf_counter() - t0
+    payload_thin = full.iloc[thin(t, ph)].to_json(orient='split')
+    print(f"   - JSON для графика: весь ряд {len(payload_full) / 1e6:.0f} МБ ({t_full:.2f} с), "
+          f"прореженный {len(payload_thin) / 1e3:.0f} КБ")
@@ -0,0 +1,687 @@
+# historian.py
+# ============================================
+# Локальный историан: SQLite (WAL) с кластерным индексом по траекториям
+# ============================================
+#
+# Схема:
+#   series  - справочник (id, продукт, этап, опыт), уникальный индекс по тройке
+#   points  - WITHOUT ROWID, первичный ключ (series_id, batch_id, duration_hours):
+#             строки партии лежат в B-дереве подряд и по времени, поэтому
+#             «продукт/опыт -> партия -> окно времени» - один диапазонный проход
+#   rollup  - сводки count/sum/sumsq/min/max по тегам на уровнях TIERS: партия,
+#             ряд (этап опыта), час и сутки процесса; обновляются при каждой записи,
+#             поэтому KPI и журнал читают O(групп) строк вместо сканирования точек
+# WAL: страницы читают, пока генератор дописывает (читатели не блокируют писателя).
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+HISTORIAN_FILE = "Scientific_Data.sqlite"
+
+DIMENSIONS = ['productname', 'process_stage', 'experiment_type']
+KEY_COLUMNS = ['batch_id', 'duration_hours']
+PARTS = ('count', 'sum', 'sumsq', 'min', 'max')   # частичные агрегаты, из которых сворачиваются итоги
+# Значения тегов (REAL); отсутствующие в чанке колонки пишутся как NULL
+VALUE_COLUMNS = ['ph', 'temperature_c', 'additive_dose_pct', 'влага', 'сухие_вещества', 'fat_pct',
+                 'protein_pct', 'density_kg_m3', 'кислотность', 'orp_mv', 'viscosity_mpa_s',
+                 'water_activity', 'kmafanm', 'lactic_bacteria', 'pressure_mpa', 'humidity_pct']
+AGG_COLUMNS = ['duration_hours'] + VALUE_COLUMNS
+
+# Уровни сводок: (отдельно по партиям, окно времени процесса, ч)
+TIERS = {
+    'batch': (True, None),       # партия целиком - KPI партии
+    'stage': (False, None),      # ряд (продукт, этап, опыт) по всем партиям - KPI и журнал
+    'hour': (False, 1.0),        # час процесса по всем партиям
+    'day': (False, 24.0),        # сутки процесса (длинные горизонты DB.py --horizon)
+}
+ROLLUP_COLUMNS = [f"{c}:{p}" for c in AGG_COLUMNS for p in PARTS]
+# PARTS в SQL: TOTAL вместо SUM - 0.0 для ряда без значений (как сумма в numpy)
+_SQL_PARTS = {'count': "COUNT({})", 'sum': "TOTAL({})", 'sumsq': "TOTAL({0} * {0})",
+              'min': "MIN({})", 'max': "MAX({})"}
+
+_PROBE_BATCHES = 8          # партий ряда, где ищется прежний экстремум перед сканом ряда
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # в WAL безопасно: теряется только последняя транзакция
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",       # 64 МБ страничного кэша на соединение
+    "PRAGMA mmap_size=268435456",     # чтение через mmap (256 МБ)
+)
+
+
+def _q(name):
+    """Кириллица в именах колонок: всегда в кавычках"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class Historian:
+    """Историан на SQLite: пакетная запись чанков и диапазонные/агрегатные запросы.
+
+    Соединения - по одному на поток (Streamlit обслуживает сессии в разных потоках).
+    """
+
+    def __init__(self, path=HISTORIAN_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._create_schema()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.execute("PRAGMA optimize")
+            conn.close()
+            self._local.conn = None
+
+    def _create_schema(self):
+        values = ", ".join(f"{_q(c)} REAL" for c in VALUE_COLUMNS)
+        with self.connection() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS series (
+                id INTEGER PRIMARY KEY,
+                productname TEXT NOT NULL,
+                process_stage TEXT NOT NULL,
+                experiment_type TEXT NOT NULL,
+                UNIQUE (productname, experiment_type, process_stage))""")
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS points (
+                series_id INTEGER NOT NULL REFERENCES series(id),
+                batch_id INTEGER NOT NULL,
+                duration_hours REAL NOT NULL,
+                {values},
+                PRIMARY KEY (series_id, batch_id, duration_hours)) WITHOUT ROWID""")
+            # Широкие строки (85 значений): обычная таблица с уникальным ключом, не WITHOUT ROWID
+            parts = ", ".join(f"{_q(c)} REAL" for c in ROLLUP_COLUMNS)
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS rollup (
+                tier TEXT NOT NULL,
+                series_id INTEGER NOT NULL,
+                batch_id INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                {parts},
+                PRIMARY KEY (tier, series_id, batch_id, bucket))""")
+            # Файл прежней версии без сводок: строим их один раз по точкам
+            stale = conn.execute("SELECT EXISTS (SELECT 1 FROM points) "
+                                 "AND NOT EXISTS (SELECT 1 FROM rollup)").fetchone()[0]
+            if stale:
+                self._rebuild_rollups(conn, [r[0] for r in conn.execute("SELECT id FROM series")])
+
+    # ---------------- запись ----------------
+
+    def _series_ids(self, conn, keys):
+        """id справочника для уникальных троек (продукт, этап, опыт); новые добавляются"""
+        conn.executemany("INSERT OR IGNORE INTO series (productname, process_stage, experiment_type) "
+                         "VALUES (?, ?, ?)", keys)
+        lut = {(p, s, e): i for i, p, s, e in
+               conn.execute("SELECT id, productname, process_stage, experiment_type FROM series")}
+        return np.array([lut[k] for k in keys], dtype=np.int64)
+
+    def ingest(self, df):
+        """Пакетная запись чанка одной транзакцией (executemany).
+
+        Строки сортируются по первичному ключу - вставка идет в конец B-дерева.
+        Новые точки добавляются к сводкам (upsert частичных агрегатов чанка).
+        Повторная запись той же точки заменяет ее (перезапуск генератора идемпотентен):
+        вставляются только новые строки, заменяются только изменившиеся, а сводки
+        правятся лишь в затронутых ячейках - итоги остаются точными.
+        Возвращает число записанных строк.
+        """
+        if df.empty:
+            return 0
+        # Тройки измерений через коды категорий: без строки на каждую точку
+        cats = [df[c].astype('category').cat for c in DIMENSIONS]
+        combined = np.zeros(len(df), dtype=np.int64)
+        for cat in cats:
+            combined = combined * len(cat.categories) + cat.codes.to_numpy(np.int64)
+        uniq, codes = np.unique(combined, return_inverse=True)
+        keys = []
+        for u in uniq.tolist():
+            key = []
+            for cat in reversed(cats):
+                u, i = divmod(u, len(cat.categories))
+                key.append(str(cat.categories[i]))
+            keys.append(tuple(reversed(key)))
+        conn = self.connection()
+        n = len(df)
+        with conn:
+            sid = self._series_ids(conn, keys)[codes]
+            batch = (df['batch_id'].to_numpy(np.int64) if 'batch_id' in df.columns
+                     else np.zeros(n, dtype=np.int64))
+            t = df['duration_hours'].to_numpy(np.float64)
+            order = np.lexsort((t, batch, sid))
+            sid, batch = sid[order], batch[order]
+            values = np.column_stack([df[c].to_numpy(np.float64) if c in df.columns else np.full(n, np.nan)
+                                      for c in AGG_COLUMNS])[order]
+            # Повтор ключа внутри чанка: остается последняя строка (как при замене)
+            t = values[:, 0]
+            last = np.ones(n, dtype=bool)
+            last[:-1] = (sid[1:] != sid[:-1]) | (batch[1:] != batch[:-1]) | (t[1:] != t[:-1])
+            if not last.all():
+                sid, batch, values = sid[last], batch[last], values[last]
+
+            found, old = self._existing(conn, sid, batch, values[:, 0])
+            if not found.any():
+                conn.executemany(f"INSERT INTO points VALUES ({_marks()})", _point_rows(sid, batch, values))
+                self._append_rollups(conn, sid, batch, values)
+                return n
+            # Часть точек уже была: новые дописываются, заменяются только изменившиеся
+            new = ~found
+            if new.any():
+                conn.executemany(f"INSERT INTO points VALUES ({_marks()})",
+                                 _point_rows(sid[new], batch[new], values[new]))
+                self._append_rollups(conn, sid[new], batch[new], values[new])
+            same = (old == values) | (np.isnan(old) & np.isnan(values))
+            changed = found & ~same.all(axis=1)
+            if changed.any():
+                self._replace_points(conn, sid[changed], batch[changed], old[changed], values[changed])
+        return n
+
+    def _existing(self, conn, sid, batch, t):
+        """Какие точки чанка (отсортированного по ключу) уже записаны и их прежние значения AGG_COLUMNS.
+
+        Один диапазонный проход по первичному ключу на отрезок подряд идущих партий ряда.
+        """
+        n = len(sid)
+        found = np.zeros(n, dtype=bool)
+        old = np.full((n, len(AGG_COLUMNS)), np.nan)
+        brk = np.r_[True, (sid[1:] != sid[:-1]) | (batch[1:] - batch[:-1] > 1)]
+        lo = np.flatnonzero(brk)
+        hi = np.r_[lo[1:], n] - 1
+        sql = (f"SELECT series_id, batch_id, {', '.join(_q(c) for c in AGG_COLUMNS)} FROM points "
+               "WHERE series_id = ? AND batch_id BETWEEN ? AND ?")
+        rows = []
+        for i0, i1 in zip(lo.tolist(), hi.tolist()):
+            rows += conn.execute(sql, (int(sid[i0]), int(batch[i0]), int(batch[i1]))).fetchall()
+        if not rows:
+            return found, old
+        db = np.array(rows, dtype=np.float64)              # NULL -> nan
+        # Слияние ключей чанка и базы: совпавший ключ - соседняя пара (чанк, база) после сортировки
+        k_sid = np.r_[sid, db[:, 0].astype(np.int64)]
+        k_batch = np.r_[batch, db[:, 1].astype(np.int64)]
+        k_t = np.r_[t, db[:, 2]]
+        src = np.r_[np.zeros(n, dtype=np.int8), np.ones(len(db), dtype=np.int8)]
+        order = np.lexsort((src, k_t, k_batch, k_sid))
+        a, b = order[:-1], order[1:]
+        hit = (src[a] == 0) & (src[b] == 1) & (k_sid[a] == k_sid[b]) & (k_batch[a] == k_batch[b]) & (k_t[a] == k_t[b])
+        found[a[hit]] = True
+        old[a[hit]] = db[b[hit] - n, 2:]
+        return found, old
+
+    def _append_rollups(self, conn, sid, batch, values):
+        """Частичные агрегаты чанка по всем уровням -> upsert (сложение count/sum/sumsq, min/max)"""
+        # Один проход по точкам на самом мелком уровне (ряд, партия, час), уровни TIERS -
+        # свертка этих частичных агрегатов (окна кратны часу: сутки = час // 24)
+        fine_keys, fine = _partials((sid, batch, np.floor(values[:, 0]).astype(np.int64)), values)
+        for tier in TIERS:
+            keys, acc = _fold(_tier_keys(tier, *fine_keys), fine)
+            self._upsert_rollups(conn, tier, keys, acc)
+
+    def _upsert_rollups(self, conn, tier, keys, acc):
+        """Прибавить частичные агрегаты acc (группы × теги × PARTS) к ячейкам keys уровня tier"""
+        names = [_q(c) for c in ROLLUP_COLUMNS]
+        sets = []
+        for c, p in zip(names, [p for _ in AGG_COLUMNS for p in PARTS]):
+            if p in ('min', 'max'):
+                # NULL (нет значений) не должен затирать накопленный экстремум
+                sets.append(f"{c} = {p}(coalesce({c}, excluded.{c}), coalesce(excluded.{c}, {c}))")
+            else:
+                sets.append(f"{c} = {c} + excluded.{c}")
+        sql = (f"INSERT INTO rollup (tier, series_id, batch_id, bucket, {', '.join(names)}) "
+               f"VALUES ({', '.join('?' * (4 + len(names)))}) "
+               f"ON CONFLICT (tier, series_id, batch_id, bucket) DO UPDATE SET {', '.join(sets)}")
+        flat = acc.reshape(len(acc), -1)
+        rows = zip([tier] * len(acc), *(a.tolist() for a in keys), *(flat[:, j].tolist() for j in range(flat.shape[1])))
+        conn.executemany(sql, rows)
+
+    def _replace_points(self, conn, sid, batch, old, new):
+        """Замена изменившихся точек и правка сводок только в затронутых ячейках.
+
+        Партии: ячейки пересчитываются по своим точкам (диапазон первичного ключа).
+        Уровни по всем партиям: count/sum/sumsq - разность новых и прежних значений;
+        min/max пересчитываются, только если прежний экстремум ячейки был среди замененных
+        значений и новые до него не дотягивают: ряд - свертка сводок партий, сутки - часов,
+        час - по точкам ряда.
+        """
+        conn.executemany(f"INSERT OR REPLACE INTO points VALUES ({_marks()})", _point_rows(sid, batch, new))
+        hour = np.floor(new[:, 0]).astype(np.int64)
+        fine_keys, fine_new = _partials((sid, batch, hour), new)
+        _, fine_old = _partials((sid, batch, hour), old)
+        names = [_q(c) for c in ROLLUP_COLUMNS]
+        parts = ", ".join(_SQL_PARTS[p].format(_q(c)) for c in AGG_COLUMNS for p in PARTS)
+        ext = [_q(f"{c}:{p}") for c in AGG_COLUMNS for p in ('min', 'max')]
+        folded = ", ".join(f"{'MIN' if p == 'min' else 'MAX' if p == 'max' else 'TOTAL'}({_q(f'{c}:{p}')})"
+                           for c in AGG_COLUMNS for p in PARTS)
+        insert = f"INSERT OR REPLACE INTO rollup (tier, series_id, batch_id, bucket, {', '.join(names)}) "
+        for tier, (per_batch, width) in TIERS.items():
+            keys, acc_new = _fold(_tier_keys(tier, *fine_keys), fine_new)
+            if per_batch:
+                # Подряд идущие партии ряда - один диапазон первичного ключа
+                k_sid, k_batch = keys[0], keys[1]
+                brk = np.r_[True, (k_sid[1:] != k_sid[:-1]) | (k_batch[1:] != k_batch[:-1] + 1)]
+                lo, hi = np.flatnonzero(brk), np.r_[np.flatnonzero(brk)[1:], len(k_sid)] - 1
+                conn.executemany(
+                    insert + f"SELECT ?, series_id, batch_id, 0, {parts} FROM points "
+                             "WHERE series_id = ? AND batch_id BETWEEN ? AND ? GROUP BY series_id, batch_id",
+                    zip([tier] * len(lo), k_sid[lo].tolist(), k_batch[lo].tolist(), k_batch[hi].tolist()))
+                continue
+            _, acc_old = _fold(_tier_keys(tier, *fine_keys), fine_old)
+            # Текущие экстремумы ячеек до правки
+            stored = np.array([conn.execute(f"SELECT {', '.join(ext)} FROM rollup WHERE tier = ? AND series_id = ? "
+                                            "AND batch_id = ? AND bucket = ?", (tier, *k)).fetchone()
+                               for k in zip(*(a.tolist() for a in keys))], dtype=np.float64)
+            stored = stored.reshape(len(acc_new), len(AGG_COLUMNS), 2)
+            o_min, o_max = acc_old[:, :, 3], acc_old[:, :, 4]
+            n_min, n_max = acc_new[:, :, 3], acc_new[:, :, 4]
+            lost_min = (o_min <= stored[:, :, 0]) & ~(n_min <= o_min)
+            lost_max = (o_max >= stored[:, :, 1]) & ~(n_max >= o_max)
+            stale = (lost_min | lost_max).any(axis=1)
+            delta = acc_new.copy()
+            delta[:, :, :3] -= acc_old[:, :, :3]
+            self._upsert_rollups(conn, tier, keys, delta)
+            if not stale.any():
+                continue
+            s_sid, s_bucket = keys[0][stale].tolist(), keys[2][stale].tolist()
+            # Источник свертки - уже точный более мелкий уровень: ряд из партий, сутки из часов
+            finer = [name for name, (pb, w) in TIERS.items()
+                     if (pb if width is None else (not pb and w and w < width and width % w == 0))]
+            if finer and width is None:
+                conn.executemany(insert + f"SELECT ?, series_id, -1, 0, {folded} FROM rollup "
+                                          "WHERE tier = ? AND series_id = ? GROUP BY series_id",
+                                 [(tier, finer[0], i) for i in s_sid])
+            elif finer:
+                k = f"bucket / {int(width // TIERS[finer[0]][1])}"      # целочисленное деление
+                conn.executemany(insert + f"SELECT ?, series_id, -1, {k}, {folded} FROM rollup "
+                                          f"WHERE tier = ? AND series_id = ? AND {k} = ? GROUP BY series_id, {k}",
+                                 [(tier, finer[0], i, b_) for i, b_ in zip(s_sid, s_bucket)])
+            else:
+                bucket = f"CAST(duration_hours / {width!r} AS INTEGER)"
+                # Прежний экстремум часто есть и у других партий (кривые сценариев совпадают):
+                # проба первых партий ряда по ключу, скан ряда - только если экстремум ушел
+                cells = set()
+                for j in np.flatnonzero(stale):
+                    i, b_ = int(keys[0][j]), int(keys[2][j])
+                    first = conn.execute("SELECT MIN(batch_id) FROM points WHERE series_id = ?", (i,)).fetchone()[0]
+                    for c, v in [*((c, o_min[j, c]) for c in np.flatnonzero(lost_min[j])),
+                                 *((c, o_max[j, c]) for c in np.flatnonzero(lost_max[j]))]:
+                        if conn.execute(f"SELECT 1 FROM points WHERE series_id = ? AND batch_id BETWEEN ? AND ? "
+                                        f"AND {bucket} = ? AND {_q(AGG_COLUMNS[c])} = ? LIMIT 1",
+                                        (i, first, first + _PROBE_BATCHES - 1, b_, float(v))).fetchone() is None:
+                            cells.add((i, b_))
+                            break
+                s_sid, s_bucket = [c[0] for c in cells], [c[1] for c in cells]
+                for i in sorted(set(s_sid)):
+                    wanted = sorted({b for s_, b in zip(s_sid, s_bucket) if s_ == i})
+                    conn.execute(insert + f"SELECT ?, series_id, -1, {bucket}, {parts} FROM points "
+                                          f"WHERE series_id = ? AND {bucket} IN ({', '.join('?' * len(wanted))}) "
+                                          f"GROUP BY series_id, {bucket}", (tier, i, *wanted))
+
+    def _rebuild_rollups(self, conn, series_ids):
+        """Сводки рядов series_ids заново по точкам (GROUP BY в SQLite)"""
+        if not series_ids:
+            return
+        ids = ", ".join(str(int(i)) for i in series_ids)
+        conn.execute(f"DELETE FROM rollup WHERE series_id IN ({ids})")
+        parts = ", ".join(_SQL_PARTS[p].format(_q(c)) for c in AGG_COLUMNS for p in PARTS)
+        names = ", ".join(_q(c) for c in ROLLUP_COLUMNS)
+        for tier, (per_batch, width) in TIERS.items():
+            b = "batch_id" if per_batch else None
+            k = f"CAST(duration_hours / {width!r} AS INTEGER)" if width else None
+            group = ", ".join(["series_id"] + [e for e in (b, k) if e])
+            conn.execute(f"INSERT INTO rollup (tier, series_id, batch_id, bucket, {names}) "
+                         f"SELECT ?, series_id, {b or '-1'}, {k or '0'}, {parts} FROM points "
+                         f"WHERE series_id IN ({ids}) GROUP BY {group}", (tier,))
+
+    def checkpoint(self):
+        """Перенос WAL в основной файл (после большой записи)"""
+        self.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ---------------- чтение ----------------
+
+    def _series_rows(self):
+        return self.connection().execute(
+            "SELECT id, productname, process_stage, experiment_type FROM series ORDER BY id").fetchall()
+
+    def series(self):
+        """Справочник рядов: id, продукт, этап, опыт"""
+        return pd.DataFrame(self._series_rows(), columns=['id'] + DIMENSIONS)
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM points").fetchone()[0]
+
+    def _where(self, series, filters, batch, t_range):
+        """WHERE по ключу points: id рядов из справочника + диапазоны партии и времени"""
+        # Справочник - десятки строк: фильтр в Python дешевле pandas
+        sel = series
+        for col, val in (filters or {}).items():
+            if col not in DIMENSIONS:
+                continue
+            vals = set(val) if isinstance(val, (list, tuple, set)) else {val}
+            i = 1 + DIMENSIONS.index(col)
+            sel = [r for r in sel if r[i] in vals]
+        ids = [r[0] for r in sel]
+        clauses = [f"series_id IN ({', '.join('?' * len(ids))})"] if ids else ["0"]
+        args = list(ids)
+        if isinstance(batch, tuple):
+            clauses.append("batch_id BETWEEN ? AND ?")
+            args += [int(batch[0]), int(batch[1])]
+        elif batch is not None:
+            # Равенство по партии: окно времени идет следующим полем ключа
+            clauses.append("batch_id = ?")
+            args.append(int(batch))
+        if t_range is not None:
+            clauses.append("duration_hours BETWEEN ? AND ?")
+            args += [float(t_range[0]), float(t_range[1])]
+        return " AND ".join(clauses), args
+
+    def query(self, columns=None, filters=None, batch=None, t_range=None):
+        """Диапазонный запрос: точки рядов filters ({измерение: значение или список}),
+        партии batch (номер или (от, до)) и окна времени t_range = (t0, t1), ч.
+
+        Порядок строк - ряд -> партия -> время (порядок индекса, без сортировки).
+        """
+        series = self._series_rows()
+        columns = list(columns) if columns else DIMENSIONS + KEY_COLUMNS + VALUE_COLUMNS
+        stored = [c for c in columns if c in KEY_COLUMNS + VALUE_COLUMNS]
+        where, args = self._where(series, filters, batch, t_range)
+        sql = (f"SELECT series_id{''.join(', ' + _q(c) for c in stored)} FROM points "
+               f"WHERE {where} ORDER BY series_id, batch_id, duration_hours")
+        rows = self.connection().execute(sql, args).fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), len(stored) + 1)
+        out = {}
+        sid = data[:, 0].astype(np.int64)
+        max_id = max((r[0] for r in series), default=0)
+        for c in columns:
+            if c in DIMENSIONS:
+                # Измерения восстанавливаются из справочника (категории, без строк на точку)
+                i = 1 + DIMENSIONS.index(c)
+                cats = sorted({r[i] for r in series})
+                lut = np.full(max_id + 1, -1, dtype=np.int64)
+                for r in series:
+                    lut[r[0]] = cats.index(r[i])
+                out[c] = pd.Categorical.from_codes(lut[sid], cats)
+            elif c in stored:
+                out[c] = data[:, 1 + stored.index(c)]
+        df = pd.DataFrame(out)
+        if 'batch_id' in df.columns:
+            df['batch_id'] = df['batch_id'].astype(np.int64)
+        return df
+
+    def aggregate(self, columns, by=('process_stage',), filters=None, batch=None, t_range=None,
+                  stats=('mean',), rollups=True):
+        """Агрегаты тегов columns, свернутые по by; частичные count/sum/sumsq/min/max
+        берутся из сводок (если уровень подходит) или считаются GROUP BY по точкам.
+
+        by - измерения справочника, 'batch_id', 'hour' или 'day' (час/сутки процесса);
+        stats - из 'mean', 'count', 'sum', 'min', 'max', 'std', 'var'. Одна статистика -
+        плоские колонки (как groupby().mean()), несколько - MultiIndex (колонка, статистика).
+        rollups=False - всегда по точкам (сверка). Источник - в attrs['source'].
+        """
+        series = self._series_rows()
+        columns = [c for c in columns if c in AGG_COLUMNS]
+        by = list(by)
+        tier = _pick_tier(by, batch, t_range) if rollups else None
+        where, args = self._where(series, filters, batch, None if tier else t_range)
+        if tier:
+            sql = (f"SELECT series_id, batch_id, bucket{''.join(', ' + _q(f'{c}:{p}') for c in columns for p in PARTS)} "
+                   f"FROM rollup WHERE tier = ? AND {where}")
+            args = [tier] + args
+            bucket = {'hour': 2, 'day': 2}
+        else:
+            b = 'batch_id' if 'batch_id' in by else None
+            k = next((f"CAST(duration_hours / {TIERS[c][1]!r} AS INTEGER)" for c in ('hour', 'day') if c in by),
+                     None)
+            bucket = {c: 2 for c in ('hour', 'day') if c in by}
+            group = ['series_id'] + [e for e in (b, k) if e]
+            parts = [_SQL_PARTS[p].format(_q(c)) for c in columns for p in PARTS]
+            sql = (f"SELECT series_id, {b or '-1'}, {k or '0'}, {', '.join(parts)} FROM points "
+                   f"WHERE {where} GROUP BY {', '.join(group)}")
+        rows = self.connection().execute(sql, args).fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), 3 + len(columns) * len(PARTS))
+        sid = data[:, 0].astype(np.int64)
+        lut = {r[0]: r for r in series}
+        group_keys = {c: np.array([lut[i][1 + DIMENSIONS.index(c)] for i in sid.tolist()], dtype=object)
+                      for c in by if c in DIMENSIONS}
+        if 'batch_id' in by:
+            group_keys['batch_id'] = data[:, 1].astype(np.int64)
+        for name, pos in bucket.items():
+            if name in by:
+                group_keys[name] = data[:, pos].astype(np.int64)
+        acc = data[:, 3:].reshape(len(rows), len(columns), len(PARTS))
+        out = combine({c: group_keys[c] for c in by}, acc, columns, stats)
+        out.attrs['source'] = f"сводка {tier}" if tier else "точки"
+        return out
+
+
+def _pick_tier(by, batch, t_range):
+    """Уровень сводок, из которого точно собирается запрос; None - нужен скан точек"""
+    if t_range is not None:
+        return None
+    extra = [c for c in by if c not in DIMENSIONS]
+    if not extra:
+        return 'batch' if batch is not None else 'stage'
+    if extra == ['batch_id']:
+        return 'batch'
+    if extra in (['hour'], ['day']) and batch is None:
+        return extra[0]
+    return None
+
+
+def _marks():
+    return ", ".join("?" * (2 + len(AGG_COLUMNS)))
+
+
+def _point_rows(sid, batch, values):
+    """Строки points для executemany: (series_id, batch_id, duration_hours, теги...)"""
+    return zip(sid.tolist(), batch.tolist(), *(values[:, j].tolist() for j in range(values.shape[1])))
+
+
+def _tier_keys(tier, sid, batch, hour):
+    """Ключи ячеек уровня tier из ключей (ряд, партия, час)"""
+    per_batch, width = TIERS[tier]
+    b = batch if per_batch else np.full(len(sid), -1, dtype=np.int64)
+    k = hour // int(width) if width else np.zeros(len(sid), dtype=np.int64)
+    return sid, b, k
+
+
+def _partials(keys, values):
+    """Частичные агрегаты строк values (строки × теги) по составному ключу keys.
+
+    Возвращает уникальные ключи (массив на компоненту) и acc (группы × теги × PARTS).
+    """
+    keys, order, starts = _groups(keys)
+    # Теги × строки: reduceat идет по непрерывной памяти
+    v = np.ascontiguousarray(values[order].T)
+    valid = ~np.isnan(v)
+    z = np.where(valid, v, 0.0)
+    acc = np.stack([np.add.reduceat(valid.astype(np.float64), starts, axis=1),
+                    np.add.reduceat(z, starts, axis=1),
+                    np.add.reduceat(z * z, starts, axis=1),
+                    np.fmin.reduceat(v, starts, axis=1),
+                    np.fmax.reduceat(v, starts, axis=1)], axis=-1)
+    return keys, acc.transpose(1, 0, 2)
+
+
+def _fold(keys, acc):
+    """Свертка частичных агрегатов acc (группы × теги × PARTS) по более крупному ключу"""
+    keys, order, starts = _groups(keys)
+    acc = acc[order]
+    return keys, np.concatenate([np.add.reduceat(acc[:, :, :3], starts, axis=0),
+                                 np.fmin.reduceat(acc[:, :, 3:4], starts, axis=0),
+                                 np.fmax.reduceat(acc[:, :, 4:], starts, axis=0)], axis=-1)
+
+
+def _groups(keys):
+    """Сортировка по составному ключу: уникальные ключи, порядок строк, начала групп"""
+    order = np.lexsort(keys[::-1])
+    keys = [k[order] for k in keys]
+    change = np.zeros(len(order), dtype=bool)
+    change[0] = True
+    for k in keys:
+        change[1:] |= k[1:] != k[:-1]
+    starts = np.flatnonzero(change)
+    return [k[starts] for k in keys], order, starts
+
+
+def combine(keys, acc, columns, stats=('mean',)):
+    """Свертка частичных агрегатов acc (строки × теги × PARTS) по ключам keys.
+
+    keys - {измерение: массив по строкам acc}; пустой словарь - одна итоговая строка.
+    Группы упорядочены по ключам (как groupby(sort=True)).
+    """
+    n_rows = acc.shape[0]
+    code = np.zeros(n_rows, dtype=np.int64)
+    uniques = []
+    for values in keys.values():
+        c, u = pd.factorize(values, sort=True)
+        code = code * max(len(u), 1) + c
+        uniques.append(u)
+    groups, inv = np.unique(code, return_inverse=True) if keys else (np.zeros(1, np.int64),
+                                                                     np.zeros(n_rows, np.int64))
+    g = len(groups)
+    n = np.zeros((g, len(columns)))
+    s = np.zeros((g, len(columns)))
+    ss = np.zeros((g, len(columns)))
+    lo = np.full((g, len(columns)), np.inf)
+    hi = np.full((g, len(columns)), -np.inf)
+    np.add.at(n, inv, acc[:, :, 0])
+    np.add.at(s, inv, acc[:, :, 1])
+    np.add.at(ss, inv, acc[:, :, 2])
+    # MIN/MAX пустого ряда в SQLite - NULL (nan): не участвуют
+    np.fmin.at(lo, inv, acc[:, :, 3])
+    np.fmax.at(hi, inv, acc[:, :, 4])
+    empty = n == 0
+    mean = np.divide(s, n, out=np.full_like(s, np.nan), where=~empty)
+    # Выборочная дисперсия (ddof=1, как в pandas) из сумм; остаток ниже погрешности
+    # округления sumsq - это ноль (постоянный тег), а не шум
+    m2 = ss - s * mean
+    m2 = np.where(m2 > 1e-12 * ss, m2, 0.0)
+    var = np.divide(m2, n - 1, out=np.full_like(s, np.nan), where=n > 1)
+    values = {'count': n, 'sum': s, 'min': np.where(empty, np.nan, lo), 'max': np.where(empty, np.nan, hi),
+              'mean': mean, 'var': var, 'std': np.sqrt(var)}
+
+    out = {}
+    rest = groups.copy()
+    for name, u in reversed(list(zip(keys, uniques))):
+        rest, i = np.divmod(rest, max(len(u), 1))
+        out[name] = np.asarray(u)[i]
+    out = {name: out[name] for name in keys}
+    for j, c in enumerate(columns):
+        for st in stats:
+            out[c if len(stats) == 1 else (c, st)] = values[st][:, j]
+    df = pd.DataFrame(out) if g else pd.DataFrame(columns=list(out))
+    if len(stats) > 1:
+        df.columns = pd.MultiIndex.from_tuples([c if isinstance(c, tuple) else (c, '') for c in df.columns])
+    return df
+
+
+if __name__ == "__main__":
+    # Замер на 10M строк: запись (с ведением сводок), задержка запросов, сводки vs скан точек
+    import sys
+    import tempfile
+    import time
+
+    import DB
+
+    target = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10_000_000
+    n_scen = len(DB.SCENARIOS_AYRAN) + len(DB.SCENARIOS_IRIM)
+    n_batches = -(-target // (n_scen * 50))
+
+    def timed(fn, repeat=5):
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            res = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, res
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hist = Historian(os.path.join(tmp, "bench.sqlite"))
+        rows, t_ingest = 0, 0.0
+        t_all = time.perf_counter()
+        for chunk in DB.iter_chunks(n_batches, chunk_rows=500_000):
+            t0 = time.perf_counter()
+            rows += hist.ingest(chunk)
+            t_ingest += time.perf_counter() - t0
+        hist.checkpoint()
+        t_all = time.perf_counter() - t_all
+        size = os.path.getsize(hist.path) / 1e6
+        n_rollup = hist.connection().execute("SELECT COUNT(*) FROM rollup").fetchone()[0]
+        print(f"📥 Запись: {rows:,} строк ({n_batches:,} партий × {n_scen} сценариев × 50 точек), "
+              f"executemany + сводки {rows / t_ingest:,.0f} строк/с, с генерацией {rows / t_all:,.0f} строк/с, "
+              f"файл {size:,.0f} МБ, строк сводок {n_rollup:,}")
+
+        ayran = {'productname': 'Айран', 'experiment_type': 'Опыт 2 (Сироп 3%)'}
+        product = {'productname': 'Айран'}
+        kpi = ['ph', 'кислотность', 'viscosity_mpa_s', 'fat_pct', 'protein_pct', 'kmafanm']
+        ranges = [
+            ("партия, окно 2..8 ч", lambda: hist.query(['duration_hours', 'ph'], ayran, batch=n_batches // 2,
+                                                       t_range=(2.0, 8.0))),
+            ("100 партий опыта", lambda: hist.query(['batch_id', 'duration_hours', 'ph'], ayran,
+                                                    batch=(1000, 1099))),
+            ("окно 2..8 ч, все партии опыта", lambda: hist.query(['batch_id', 'duration_hours', 'ph'], ayran,
+                                                                 t_range=(2.0, 8.0))),
+        ]
+        aggregates = [
+            ("KPI партии", dict(by=(), filters=ayran, batch=7)),
+            ("KPI продукта", dict(by=(), filters=product)),
+            ("журнал продукта по этапам", dict(by=('process_stage',), filters=product)),
+            ("профиль продукта по часам", dict(by=('hour',), filters=product)),
+            ("KPI опыта по партиям", dict(by=('batch_id',), filters=ayran)),
+        ]
+        print("⏱ Задержка запросов (лучшее из 5):")
+        for label, fn in ranges:
+            sec, res = timed(fn)
+            print(f"   - {label:30s} {sec * 1e3:9.2f} мс, строк {len(res):,}")
+        print("⏱ Агрегаты: сводка vs скан точек:")
+        for label, kw in aggregates:
+            sec, res = timed(lambda: hist.aggregate(kpi, **kw))
+            raw_sec, _ = timed(lambda: hist.aggregate(kpi, rollups=False, **kw), repeat=1)
+            print(f"   - {label:30s} {sec * 1e3:9.2f} мс ({res.attrs['source']}, групп {len(res):,}) | "
+                  f"скан {raw_sec * 1e3:,.0f} мс, x{raw_sec / sec:,.0f}")
+
+        # Точность под дозаписью и перезаписью, затем сверка со сканом:
+        # еще 100 партий (в первом чанке - одна уже записанная точка), перезапись одной партии,
+        # перезапуск генератора по первому чанку (новый шум ОВП) и повтор того же чанка
+        t0 = time.perf_counter()
+        for i, chunk in enumerate(DB.iter_chunks(100, chunk_rows=500_000)):
+            chunk = chunk.assign(batch_id=chunk['batch_id'] + n_batches)
+            if i == 0:
+                chunk = pd.concat([chunk, next(DB.iter_chunks(1)).iloc[[0]]], ignore_index=True)
+            hist.ingest(chunk)
+        t_new = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        hist.ingest(next(DB.iter_chunks(1)).assign(ph=lambda d: d['ph'] + 0.01, batch_id=3))
+        t_batch = time.perf_counter() - t0
+        rerun = next(DB.iter_chunks(n_batches, chunk_rows=500_000))
+        t0 = time.perf_counter()
+        hist.ingest(rerun)
+        t_rerun = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        hist.ingest(rerun)
+        t_same = time.perf_counter() - t0
+        print(f"📥 Повторная запись: 100 новых партий + 1 старая точка {t_new:.2f} с, перезапись партии "
+              f"{t_batch * 1e3:.0f} мс, перезапуск чанка {len(rerun):,} строк {t_rerun:.2f} с, "
+              f"тот же чанк без изменений {t_same:.2f} с")
+        stats = ('count', 'sum', 'min', 'max', 'mean', 'std')
+        worst = 0.0
+        for by in ((), ('process_stage',), ('hour',)):
+            a = hist.aggregate(kpi, by=by, filters=ayran, stats=stats)
+            b = hist.aggregate(kpi, by=by, filters=ayran, stats=stats, rollups=False)
+            for c in kpi:
+                scale = np.abs(b[(c, 'mean')].to_numpy()) * np.maximum(b[(c, 'count')].to_numpy(), 1)
+                worst = max(worst, float(np.max(np.abs(a[(c, 'sum')] - b[(c, 'sum')]) / scale)),
+                            float(np.max(np.abs(a[(c, 'max')] - b[(c, 'max')]))),
+                            float(np.max(np.abs(a[(c, 'min')] - b[(c, 'min')]))),
+                            float(np.max(np.abs(a[(c, 'count')] - b[(c, 'count')]))))
+        print(f"✅ Сводки после дозаписи и перезаписей: макс. расхождение со сканом {worst:.1e}")
+        hist.close()
@@ -0,0 +1,243 @@
+# ingest.py
+# ============================================
+# Шлюз живых датчиков: asyncio UDP -> кольцевые буферы NumPy по тегам
+# ============================================
+#
+# Запуск шлюза с имитатором ПЛК (формулы DB.py):
+#     python ingest.py serve --simulate
+# Замер пропускной способности (шлюз + имитатор в одном процессе):
+#     python ingest.py bench
+
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+import DB
+
+# Теги живых установок: (установка, колонка базы)
+TAGS = [
+    ('ferm', 'duration_hours'),     # часы процесса текущей партии
+    ('ferm', 'ph'),
+    ('ferm', 'temperature_c'),
+    ('ferm', 'viscosity_mpa_s'),
+    ('ferm', 'pressure_mpa'),
+    ('dry', 'duration_hours'),
+    ('dry', 'влага'),
+    ('dry', 'temperature_c'),
+    ('dry', 'pressure_mpa'),
+]
+TAG_IDS = {tag: i for i, tag in enumerate(TAGS)}
+
+# Формат датаграммы: массив упакованных записей (тег, время unix, значение)
+READING_DTYPE = np.dtype([('tag', '<u2'), ('ts', '<f8'), ('value', '<f4')])
+READINGS_PER_DATAGRAM = 96          # 96 × 14 байт < 1472 (одна датаграмма без фрагментации)
+# Запас чтения: столько слотов тега шлюз может переписывать прямо сейчас (одна датаграмма)
+WRITE_SLACK = READINGS_PER_DATAGRAM
+
+LIVE_RING = "Live_Ring"
+DEFAULT_PORT = 9870
+
+
+class RingStore:
+    """Кольцевые буферы фиксированного размера для всех тегов.
+
+    Каждая точка пишется дважды: в позицию p и p + capacity («зеркало»), поэтому
+    последние n точек любого тега всегда лежат непрерывно и latest() копирует их
+    одним срезом. С path буферы живут в memmap-файлах: шлюз пишет, страницы
+    открывают те же файлы только на чтение.
+    """
+
+    def __init__(self, n_tags=len(TAGS), capacity=100_000, path=None, readonly=False):
+        self.capacity = capacity
+        shape = (n_tags, 2 * capacity)
+        if path is None:
+            self.head = np.zeros(n_tags, dtype=np.int64)
+            self.ts = np.zeros(shape)
+            self.values = np.zeros(shape, dtype=np.float32)
+        elif readonly:
+            self.head = np.load(path + "_head.npy", mmap_mode="r")
+            self.ts = np.load(path + "_ts.npy", mmap_mode="r")
+            self.values = np.load(path + "_values.npy", mmap_mode="r")
+            self.capacity = self.ts.shape[1] // 2
+        else:
+            open_mm = np.lib.format.open_memmap
+            self.head = open_mm(path + "_head.npy", mode="w+", dtype=np.int64, shape=(n_tags,))
+            self.ts = open_mm(path + "_ts.npy", mode="w+", dtype=np.float64, shape=shape)
+            self.values = open_mm(path + "_values.npy", mode="w+", dtype=np.float32, shape=shape)
+
+    @classmethod
+    def open(cls, path=LIVE_RING):
+        """Буферы запущенного шлюза (только чтение); None, если шлюз не создавал файлов"""
+        if not os.path.exists(path + "_head.npy"):
+            return None
+        return cls(path=path, readonly=True)
+
+    def append(self, tags, ts, values):
+        """Пакетная запись: порядок внутри тега сохраняется, без цикла по точкам"""
+        tags = np.asarray(tags, dtype=np.int64)
+        order = np.argsort(tags, kind="stable")
+        tags, ts, values = tags[order], np.asarray(ts)[order], np.asarray(values)[order]
+        counts = np.bincount(tags, minlength=len(self.head))
+        # Номер точки внутри своего тега
+        first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        rank = np.arange(len(tags)) - first[tags]
+        pos = (self.head[tags] + rank) % self.capacity
+        for offset in (0, self.capacity):
+            self.ts[tags, pos + offset] = ts
+            self.values[tags, pos + offset] = values
+        # Счетчик сдвигается после записи данных: читатель не увидит недописанные точки
+        self.head += counts
+
+    def latest(self, tag, n):
+        """Последние n точек тега: (время, значение) - согласованная копия.
+
+        Шлюз пишет из другого процесса, поэтому окно не длиннее capacity - запас
+        (слоты, которые пишутся сейчас, в него не попадают), а если за время копии
+        счетчик ушел дальше запаса, копия повторяется.
+        """
+        i = TAG_IDS[tag] if isinstance(tag, tuple) else tag
+        room = self.capacity - min(WRITE_SLACK, self.capacity // 2)
+        while True:
+            h = int(self.head[i])
+            k = min(n, room, h)
+            end = h % self.capacity + self.capacity
+            ts, val = self.ts[i, end - k:end].copy(), self.values[i, end - k:end].copy()
+            if int(self.head[i]) - h <= room - k:
+                return ts, val
+
+    def last(self, tag):
+        ts, val = self.latest(tag, 1)
+        return (float(ts[0]), float(val[0])) if len(ts) else None
+
+
+class IngestProtocol(asyncio.DatagramProtocol):
+    """Прием датаграмм: вся датаграмма разбирается и пишется одним векторным вызовом"""
+
+    def __init__(self, store):
+        self.store = store
+        self.readings = 0
+        self.datagrams = 0
+
+    def datagram_received(self, data, addr):
+        usable = len(data) - len(data) % READING_DTYPE.itemsize
+        rec = np.frombuffer(data[:usable], dtype=READING_DTYPE)
+        rec = rec[rec['tag'] < len(self.store.head)]
+        self.store.append(rec['tag'], rec['ts'], rec['value'])
+        self.readings += len(rec)
+        self.datagrams += 1
+
+
+async def serve(store, host="127.0.0.1", port=DEFAULT_PORT):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: IngestProtocol(store), local_addr=(host, port))
+    return transport, protocol
+
+
+# ==========================================
+# ИМИТАТОР ПЛК (формулы генератора DB.py)
+# ==========================================
+
+SCENARIO_K = DB.SCENARIOS_AYRAN[0][4]     # Контроль
+# Шум датчиков по тегам (часы процесса - без шума)
+NOISE = np.array([0.0, 0.01, 0.1, 2.0, 0.002, 0.0, 0.2, 0.3, 0.002])
+
+
+def plant_values(t_h, rng):
+    """Значения всех тегов в момент процесса t_h (ч) для обеих установок + шум датчиков"""
+    ph = 5.98 - SCENARIO_K * np.log(t_h + 1)
+    visc = 1.5 + 500 * np.exp(-1.5 * (ph - 3.8))
+    w_start, k_speed = 75.0, 0.3
+    moist = 18.0 + (w_start - 18.0) * np.exp(-k_speed * t_h)
+    n = len(t_h)
+    noise = rng.normal(0, 1, (len(TAGS), n)) * NOISE[:, None]
+    clean = np.stack([t_h, ph, np.full(n, 42.0), visc, np.full(n, 0.1),
+                      t_h, moist, np.full(n, 96.0), np.full(n, 0.1)])
+    return clean + noise
+
+
+async def simulate(host="127.0.0.1", port=DEFAULT_PORT, rate=100_000, speedup=600.0,
+                   horizon=10.0, duration=None):
+    """Поток показаний со скоростью rate/с; время процесса ускорено в speedup раз и
+    зациклено по horizon часов (новая партия после окончания предыдущей)"""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+    rng = np.random.default_rng()
+    per_tick = READINGS_PER_DATAGRAM * 8                  # 8 датаграмм за такт
+    tag_ids = np.arange(per_tick) % len(TAGS)
+    sent = 0
+    t0 = time.time()
+    try:
+        while duration is None or time.time() - t0 < duration:
+            now = time.time()
+            ts = now + np.arange(per_tick) / rate
+            t_h = ((ts - t0) * speedup / 3600.0) % horizon
+            vals = plant_values(t_h[::len(TAGS)].repeat(len(TAGS))[:per_tick], rng)
+            rec = np.empty(per_tick, dtype=READING_DTYPE)
+            rec['tag'] = tag_ids
+            rec['ts'] = ts
+            rec['value'] = vals[tag_ids, np.arange(per_tick)]
+            buf = rec.tobytes()
+            step = READINGS_PER_DATAGRAM * READING_DTYPE.itemsize
+            for i in range(0, len(buf), step):
+                transport.sendto(buf[i:i + step])
+            sent += per_tick
+            # Темп: ждем, пока реальное время догонит отправленный объем
+            await asyncio.sleep(max(0.0, t0 + sent / rate - time.time()))
+    finally:
+        transport.close()
+    return sent
+
+
+async def _bench(seconds, rate):
+    store = RingStore()
+    transport, protocol = await serve(store, port=DEFAULT_PORT + 1)
+    t0 = time.perf_counter()
+    sent = await simulate(port=DEFAULT_PORT + 1, rate=rate, duration=seconds)
+    await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - t0
+    transport.close()
+    print(f"📊 Шлюз + имитатор в одном процессе (одно ядро), {seconds} с:")
+    print(f"   - отправлено {sent:,}, принято {protocol.readings:,} показаний "
+          f"({protocol.readings / elapsed:,.0f} показаний/с, {protocol.datagrams:,} датаграмм)")
+    ts, val = store.latest(('ferm', 'ph'), 5)
+    print(f"   - последние pH (копия окна): {np.round(val, 3)}")
+
+
+async def _serve_forever(args):
+    store = RingStore(capacity=args.capacity, path=args.ring)
+    transport, protocol = await serve(store, args.host, args.port)
+    print(f"📡 Шлюз слушает udp://{args.host}:{args.port}, буферы '{args.ring}_*.npy'")
+    tasks = []
+    if args.simulate:
+        tasks.append(asyncio.create_task(simulate(args.host, args.port, args.rate, args.speedup)))
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(f"   - принято {protocol.readings:,} показаний")
+    finally:
+        for task in tasks:
+            task.cancel()
+        transport.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Шлюз живых датчиков Цифрового Двойника")
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ring", default=LIVE_RING, help="Префикс memmap-файлов буферов")
+    parser.add_argument("--capacity", type=int, default=100_000, help="Точек на тег")
+    parser.add_argument("--simulate", action="store_true", help="Запустить имитатор ПЛК")
+    parser.add_argument("--rate", type=int, default=100_000, help="Показаний в секунду")
+    parser.add_argument("--speedup", type=float, default=600.0, help="Ускорение времени процесса")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Длительность замера")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        asyncio.run(_bench(args.seconds, args.rate))
+    else:
+        asyncio.run(_serve_forever(args))
@@ -0,0 +1,198 @@
+# kinetics.py
+# ============================================
+# Кинетика ферментации: рост закваски, молочная кислота и pH (RK4 по всем партиям)
+# ============================================
+#
+# Состояние партии: ln X (КОЕ/мл), лактоза S (г/л), молочная кислота P (г/л).
+#   рост:     d lnX/dt = mu_max·f(T)·стимул · S/(Ks+S) · (1 - X/Xmax) · (1 - P/Pmax)
+#   кислота:  dP/dt = (alpha·рост + beta) · X/1e9 · S/(Ks+S) · (1 - P/Pmax)  (Людекинг-Пирет)
+#   лактоза:  dS/dt = -dP/dt / Y
+#   pH = pH0 - P / буфер - дрейф·t
+# Добавки: сухая повышает белок -> буферную емкость (pH падает медленнее),
+# сироп добавляет сахар и подстегивает рост (быстрее). Иримшик при варке:
+# гибель X (k_d = 1 1/ч, как exp(-t) в DB.py), кислоты нет, pH дрейфует от уваривания.
+# Все партии интегрируются одним векторным шагом RK4 (массивы партии × состояние).
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import DB
+
+PH0 = 5.98                  # старт pH (протокол DB.py)
+X0 = 1e7                    # стартовая закваска, КОЕ/мл (DB.py: lactic_bacteria)
+X0_IRIM = 1e4               # КМАФАнМ перед варкой (DB.py: 10000·exp(-t))
+XMAX = 1e9                  # емкость среды, КОЕ/мл
+MU_MAX = 1.5                # 1/ч при 42 °C
+KS = 1.0                    # г/л, константа Моно по лактозе
+PMAX = 18.0                 # г/л, кислота останавливает рост и синтез
+ALPHA = 7.7                 # г/л кислоты на ед. прироста ln X при X = 1e9
+BETA = 0.62                 # г/(л·ч) на 1e9 КОЕ/мл, синтез без роста
+YIELD = 0.9                 # г кислоты на г лактозы
+LACTOSE = 47.0              # г/л в молоке
+SYRUP_BOOST = 0.19          # +19 % mu_max на 1 % сиропа
+BUFFER = 5.1                # г/л кислоты на единицу pH при белке 3 %
+Q10 = 2.0                   # температурный коэффициент (как в sweep.py)
+T_REF = 42.0
+KD_IRIM = 1.0               # 1/ч, гибель при варке
+DRIFT_IRIM = 0.048          # pH/ч (DB.py: 5.98 - 0.48·t/10)
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # (dt, t_max, сетка) -> кривые сценариев DB.py (LRU)
+_MAX_CACHE = 16
+
+
+def scenario_params():
+    """Параметры сценариев DB.py (8 Айрана + 3 Иримшика) в порядке генератора"""
+    names, dose, dry, ayran = [], [], [], []
+    for name, type_, d, _, _ in DB.SCENARIOS_AYRAN:
+        names.append(name)
+        dose.append(d)
+        dry.append(type_ == 'dry')
+        ayran.append(True)
+    for name, d in DB.SCENARIOS_IRIM:
+        names.append(name)
+        dose.append(d)
+        dry.append(True)
+        ayran.append(False)
+    dose = np.array(dose)
+    return {
+        'name': np.array(names, dtype=object),
+        'dose': dose,
+        'dry': np.array(dry),
+        'ayran': np.array(ayran),
+        'temp': np.where(ayran, T_REF, 96.0),
+        'x0': np.where(ayran, X0, X0_IRIM),
+    }
+
+
+def batch_params(n_batches, seed=0, spread=0.05):
+    """n_batches партий каждого сценария с разбросом закваски (±spread в ln) и уставки (±0.5 °C)"""
+    base = scenario_params()
+    n_sc = len(base['dose'])
+    rng = np.random.default_rng(seed)
+    params = {k: np.repeat(v, n_batches) for k, v in base.items()}
+    n = n_sc * n_batches
+    params['x0'] = params['x0'] * np.exp(rng.normal(0.0, spread * np.log(XMAX / X0), n))
+    params['temp'] = params['temp'] + np.where(params['ayran'], rng.normal(0.0, 0.5, n), 0.0)
+    return params
+
+
+def _coefficients(params):
+    """Постоянные партии: скорость, буфер, сахар, гибель, дрейф pH"""
+    dose = np.asarray(params['dose'], dtype=float)
+    dry = np.asarray(params['dry'], dtype=bool)
+    ayran = np.asarray(params['ayran'], dtype=bool)
+    frac = dose / 100.0
+    # Белок как в DB.py: 3.0·(1 - d) + 12.0·d для сухой добавки; буфер ~ корень из белка
+    protein = np.where(dry, 3.0 * (1 - frac) + 12.0 * frac, 3.0)
+    buffer = BUFFER * np.sqrt(protein / 3.0)
+    # Сироп: 60 % с.в. (сахар) -> +6 г/л на 1 % дозы и стимул роста
+    sugar = LACTOSE + np.where(dry, 0.0, dose * 6.0)
+    boost = 1.0 + np.where(dry, 0.0, SYRUP_BOOST * dose)
+    mu = np.where(ayran, MU_MAX * boost * Q10 ** ((np.asarray(params['temp'], dtype=float) - T_REF) / 10.0), 0.0)
+    return {
+        'mu': mu,
+        'prod': ayran.astype(float),
+        'kd': np.where(ayran, 0.0, KD_IRIM),
+        'buffer': buffer,
+        'sugar': sugar,
+        'drift': np.where(ayran, 0.0, DRIFT_IRIM),
+    }
+
+
+def _rhs(lnx, s, p, c):
+    """Производные (ln X, S, P) для всех партий сразу"""
+    x = np.exp(lnx - np.log(XMAX))          # X / Xmax
+    monod = s / (KS + s)
+    inhib = np.maximum(1.0 - p / PMAX, 0.0)
+    growth = c['mu'] * monod * (1.0 - x) * inhib
+    dp = (ALPHA * growth + BETA) * x * (XMAX / 1e9) * monod * inhib * c['prod']
+    return growth - c['kd'], -dp / YIELD, dp
+
+
+def simulate(params, t_max=10.0, dt_min=1.0):
+    """Фиксированный шаг RK4; кривые (партии × точки) с шагом dt_min.
+
+    Возвращает t (ч), X (КОЕ/мл), P (г/л), S (г/л), pH - float32 кроме t.
+    """
+    c = _coefficients(params)
+    n = len(c['mu'])
+    dt = dt_min / 60.0
+    n_steps = int(round(t_max / dt))
+    t = np.arange(n_steps + 1) * dt
+
+    lnx = np.log(np.asarray(params['x0'], dtype=float))
+    s = c['sugar'].copy()
+    p = np.zeros(n)
+    # Запись по строкам (время × партии) - непрерывные куски; наружу - транспонированный вид
+    out_lnx = np.empty((n_steps + 1, n), dtype=np.float32)
+    out_s = np.empty_like(out_lnx)
+    out_p = np.empty_like(out_lnx)
+    out_lnx[0], out_s[0], out_p[0] = lnx, s, p
+
+    h2, h6 = dt / 2.0, dt / 6.0
+    for i in range(1, n_steps + 1):
+        k1 = _rhs(lnx, s, p, c)
+        k2 = _rhs(lnx + h2 * k1[0], s + h2 * k1[1], p + h2 * k1[2], c)
+        k3 = _rhs(lnx + h2 * k2[0], s + h2 * k2[1], p + h2 * k2[2], c)
+        k4 = _rhs(lnx + dt * k3[0], s + dt * k3[1], p + dt * k3[2], c)
+        lnx = lnx + h6 * (k1[0] + 2 * (k2[0] + k3[0]) + k4[0])
+        s = np.maximum(s + h6 * (k1[1] + 2 * (k2[1] + k3[1]) + k4[1]), 0.0)
+        p = p + h6 * (k1[2] + 2 * (k2[2] + k3[2]) + k4[2])
+        out_lnx[i], out_s[i], out_p[i] = lnx, s, p
+
+    ph = PH0 - out_p / c['buffer'].astype(np.float32) - (t[:, None] * c['drift']).astype(np.float32)
+    return {'t': t, 'X': np.exp(out_lnx).T, 'P': out_p.T, 'S': out_s.T, 'pH': ph.T}
+
+
+def scenario_curves(time, dt_min=1.0):
+    """pH и численность X сценариев DB.py на сетке time (сценарий × точка) - для генератора.
+
+    X - закваска у Айрана (lactic_bacteria), выживающая КМАФАнМ у Иримшика (kmafanm).
+    """
+    time = np.asarray(time, dtype=float)
+    key = (dt_min, time.tobytes())
+    with _lock:
+        res = _cache.get(key)
+        if res is not None:
+            _cache.move_to_end(key)
+            return res
+    t_max = max(float(time.max(initial=0.0)), dt_min / 60.0)
+    n_steps = int(np.ceil(t_max * 60.0 / dt_min))
+    sim = simulate(scenario_params(), t_max=n_steps * dt_min / 60.0, dt_min=dt_min)
+    # Линейная интерполяция по узлам RK4 (узлы равномерные)
+    pos = time / (dt_min / 60.0)
+    i0 = np.minimum(pos.astype(np.int64), n_steps - 1)
+    w = (pos - i0)[None, :]
+    lerp = lambda a: a[:, i0] * (1 - w) + a[:, i0 + 1] * w
+    res = {'ph': lerp(sim['pH'].astype(float)),
+           'x': np.exp(lerp(np.log(sim['X'].astype(float))))}
+    with _lock:
+        _cache[key] = res
+        while len(_cache) > _MAX_CACHE:
+            _cache.popitem(last=False)
+    return res
+
+
+if __name__ == "__main__":
+    # Замер: 10 000 партий × 10 ч с шагом 1 мин; сверка сценариев с целями pH(10ч) DB.py
+    import time as time_mod
+
+    sim = simulate(scenario_params())
+    n_a = len(DB.SCENARIOS_AYRAN)
+    for (name, _, _, target, _), ph in zip(DB.SCENARIOS_AYRAN, sim['pH']):
+        t46 = sim['t'][np.argmax(ph <= 4.6)]
+        print(f"   - {name:20s} pH(10ч) {ph[-1]:.2f} (цель DB.py {target:.2f}), pH 4.6 за {t46:.1f} ч")
+    print(f"   - Закваска: {sim['X'][0, 0]:.0e} -> {sim['X'][0, -1]:.1e} КОЕ/мл (DB.py: 10000·e^t = "
+          f"{1e4 * np.exp(10):.1e}); Иримшик: pH(10ч) {sim['pH'][n_a, -1]:.2f}, "
+          f"КМАФАнМ {sim['X'][n_a, 0]:.0e} -> {sim['X'][n_a, -1]:.2f}")
+
+    params = batch_params(10_000 // len(scenario_params()['dose']) + 1)
+    t0 = time_mod.perf_counter()
+    sim = simulate(params)
+    elapsed = time_mod.perf_counter() - t0
+    ph = sim['pH'][params['ayran'], -1]
+    print(f"📊 {len(params['dose']):,} партий × {sim['pH'].shape[1]} точек (10 ч, шаг 1 мин), RK4: {elapsed:.2f} с; "
+          f"разброс pH(10ч) Айрана {ph.min():.2f}..{ph.max():.2f}")
@@ -3,11 +3,14 @@
 # ВЕРСИЯ: FINAL DIGITAL TWIN DASHBOARD
 # ============================================
 
-import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from data import aggregate_dataset, get_dataset, memory_note, query_dataset, query_note
+from downsample import BUDGET, thin
+from anomaly import alarms_at, scan
+from models import get_model
+from uncertainty import OVERVIEW_PATHS, alarm_probability, forecast_bands, param_distribution
 
 # ---------------- Page config ----------------
 st.set_page_config(page_title="Мониторинг Производства", layout="wide", page_icon="🧬")
@@ -114,21 +117,16 @@ st.title("🧬 Цифровой Паспорт Продукта")
 st.markdown("<div style='margin-bottom: 30px; color: #8b949e;'>Система мониторинга качества и технологических параметров</div>", unsafe_allow_html=True)
 
 # ---------------- Data Loading ----------------
-@st.cache_data
-def load_data():
-    # Приоритет: расширенная база (с новой химией) -> обычная -> пустая
-    if os.path.exists("Scientific_Data_Extended.csv"):
-        df = pd.read_csv("Scientific_Data_Extended.csv")
-    elif os.path.exists("Scientific_Data.csv"):
-        df = pd.read_csv("Scientific_Data.csv")
-    else:
-        return pd.DataFrame()
-    
-    # Нормализация имен колонок
-    df.columns = [c.lower().strip() for c in df.columns]
-    return df
+# Колонки, которые реально использует страница (KPI + журнал + прогноз)
+PAGE_COLUMNS = ('productname', 'experiment_type', 'process_stage', 'duration_hours', 'temperature_c',
+                'ph', 'влага', 'сухие_вещества', 'кислотность', 'viscosity_mpa_s', 'fat_pct',
+                'protein_pct', 'kmafanm', 'density_kg_m3', 'orp_mv', 'water_activity', 'lactic_bacteria',
+                'batch_id')
+
+PAGE = "main"
 
-df = load_data()
+# Общая база (одна на процесс): Parquet -> расширенная база -> обычная -> пустая
+df = get_dataset(('productname',))
 
 if df.empty:
     st.error("⚠️ Данные не найдены. Запустите генератор данных (generate_data.py).")
@@ -168,26 +166,32 @@ with st.sidebar:
             
         product = st.selectbox("Выберите продукт:", products, index=def_idx)
         
-        # Фильтр данных по продукту
-        sub_df = df[df[prod_col] == product].copy()
+        # Фильтр данных по продукту (запрос к историану по индексу рядов)
+        filters = {prod_col: product}
+        sub_df = query_dataset(PAGE_COLUMNS, filters, page=PAGE)
         
         # Фильтр по типу эксперимента (если есть)
+        selected_exp = 'Все партии'
         if 'experiment_type' in sub_df.columns:
             exp_types = ['Все партии'] + sorted(sub_df['experiment_type'].unique().tolist())
             selected_exp = st.selectbox("Партия / Опыт:", exp_types)
             
             if selected_exp != 'Все партии':
-                sub_df = sub_df[sub_df['experiment_type'] == selected_exp]
+                filters['experiment_type'] = selected_exp
+                sub_df = query_dataset(PAGE_COLUMNS, filters, page=PAGE)
         
         st.markdown("---")
         st.info(f"📦 Анализ по **{len(sub_df)}** точкам данных")
+        st.caption(memory_note(PAGE))
+        st.caption(query_note(PAGE))
     else:
         st.error("Ошибка структуры данных: нет колонки productname")
         st.stop()
 
 # MAIN CONTENT
-# Берем средние значения для отображения KPI
-means = sub_df.mean(numeric_only=True)
+# Берем средние значения для отображения KPI (агрегат считается в историане)
+kpi_tags = [c for c in PAGE_COLUMNS if c not in ('productname', 'experiment_type', 'process_stage', 'batch_id')]
+means = aggregate_dataset(kpi_tags, by=(), filters=filters).iloc[0]
 
 # --- 1. БЛОК KPI ---
 st.markdown(f"### 📊 Показатели качества: {product}")
@@ -247,7 +251,8 @@ with c_tech:
     if avail_cols:
         # Группируем по этапу или показываем среднее
         if 'process_stage' in sub_df.columns:
-            td = sub_df.groupby('process_stage')[avail_cols].mean(numeric_only=True).reset_index()
+            td = aggregate_dataset([c for c in avail_cols if c != 'process_stage'], by=('process_stage',),
+                                   filters=filters, page=f"{PAGE}:journal")
         else:
             td = sub_df[avail_cols].mean(numeric_only=True).to_frame().T
             td['process_stage'] = 'Производство'
@@ -259,6 +264,7 @@ with c_tech:
         # HTML таблица
         html_table = td.to_html(classes='tech-table', index=False, border=0)
         st.markdown(f'<div class="tech-container">{html_table}</div>', unsafe_allow_html=True)
+        st.caption(query_note(f"{PAGE}:journal"))
     else:
         st.info("Нет данных для отображения журнала")
 
@@ -278,23 +284,20 @@ with c_sim:
         prediction_val = 0
         model_trained = False
         
-        # Обучение модели
+        # Модель из реестра (обучается один раз на выборку, слайдер - только прогноз)
         if target_col in sub_df.columns and 'duration_hours' in sub_df.columns:
             train_data = sub_df[['duration_hours', target_col]].dropna()
             
             if len(train_data) > 5:
-                X = train_data[['duration_hours']].values
-                y = train_data[target_col].values
-                
                 # !!! ВАЖНО: Используем Логарифмическую модель для физической точности !!!
                 # Для Айрана (падение pH) и Иримшика (сушка) логарифм подходит лучше прямой
                 try:
-                    X_log = np.log(X + 1.0) # +1 чтобы избежать log(0)
-                    model = LinearRegression()
-                    model.fit(X_log, y)
+                    model = get_model(train_data['duration_hours'], train_data[target_col], 'log',
+                                      key=(str(product), None if selected_exp == 'Все партии' else selected_exp,
+                                           target_col))
                     
                     # Предсказание
-                    prediction_val = model.predict([[np.log(time_input + 1.0)]])[0]
+                    prediction_val = float(model.predict(time_input))
                     model_trained = True
                 except:
                     pass
@@ -323,10 +326,45 @@ with c_sim:
         status = "✅ НОРМА"
         status_color = "green"
         
-        if is_ayran:
+        if model_trained:
+            # Вероятность нарушения по Монте-Карло (разброс k, стартового значения и шум датчика);
+            # результат кэшируется на партию - слайдер только выбирает момент времени;
+            # обзорной странице хватает OVERVIEW_PATHS траекторий (~0.1 с на первый показ)
+            mc_mean, mc_cov = param_distribution(sub_df, target_col)
+            mc = forecast_bands(mc_mean, mc_cov, target_col, n=OVERVIEW_PATHS, key=(str(product), selected_exp))
+            probs = alarm_probability(mc, time_input)
+            alarm, p_alarm = max(probs.items(), key=lambda kv: kv[1])
+            if p_alarm >= 0.5:
+                status = f"⚠️ {alarm} ({p_alarm:.0%})"; status_color = "orange" if alarm == "НЕДОКВАС" else "red"
+            elif p_alarm >= 0.05:
+                status = f"⚠️ Риск: {alarm} ({p_alarm:.0%})"; status_color = "orange"
+        elif is_ayran:
             if prediction_val < 4.0: status = "⚠️ ПЕРЕКИСАНИЕ"; status_color = "red"
             elif prediction_val > 5.0 and time_input > 6: status = "⚠️ НЕДОКВАС"; status_color = "orange"
         else:
             if prediction_val < 15.0: status = "⚠️ ПЕРЕСУШКА"; status_color = "red"
         
-        st.markdown(f"<div style='text-align:center; color:{status_color}; font-weight:bold;'>{status}</div>", unsafe_allow_html=True)
\ No newline at end of file
+        # Потоковый детектор: все партии выборки прогоняются один раз (кэш), слайдер выбирает окно
+        anomalies = scan(sub_df, key=(str(product), selected_exp))
+        recent = alarms_at(anomalies, time_input)
+        if not recent.empty:
+            signals = ", ".join(recent['Сигнал'].unique()[:3])
+            if status_color == "green":
+                status = f"⚠️ АНОМАЛИЯ: {signals}"; status_color = "orange"
+        
+        st.markdown(f"<div style='text-align:center; color:{status_color}; font-weight:bold;'>{status}</div>", unsafe_allow_html=True)
+        st.caption(f"🛰 Детектор аномалий: {anomalies['samples']:,} отсчетов, "
+                   f"тревог за 0.5 ч: {len(recent)}, всего: {len(anomalies['alarms'])}")
+        
+        if model_trained:
+            i_t = int(np.abs(mc['t'] - time_input).argmin())
+            band = mc['bands'][target_col]
+            st.caption(f"90% интервал: {band[5][i_t]:.2f} … {band[95][i_t]:.2f} · "
+                       + " · ".join(f"P({name}) = {p:.1%}" for name, p in probs.items()))
+            with st.expander("📈 Полосы неопределенности"):
+                # Точки отбираются по медиане (LTTB) и общие для всех полос
+                idx = thin(mc['t'], band[50], BUDGET)
+                band_df = pd.DataFrame({f"P{p}": band[p][idx] for p in (5, 50, 95)},
+                                       index=pd.Index(mc['t'][idx], name='Время (ч)'))
+                st.line_chart(band_df, color=["#8b949e", color, "#8b949e"], height=200)
+                st.caption(f"{mc['n']:,} траекторий Монте-Карло")
\ No newline at end of file
@@ -0,0 +1,460 @@
+# models.py
+# ============================================
+# Реестр обученных моделей (общий для main.py и pages/3)
+# ============================================
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Формы модели: преобразование времени перед линейной регрессией
+MODEL_FORMS = {
+    'linear': lambda t: t,                 # y = a + b·t
+    'log': lambda t: np.log(t + 1.0),      # y = a + b·ln(t+1), +1 защита от log(0)
+}
+
+_lock = threading.Lock()
+_registry = OrderedDict()   # (форма, отпечаток данных) -> FittedModel (LRU)
+_MAX_MODELS = 256
+
+
+class FittedModel:
+    """Коэффициенты и метрики одной модели; прогноз без sklearn"""
+
+    def __init__(self, key, form, intercept, slope, r2, mae, n):
+        self.key = key
+        self.form = form
+        self.intercept = intercept
+        self.slope = slope
+        self.r2 = r2
+        self.mae = mae
+        self.n = n
+
+    def predict(self, t):
+        return self.intercept + self.slope * MODEL_FORMS[self.form](np.asarray(t, dtype=float))
+
+
+def data_fingerprint(t, y):
+    """Отпечаток обучающей выборки: модель переобучается, только если данные изменились"""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in (t, y):
+        arr = np.ascontiguousarray(arr, dtype=np.float64)
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def _grouped_fit(codes, x, y, n_groups):
+    """МНК y = a + b·x сразу для всех групп через групповые суммы (np.bincount).
+
+    Проход 1 - средние; проход 2 - центрированные суммы Sxx, Sxy, Syy
+    (численно устойчиво); проход 3 - остатки для MAE и R².
+    Совпадает с sklearn LinearRegression + r2_score/mean_absolute_error.
+    """
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    safe_n = np.where(n > 0, n, 1.0)
+    mx = np.bincount(codes, x, n_groups) / safe_n
+    my = np.bincount(codes, y, n_groups) / safe_n
+
+    dx = x - mx[codes]
+    dy = y - my[codes]
+    sxx = np.bincount(codes, dx * dx, n_groups)
+    sxy = np.bincount(codes, dx * dy, n_groups)
+    syy = np.bincount(codes, dy * dy, n_groups)
+
+    # Вырожденная группа (все t одинаковы): наклон 0, как у sklearn
+    slope = np.divide(sxy, sxx, out=np.zeros(n_groups), where=sxx > 0)
+    intercept = my - slope * mx
+
+    res = dy - slope[codes] * dx
+    ss_res = np.bincount(codes, res * res, n_groups)
+    mae = np.bincount(codes, np.abs(res), n_groups) / safe_n
+    # r2_score: при постоянном y - 1.0 для точного прогноза, иначе 0.0
+    r2 = np.where(syy > 0, 1.0 - ss_res / np.where(syy > 0, syy, 1.0), np.where(ss_res == 0, 1.0, 0.0))
+    return intercept, slope, r2, mae, n
+
+
+def fit_groups(df, by, x_col='duration_hours', y_col='ph', form='log'):
+    """Модели для всех групп DataFrame одним векторным проходом.
+
+    by - колонка или список колонок группировки, например
+    ['productname', 'experiment_type', 'batch_id']. Возвращает таблицу
+    a (intercept), b (slope), r2, mae, n с индексом по группам.
+    """
+    sub = df[list(np.atleast_1d(by)) + [x_col, y_col]].dropna()
+    grouper = sub.groupby(by, sort=True, observed=True)
+    codes = grouper.ngroup().to_numpy()
+    index = grouper.size().index
+
+    # float32 общей базы -> float64 для МНК
+    x = MODEL_FORMS[form](sub[x_col].to_numpy(dtype=np.float64))
+    y = sub[y_col].to_numpy(dtype=np.float64)
+    intercept, slope, r2, mae, n = _grouped_fit(codes, x, y, len(index))
+    return pd.DataFrame({'a': intercept, 'b': slope, 'r2': r2, 'mae': mae, 'n': n.astype(int)}, index=index)
+
+
+def stack_batches(df, by, x_col='duration_hours', y_col='ph'):
+    """Траектории партий -> массивы (партия × точка) с маской (разная длина дополняется)"""
+    sub = df[list(np.atleast_1d(by)) + [x_col, y_col]].dropna().sort_values(list(np.atleast_1d(by)) + [x_col])
+    grouper = sub.groupby(by, sort=True, observed=True)
+    codes = grouper.ngroup().to_numpy()
+    sizes = grouper.size()
+    n_b, n_t = len(sizes), int(sizes.max()) if len(sizes) else 0
+    # Позиция точки внутри своей партии (строки уже отсортированы по партии и времени)
+    starts = np.concatenate([[0], np.cumsum(sizes.to_numpy())[:-1]])
+    pos = np.arange(len(sub)) - starts[codes]
+
+    t = np.zeros((n_b, n_t))
+    y = np.zeros((n_b, n_t))
+    mask = np.zeros((n_b, n_t), dtype=bool)
+    t[codes, pos] = sub[x_col].to_numpy(dtype=float)
+    y[codes, pos] = sub[y_col].to_numpy(dtype=float)
+    mask[codes, pos] = True
+    if n_b and mask.all() and (t == t[:1]).all():
+        # Общая сетка времени - быстрый путь в fit_drying_batches
+        t = t[0]
+    return sizes.index, t, y, mask
+
+
+def fit_ph_batches(t, ph, mask=None):
+    """pH = pH0 - k·ln(t+1) для всех партий (модель линейна по параметрам - точное МНК)"""
+    # Измерения в общей базе и хранилище траекторий - float32, МНК считается в float64
+    ph = np.asarray(ph, dtype=np.float64)
+    mask = np.ones(ph.shape, dtype=bool) if mask is None else mask
+    codes = np.broadcast_to(np.arange(ph.shape[0])[:, None], ph.shape)[mask]
+    x = np.log(np.broadcast_to(t, ph.shape)[mask] + 1.0)
+    ph0, slope, r2, mae, _ = _grouped_fit(codes, x, ph[mask], ph.shape[0])
+    return {'ph0': ph0, 'k': -slope, 'r2': r2, 'mae': mae}
+
+
+def fit_drying_batches(t, w, mask=None, n_iter=6, k_bounds=(0.01, 5.0)):
+    """w = w_final + (w_start - w_final)·exp(-k·t) для всех партий: пакетный Левенберг–Марквардт.
+
+    t, w - массивы (партия × точка), mask - валидные точки. При известном k модель
+    линейна по (w_final, A = w_start - w_final), поэтому старт ищется перебором k по
+    лог-сетке с точным МНК для (w_final, A) (variable projection), затем фиксированное
+    число векторных итераций LM уточняет все три параметра сразу для всех партий.
+    """
+    shared_t = np.ndim(t) == 1
+    t_grid = np.asarray(t, dtype=float)
+    w = np.asarray(w, dtype=np.float64)
+    t = np.broadcast_to(t_grid, w.shape)
+    mask = np.ones(w.shape, dtype=bool) if mask is None else mask
+    m = mask.astype(float)
+    w = np.where(mask, w, 0.0)
+    n = m.sum(1)
+    s1, sy = n, w.sum(1)
+
+    def linear_part(k):
+        # МНК 2×2 по (w_final, A) для каждой партии при заданном k
+        e = m * np.exp(-k[:, None] * t)
+        se, see, sey = e.sum(1), (e * e).sum(1), (e * w).sum(1)
+        det = s1 * see - se * se
+        det = np.where(np.abs(det) > 1e-12, det, 1e-12)
+        wf, amp = (see * sy - se * sey) / det, (s1 * sey - se * sy) / det
+        r = m * (w - wf[:, None]) - amp[:, None] * e
+        return wf, amp, (r * r).sum(1)
+
+    # --- Старт: лучший k на лог-сетке ---
+    k_grid = np.geomspace(k_bounds[0], k_bounds[1], 32)
+    if shared_t:
+        # Общая сетка времени: суммы для всех k сразу - матричные произведения (партия × k)
+        E = np.exp(-k_grid[:, None] * t_grid)
+        se, see, sey = m @ E.T, m @ (E * E).T, w @ E.T
+        det = s1[:, None] * see - se * se
+        det = np.where(np.abs(det) > 1e-12, det, 1e-12)
+        wf_g = (see * sy[:, None] - se * sey) / det
+        amp_g = (s1[:, None] * sey - se * sy[:, None]) / det
+        # Остаток МНК: sum(w²) - wf·sum(w) - A·sum(e·w)
+        cost_g = (w * w).sum(1)[:, None] - wf_g * sy[:, None] - amp_g * sey
+        k = k_grid[np.argmin(cost_g, axis=1)]
+    else:
+        k = np.full(len(w), k_bounds[0])
+        best = np.full(len(w), np.inf)
+        for kg in k_grid:
+            _, _, cost_g = linear_part(np.full(len(w), kg))
+            better = cost_g < best
+            k = np.where(better, kg, k)
+            best = np.where(better, cost_g, best)
+    wf, amp, cost = linear_part(k)
+    p = np.stack([wf, amp, k], axis=1)
+
+    def residuals(p):
+        return m * (w - (p[:, 0:1] + p[:, 1:2] * np.exp(-p[:, 2:3] * t)))
+
+    r = residuals(p)
+    lam = np.full(len(p), 1e-3)
+    for _ in range(n_iter):
+        e = m * np.exp(-p[:, 2:3] * t)
+        g = -p[:, 1:2] * t * e                    # d f / d k
+        # J^T J и J^T r из сумм (столбцы якобиана: 1, e, g)
+        JTJ = np.empty((len(p), 3, 3))
+        JTJ[:, 0, 0] = n
+        JTJ[:, 0, 1] = JTJ[:, 1, 0] = e.sum(1)
+        JTJ[:, 0, 2] = JTJ[:, 2, 0] = g.sum(1)
+        JTJ[:, 1, 1] = (e * e).sum(1)
+        JTJ[:, 1, 2] = JTJ[:, 2, 1] = (e * g).sum(1)
+        JTJ[:, 2, 2] = (g * g).sum(1)
+        JTr = np.stack([r.sum(1), (e * r).sum(1), (g * r).sum(1)], axis=1)
+        A = JTJ + lam[:, None, None] * (JTJ * np.eye(3)) + 1e-12 * np.eye(3)
+        step = np.linalg.solve(A, JTr[:, :, None])[:, :, 0]
+        p_new = p + step
+        p_new[:, 2] = np.clip(p_new[:, 2], *k_bounds)
+        r_new = residuals(p_new)
+        cost_new = (r_new * r_new).sum(1)
+        # Принятие шага по каждой партии отдельно
+        ok = cost_new < cost
+        p = np.where(ok[:, None], p_new, p)
+        r = np.where(ok[:, None], r_new, r)
+        cost = np.where(ok, cost_new, cost)
+        lam = np.where(ok, lam / 3.0, lam * 4.0)
+
+    return {'w_final': p[:, 0], 'w_start': p[:, 0] + p[:, 1], 'k': p[:, 2],
+            'rmse': np.sqrt(cost / np.where(n > 0, n, 1.0))}
+
+
+def _fit(t, y, form):
+    x = MODEL_FORMS[form](t)
+    intercept, slope, r2, mae, _ = _grouped_fit(np.zeros(len(x), dtype=np.intp), x, y, 1)
+    return float(intercept[0]), float(slope[0]), float(r2[0]), float(mae[0])
+
+
+def get_model(t, y, form='log', key=None):
+    """Модель из реестра: обучается один раз на (форма, отпечаток данных).
+
+    key - только метка для отчета, например (продукт, опыт, цель): в поиск не входит,
+    поэтому страницы с разными метками получают одну модель на одних и тех же данных.
+    """
+    t = np.asarray(t, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    reg_key = (form, data_fingerprint(t, y))
+    with _lock:
+        model = _registry.get(reg_key)
+        if model is not None:
+            _registry.move_to_end(reg_key)
+            return model
+
+    intercept, slope, r2, mae = _fit(t, y, form)
+    model = FittedModel(key, form, intercept, slope, r2, mae, len(t))
+    with _lock:
+        _registry[reg_key] = model
+        while len(_registry) > _MAX_MODELS:
+            _registry.popitem(last=False)
+    return model
+
+
+def registry_table():
+    """Содержимое реестра: ключ, форма, коэффициенты и метрики"""
+    with _lock:
+        models = list(_registry.values())
+    return pd.DataFrame([{'ключ': m.key, 'форма': m.form, 'a': m.intercept, 'b': m.slope,
+                          'R²': m.r2, 'MAE': m.mae, 'точек': m.n} for m in models])
+
+
+# Статусы партии относительно цели (коды solve_time_to_target)
+TARGET_STATUS = ('в работе', 'цель пройдена', 'не достигается')
+
+
+def solve_time_to_target(a, b, target, elapsed=0.0, start=None, min_slope=1e-3, max_hours=1e6):
+    """Когда каждая партия достигнет target по модели y = a + b·ln(t+1).
+
+    a, b, target, elapsed - массивы (или скаляры) по партиям; elapsed - часы с начала
+    партии, start - моменты начала (datetime64) для абсолютного прогноза eta.
+    Наклон |b| <= min_slope или пересечение позже max_hours - цель не достигается (nan/NaT);
+    момент пересечения не позже elapsed - цель уже пройдена (остаток 0).
+    Возвращает t_hit (ч от начала), remaining (ч), status (коды TARGET_STATUS), eta.
+    """
+    a, b, target, elapsed = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (a, b, target, elapsed)))
+    ok = np.abs(b) > min_slope
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        t_hit = np.expm1(np.where(ok, (target - a) / np.where(ok, b, 1.0), np.nan))
+    # Пересечение до старта (t < 0) - продукт уже на цели с начала партии
+    t_hit = np.where(t_hit <= max_hours, np.maximum(t_hit, 0.0), np.nan)
+    passed = t_hit <= elapsed
+    status = np.where(np.isnan(t_hit), 2, np.where(passed, 1, 0)).astype(np.int8)
+    out = {'t_hit': t_hit, 'remaining': np.where(passed, 0.0, t_hit - elapsed), 'status': status}
+    if start is not None:
+        micros = np.round(np.nan_to_num(t_hit) * 3.6e9).astype(np.int64)
+        eta = np.asarray(start, dtype="datetime64[us]") + micros.astype("timedelta64[us]")
+        out['eta'] = np.where(np.isnan(t_hit), np.datetime64("NaT"), eta)
+    return out
+
+
+class OnlineLogForecaster:
+    """Рекурсивный МНК для y = a + b·ln(t+1) по тысячам партий одновременно.
+
+    Состояние партии - 7 чисел в общих массивах (a, b, симметричная P 2×2, последние t и y)
+    и счетчик точек; каждое показание обновляет его за O(1) без хранения истории.
+    forgetting < 1 - экспоненциальное забывание старых точек (дрейф процесса).
+    """
+
+    def __init__(self, n_batches, forgetting=1.0, delta=1e4):
+        self.forgetting = forgetting
+        self.delta = delta
+        self.theta = np.zeros((n_batches, 2))          # a, b
+        self.p = np.zeros((n_batches, 3))              # p00, p01, p11
+        self.t_last = np.full(n_batches, np.nan)
+        self.y_last = np.full(n_batches, np.nan)
+        self.n = np.zeros(n_batches, dtype=np.int64)
+        self.reset()
+
+    def reset(self, idx=slice(None)):
+        """Новая партия в слотах idx: априорная P = delta·I, коэффициенты нулевые"""
+        self.theta[idx] = 0.0
+        self.p[idx] = (self.delta, 0.0, self.delta)
+        self.t_last[idx] = np.nan
+        self.y_last[idx] = np.nan
+        self.n[idx] = 0
+
+    def _step(self, idx, t, y):
+        x = np.log(t + 1.0)
+        p00, p01, p11 = self.p[idx].T
+        px0 = p00 + p01 * x
+        px1 = p01 + p11 * x
+        k0, k1 = (arr / (self.forgetting + px0 + px1 * x) for arr in (px0, px1))
+        a, b = self.theta[idx].T
+        err = y - (a + b * x)
+        self.theta[idx] = np.column_stack([a + k0 * err, b + k1 * err])
+        self.p[idx] = np.column_stack([p00 - k0 * px0, p01 - k0 * px1, p11 - k1 * px1]) / self.forgetting
+        self.t_last[idx] = t
+        self.y_last[idx] = y
+        self.n[idx] += 1
+
+    def update(self, idx, t, y):
+        """Показания (партия, t, y); несколько точек одной партии применяются по порядку"""
+        idx = np.atleast_1d(np.asarray(idx, dtype=np.intp))
+        t = np.broadcast_to(np.asarray(t, dtype=float), idx.shape)
+        y = np.broadcast_to(np.asarray(y, dtype=float), idx.shape)
+        order = np.argsort(idx, kind="stable")
+        counts = np.bincount(idx, minlength=len(self.n))
+        # Номер показания внутри своей партии: шаг r обновляет каждую партию не более раза
+        rank = np.empty(len(idx), dtype=np.intp)
+        rank[order] = np.arange(len(idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+        for r in range(int(rank.max()) + 1 if len(idx) else 0):
+            sel = rank == r
+            self._step(idx[sel], t[sel], y[sel])
+
+    def update_block(self, i, t, y):
+        """Все показания одной партии i разом - точный эквивалент update() по порядку.
+
+        Информационная форма РМНК: P^-1 <- λ^m·P^-1 + Σ λ^(m-1-k)·x_k·x_kᵀ,
+        P^-1·θ <- λ^m·P^-1·θ + Σ λ^(m-1-k)·x_k·y_k; цена - O(m) векторно, состояние O(1).
+        """
+        t = np.asarray(t, dtype=float)
+        y = np.asarray(y, dtype=float)
+        m = len(t)
+        if m == 0:
+            return
+        x = np.log(t + 1.0)
+        w = self.forgetting ** np.arange(m - 1, -1, -1, dtype=float)
+        decay = self.forgetting ** m
+        p00, p01, p11 = self.p[i]
+        info = decay * np.linalg.inv([[p00, p01], [p01, p11]])
+        rhs = info @ self.theta[i]
+        info = info + np.array([[w.sum(), w @ x], [w @ x, w @ (x * x)]])
+        rhs = rhs + np.array([w @ y, w @ (x * y)])
+        p = np.linalg.inv(info)
+        self.theta[i] = p @ rhs
+        self.p[i] = (p[0, 0], p[0, 1], p[1, 1])
+        self.t_last[i] = t[-1]
+        self.y_last[i] = y[-1]
+        self.n[i] += m
+
+    def predict(self, idx, t):
+        a, b = self.theta[idx].T
+        return a + b * np.log(np.asarray(t, dtype=float) + 1.0)
+
+    def time_to_target(self, idx, target):
+        """Оставшиеся часы до target от последнего показания (nan - цель не достигается)"""
+        a, b = self.theta[idx].T
+        remaining = solve_time_to_target(a, b, target, self.t_last[idx])['remaining']
+        return np.where(self.n[idx] >= 2, remaining, np.nan)
+
+
+if __name__ == "__main__":
+    # Замер: групповой МНК vs цикл sklearn по группам (партия × сценарий)
+    import sys
+    import time
+
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import r2_score, mean_absolute_error
+
+    import DB
+
+    n_batches = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    df = pd.concat(DB.iter_chunks(n_batches=n_batches), ignore_index=True)
+    by = ['productname', 'experiment_type', 'batch_id']
+
+    t0 = time.perf_counter()
+    fast = fit_groups(df, by, y_col='ph')
+    t_fast = time.perf_counter() - t0
+
+    # sklearn: подвыборка групп (полный цикл слишком долгий), скорость экстраполируется
+    n_check = min(len(fast), 1000)
+    groups = list(df.groupby(by, sort=True, observed=True))[:n_check]
+    t0 = time.perf_counter()
+    ref = []
+    for key, g in groups:
+        X = np.log(g[['duration_hours']].to_numpy(dtype=float) + 1.0)
+        yv = g['ph'].to_numpy(dtype=float)
+        reg = LinearRegression().fit(X, yv)
+        pred = reg.predict(X)
+        ref.append((reg.intercept_, reg.coef_[0], r2_score(yv, pred), mean_absolute_error(yv, pred)))
+    t_skl = time.perf_counter() - t0
+    ref = np.array(ref)
+    diff = np.abs(fast[['a', 'b', 'r2', 'mae']].to_numpy()[:n_check] - ref).max()
+
+    print(f"📊 Групп: {len(fast):,}, строк: {len(df):,}")
+    print(f"   - Групповой МНК: {t_fast:.3f} с ({len(fast) / t_fast:,.0f} групп/с)")
+    print(f"   - sklearn цикл:  {t_skl:.3f} с на {n_check} групп ({n_check / t_skl:,.0f} групп/с)")
+    print(f"   - Ускорение: x{(len(fast) / t_fast) / (n_check / t_skl):,.0f}; макс. расхождение с sklearn: {diff:.2e}")
+
+    # Замер: нелинейная оценка (k, w_start, w_final) сушки Иримшика, 10k партий с шумом
+    rng = np.random.default_rng(0)
+    t_grid = np.linspace(0, 10, 50)
+    k_true = rng.uniform(0.2, 0.5, 10_000)
+    ws_true = rng.uniform(65, 78, 10_000)
+    wf_true = rng.uniform(15, 22, 10_000)
+    w = wf_true[:, None] + (ws_true - wf_true)[:, None] * np.exp(-k_true[:, None] * t_grid)
+    w += rng.normal(0, 0.3, w.shape)
+    t0 = time.perf_counter()
+    est = fit_drying_batches(t_grid, w)
+    t_lm = time.perf_counter() - t0
+    print(f"📊 Сушка, {len(w):,} партий × {len(t_grid)} точек (шум 0.3%): {t_lm:.3f} с")
+    print(f"   - |Δk| медиана {np.median(np.abs(est['k'] - k_true)):.4f}, "
+          f"|Δw_final| медиана {np.median(np.abs(est['w_final'] - wf_true)):.3f}, RMSE {est['rmse'].mean():.3f}")
+
+    # Замер: онлайн-РМНК по 10k партий, показания поступают по одному на партию за такт
+    y_ph = 5.98 - DB.SCENARIOS_AYRAN[0][4] * np.log(t_grid + 1.0) + rng.normal(0, 0.01, (10_000, len(t_grid)))
+    rls = OnlineLogForecaster(10_000)
+    all_idx = np.arange(10_000)
+    t0 = time.perf_counter()
+    for j, tj in enumerate(t_grid):
+        rls.update(all_idx, tj, y_ph[:, j])
+        eta = rls.time_to_target(all_idx, 4.6)
+        if j == len(t_grid) // 5:
+            eta_mid, t_mid = np.nanmedian(eta), tj
+    t_rls = time.perf_counter() - t0
+    ref = fit_ph_batches(t_grid, y_ph)
+    n_upd = y_ph.size
+    print(f"📊 Онлайн РМНК, {len(y_ph):,} партий × {len(t_grid)} показаний: {t_rls:.3f} с "
+          f"({n_upd / t_rls:,.0f} обновлений/с, {rls.theta.nbytes + rls.p.nbytes + 3 * 8 * len(y_ph):,} байт состояния)")
+    print(f"   - |Δk| vs пакетный МНК: {np.abs(-rls.theta[:, 1] - ref['k']).max():.2e}, "
+          f"на {t_mid:.1f} ч прогноз до pH 4.6: еще {eta_mid:.2f} ч "
+          f"(истина {np.exp((5.98 - 4.6) / DB.SCENARIOS_AYRAN[0][4]) - 1 - t_mid:.2f} ч)")
+
+    # Замер: время до цели для 100k партий флота (разные коэффициенты, цели и старт)
+    n_fleet = 100_000
+    a_f = rng.normal(5.98, 0.05, n_fleet)
+    b_f = -rng.uniform(0.0, 1.0, n_fleet)               # часть наклонов вырождена
+    elapsed_f = rng.uniform(0, 12, n_fleet)
+    start_f = np.datetime64("2026-01-01T08:00") - (elapsed_f * 3.6e9).astype("timedelta64[us]")
+    t0 = time.perf_counter()
+    fleet = solve_time_to_target(a_f, b_f, 4.6, elapsed_f, start_f)
+    t_fleet = time.perf_counter() - t0
+    counts = np.bincount(fleet['status'], minlength=len(TARGET_STATUS))
+    print(f"📊 Время до цели, {n_fleet:,} партий: {t_fleet * 1e3:.1f} мс; "
+          + ", ".join(f"{s}: {c:,}" for s, c in zip(TARGET_STATUS, counts)))
+
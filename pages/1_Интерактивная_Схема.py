@@ -3,31 +3,32 @@
 # ВЕРСИЯ: SCADA FINAL (Исправлен pH для Сары ірімшік)
 # ============================================
 
-import os
+import time
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 from streamlit.components.v1 import html as st_html
 
+from data import get_dataset, memory_note, open_series_store, query_dataset, query_note
+from downsample import BUDGET, pyramid, thin
+from ingest import TAG_IDS, TAGS, RingStore
+from models import OnlineLogForecaster
+from scada import SPEEDS, line_units, render_line, scada_line, scada_player, styles
+
 # ---------------- Page config ----------------
 st.set_page_config(page_title="SCADA: Технологическая Линия", layout="wide", page_icon="🏭")
 
 # ---------------- Load Data ----------------
-@st.cache_data
-def load_data():
-    # Пытаемся загрузить расширенный файл (с новой физикой), если нет - обычный
-    if os.path.exists("Scientific_Data_Extended.csv"):
-        df = pd.read_csv("Scientific_Data_Extended.csv")
-    elif os.path.exists("Scientific_Data.csv"):
-        df = pd.read_csv("Scientific_Data.csv")
-    else:
-        return pd.DataFrame()
-        
-    # Приводим названия колонок к нижнему регистру
-    df.columns = [c.lower().strip() for c in df.columns]
-    return df
+# Колонки, которые показывает SCADA (теги установок + тренд)
+PAGE_COLUMNS = ('productname', 'duration_hours', 'experiment_type', 'process_stage', 'temperature_c',
+                'ph', 'влага', 'pressure_mpa', 'viscosity_mpa_s', 'fat_pct', 'кислотность')
 
-df = load_data()
+PAGE = "scada"
+LIVE_WINDOW = 2000        # точек тренда в режиме Live
+
+# Общая база (одна на процесс): Parquet, если нет - расширенный CSV, затем обычный
+df = get_dataset(('productname',))
 
 # ---------------- Main Interface ----------------
 st.title("🏭 Цифровой Двойник: SCADA Система")
@@ -36,6 +37,96 @@ if df.empty:
     st.error("⚠️ Файлы данных не найдены (Scientific_Data_Extended.csv). Запустите generate_data.py")
     st.stop()
 
+def paired_readings(ring, unit, y_col, n):
+    """Последние n показаний y_col и часы процесса тех же моментов.
+
+    Теги пишутся по кругу и их счетчики расходятся, поэтому пары подбираются
+    по метке времени показания (ближайшее показание часов процесса), а не по номеру.
+    """
+    ts_y, y = ring.latest((unit, y_col), n)
+    ts_t, t = ring.latest((unit, 'duration_hours'), n + len(TAGS))
+    if len(ts_t) < 2:
+        return np.full(len(y), t[0] if len(t) else np.nan), y
+    j = np.clip(np.searchsorted(ts_t, ts_y), 1, len(ts_t) - 1)
+    j -= (ts_y - ts_t[j - 1]) <= (ts_t[j] - ts_y)
+    return t[j], y
+
+
+def live_snapshot(ring, unit, y_col):
+    """Последние показания установки, окно тренда текущей партии и онлайн-прогноз"""
+    live_vals = {}
+    for tag in TAGS:
+        reading = ring.last(tag) if tag[0] == unit else None
+        if reading is not None:
+            live_vals[tag[1]] = reading[1]
+    row = pd.Series(live_vals) if live_vals else None
+    current_time = live_vals.get('duration_hours', 0.0)
+    # Окно тренда с начала текущей партии
+    t_win, y_win = paired_readings(ring, unit, y_col, LIVE_WINDOW)
+    restart = np.flatnonzero(np.diff(t_win) < 0)
+    first = restart[-1] + 1 if len(restart) else 0
+    prod_df = pd.DataFrame({'duration_hours': t_win[first:], y_col: y_win[first:]}, copy=False)
+    # Онлайн-прогноз партии (РМНК ln(t+1)): каждое новое показание учитывается ровно один раз
+    forecaster, seen = st.session_state.get(('live_rls', unit), (OnlineLogForecaster(1), None))
+    head = int(ring.head[TAG_IDS[(unit, y_col)]])
+    if seen is None or head < seen:
+        # Первое подключение или перезапуск шлюза: счет показаний с нуля
+        forecaster.reset()
+        seen = 0
+    n_new = head - seen
+    if n_new > 0:
+        t_new, y_new = paired_readings(ring, unit, y_col, min(n_new, ring.capacity))
+        restart = np.flatnonzero(np.diff(t_new) < 0)
+        first = restart[-1] + 1 if len(restart) else 0
+        # Новая партия (часы процесса пошли заново) или пропуск дальше емкости буфера
+        if (len(restart) or n_new > ring.capacity
+                or (forecaster.n[0] and len(t_new) and t_new[0] < forecaster.t_last[0])):
+            forecaster.reset()
+        forecaster.update_block(0, t_new[first:], y_new[first:])
+    st.session_state[('live_rls', unit)] = (forecaster, head)
+    return row, current_time, prod_df, forecaster
+
+
+def history_row(prod_df, current_time):
+    """Строка данных для момента времени (ближайшая точка, бинарный поиск)"""
+    if prod_df.empty:
+        return None
+    t_arr = prod_df['duration_hours'].to_numpy()
+    i = int(np.searchsorted(t_arr, current_time))
+    # Ближайший из соседей слева/справа
+    if i > 0 and (i == len(t_arr) or current_time - t_arr[i - 1] <= t_arr[i] - current_time):
+        i -= 1
+    return prod_df.iloc[i]
+
+
+def interp_getter(prod_df):
+    """Значения колонок партии на массиве моментов (линейная интерполяция по точкам базы)"""
+    t_db = prod_df['duration_hours'].to_numpy(dtype=float)
+    def at(t):
+        def get_val(col, default):
+            if col not in prod_df.columns or not pd.api.types.is_numeric_dtype(prod_df[col]):
+                return default
+            y = prod_df[col].to_numpy(dtype=float)
+            ok = ~np.isnan(y)
+            return np.interp(t, t_db[ok], y[ok]) if ok.any() else default
+        return get_val
+    return at
+
+
+def make_getter(row):
+    # Данные для отображения (с защитой от отсутствия колонок)
+    def get_val(col, default):
+        return row[col] if (row is not None and col in row) else default
+    return get_val
+
+
+def batch_info(row, current_time):
+    """Карточка сайдбара: партия, тип опыта и этап для момента current_time"""
+    exp_type = row.get('experiment_type', selected_exp or 'Стандарт')
+    stage_name = row.get('process_stage', store.stage(selected_product, selected_exp) if store else 'Производство')
+    return f"**Партия:** {'LIVE' if live else '#' + str(int(current_time*100)+1000)}\n\n**Тип:** {exp_type}\n\n**Этап:** {stage_name}"
+
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.header("🎛 Панель Диспетчера")
@@ -56,246 +147,177 @@ with st.sidebar:
     
     st.divider()
     
-    # Слайдер времени
-    prod_df = df[df[prod_col] == selected_product].sort_values('duration_hours')
-    max_t = prod_df['duration_hours'].max() if not prod_df.empty else 12.0
+    # Схема: частичное обновление (разметка один раз, дальше JSON-диф) или полный HTML
+    partial = st.radio("Рендер схемы:", ["⚡ Диф (фрагмент)", "🧱 Полный HTML"], horizontal=True) != "🧱 Полный HTML"
     
-    current_time = st.slider("Время процесса (ч):", 0.0, float(max_t), 0.0, 0.1)
+    # Источник: история из базы или живые датчики шлюза ingest.py
+    ring = RingStore.open()
+    live = ring is not None and st.radio("Источник:", ["📼 История", "📡 Live (шлюз)"], horizontal=True) != "📼 История"
     
-    # Получаем строку данных для текущего времени
-    row = None
-    if not prod_df.empty:
-        idx = (prod_df['duration_hours'] - current_time).abs().idxmin()
-        row = prod_df.loc[idx]
-            
-    if row is not None:
-        exp_type = row.get('experiment_type', 'Стандарт')
-        stage_name = row.get('process_stage', 'Производство')
-        st.info(f"**Партия:** #{int(current_time*100)+1000}\n\n**Тип:** {exp_type}\n\n**Этап:** {stage_name}")
-
-# ---------------- HTML/CSS GENERATION ----------------
-
-styles = """
-<style>
-    body { background-color: transparent; font-family: sans-serif; }
-    .scada-container { 
-        display: flex; flex-wrap: wrap; justify-content: center; 
-        align-items: flex-start; padding: 20px; gap: 30px; 
-    }
-    .unit-card {
-        background-color: #161b22; border: 1px solid #30363d; border-radius: 4px;
-        width: 260px; min-height: 200px; box-shadow: 0 4px 10px rgba(0,0,0,0.5);
-        position: relative; transition: all 0.3s ease; color: #e6edf3;
-    }
-    .unit-header {
-        background-color: #21262d; padding: 10px 15px; border-bottom: 1px solid #30363d;
-        display: flex; justify-content: space-between; align-items: center;
-    }
-    .unit-title {
-        color: #e6edf3; font-family: monospace; font-weight: bold; font-size: 14px; text-transform: uppercase;
-    }
-    .status-indicator { width: 12px; height: 12px; border-radius: 50%; background-color: #333; }
-    .status-on { background-color: #00ff88; box-shadow: 0 0 10px #00ff88; }
-    .status-heat { background-color: #ff4b4b; box-shadow: 0 0 10px #ff4b4b; animation: blink 1s infinite; }
-    .status-off { background-color: #ff4b4b; }
-    .status-idle { background-color: #555; }
-    
-    @keyframes blink { 50% { opacity: 0.5; } }
-
-    .unit-body { padding: 15px; }
-    .tag-row {
-        display: flex; justify-content: space-between; margin-bottom: 8px;
-        font-family: monospace; font-size: 13px; border-bottom: 1px dashed #30363d;
-    }
-    .tag-name { color: #8b949e; }
-    .tag-value { color: #58a6ff; font-weight: bold; }
-    .tag-unit { color: #8b949e; font-size: 11px; margin-left: 5px; }
-    .active-unit { border-color: #00ff88; box-shadow: 0 0 15px rgba(0, 255, 136, 0.15); }
-    
-    .pipe-connection { display: flex; align-items: center; justify-content: center; width: 40px; height: 100%; align-self: center; }
-    .flow-arrow { color: #30363d; font-size: 24px; }
-    .flow-active { color: #00ff88; animation: flowPulse 1s infinite; }
-    @keyframes flowPulse { 0% { opacity: 0.3; } 50% { opacity: 1; } 100% { opacity: 0.3; } }
-</style>
-"""
-
-def render_scada_unit(title, status, tags, is_active):
-    status_cls = "status-idle"
-    if status == "RUN": status_cls = "status-on"
-    elif status == "HEAT": status_cls = "status-heat"
-    elif status == "OFF": status_cls = "status-off"
-    
-    active_card_cls = "active-unit" if is_active else ""
-    
-    tags_html = ""
-    for k, (val, unit) in tags.items():
-        # Форматирование значения
-        if isinstance(val, (int, float)):
-            val_str = f"{val:.2f}" if val < 100 else f"{val:.1f}"
+    if live:
+        # Последние показания установки: ферментатор (Айран) или сушка (Иримшик)
+        unit = 'ferm' if "Айран" in str(selected_product) else 'dry'
+        y_col = 'ph' if unit == 'ferm' else 'влага'
+        selected_exp, store = "Live", None
+        row, current_time, prod_df, forecaster = live_snapshot(ring, unit, y_col)
+        auto_refresh = st.checkbox("Автообновление (1 с)", value=True, key="live_refresh")
+    else:
+        # Опыт и партия: SCADA показывает траекторию одной партии
+        store = open_series_store()
+        if store is not None and selected_product in store.products():
+            exp_options = store.experiments(selected_product)
         else:
-            val_str = str(val)
-            
-        tags_html += f"""
-        <div class="tag-row">
-            <span class="tag-name">{k}</span>
-            <div><span class="tag-value">{val_str}</span><span class="tag-unit">{unit}</span></div>
-        </div>
-        """
-
-    return f"""
-    <div class="unit-card {active_card_cls}">
-        <div class="unit-header">
-            <span class="unit-title">{title}</span>
-            <div class="status-indicator {status_cls}"></div>
-        </div>
-        <div class="unit-body">{tags_html}</div>
-    </div>
-    """
-
-def render_pipe(is_active):
-    cls = "flow-active" if is_active else ""
-    return f'<div class="pipe-connection"><div class="flow-arrow {cls}">➤</div></div>'
-
-# === ГЕНЕРАЦИЯ СХЕМЫ ===
-html_content = '<div class="scada-container">'
-
-# Данные для отображения (с защитой от отсутствия колонок)
-def get_val(col, default):
-    return row[col] if (row is not None and col in row) else default
-
-# Извлекаем параметры из базы
-temp = get_val('temperature_c', 20.0)
-ph = get_val('ph', 6.6)
-moist = get_val('влага', 88.0)
-press = get_val('pressure_mpa', 0.0)
-visc = get_val('viscosity_mpa_s', 1.5)
-fat = get_val('fat_pct', 3.2)
-if "Айран" in str(selected_product):
-    # ЛОГИКА ЭТАПОВ (АЙРАН)
-    s1 = (0.0 <= current_time < 0.5) # Приемка
-    s2 = (0.5 <= current_time < 1.0) # Гомогенизация
-    s3 = (1.0 <= current_time < 1.5) # Пастеризация
-    s4 = (2.0 <= current_time < 8.0) # Ферментация (Брожение)
-    s5 = (current_time >= 8.0)       # Розлив
-    
-    # 1. Танк Нормализации
-    # Данные: Уровень (эмуляция расхода), Температура (уставка), Жир (из базы)
-    t_norm = 42.0 if s1 else (65.0 if s2 else 20.0)
-    html_content += render_scada_unit("Танк Нормализации", "RUN" if s1 else "OFF", {
-        "Уровень": (85 - current_time*2, "%"), 
-        "Температура": (t_norm, "°C"), 
-        "Жирность": (fat, "%"),
-        "Мешалка": ("ВКЛ" if s1 else "ВЫКЛ", "")
-    }, s1)
-    html_content += render_pipe(s1)
-    
-    # 2. Гомогенизатор
-    # Данные: Давление (из базы или 12.5 МПа по стандарту), Мощность (эмуляция)
-    p_disp = press if s2 and press > 0 else (12.5 if s2 else 0)
-    html_content += render_scada_unit("Гомогенизатор", "RUN" if s2 else "OFF", {
-        "Давление": (p_disp, "МПа"), 
-        "Температура": (65.0 if s2 else 40.0, "°C"), 
-        "Мощность": (45 if s2 else 0, "кВт")
-    }, s2)
-    html_content += render_pipe(s2)
-    
-    # 3. Пастеризатор
-    # Данные: Температура выхода (84°C по схеме), Подача пара (клапан %)
-    html_content += render_scada_unit("Пастеризатор", "RUN" if s3 else "OFF", {
-        "Т_Выход": (84.0 if s3 else 65.0, "°C"), 
-        "Клапан пара": (85 if s3 else 0, "%"), 
-        "Поток": (5000 if s3 else 0, "л/ч")
-    }, s3)
-    html_content += render_pipe(s3)
-    
-    # 4. Ферментатор (Бродильный танк)
-    # Данные: pH (из базы!), Кислотность (расчет), Вязкость (из базы!)
-    acid_t = get_val('кислотность', (7 - ph) * 40)
-    html_content += render_scada_unit("Танк Ферментации", "RUN" if s4 else "OFF", {
-        "pH Продукта": (ph, ""), 
-        "Кислотность": (acid_t, "°T"), 
-        "Температура": (temp, "°C"), 
-        "Вязкость": (visc, "мПа·с")
-    }, s4)
-    html_content += render_pipe(s5)
-    
-    # 5. Линия Розлива
-    # Данные: Скорость (эмуляция), Счетчик (эмуляция)
-    html_content += render_scada_unit("Линия Розлива", "RUN" if s5 else "OFF", {
-        "Скорость": (6000 if s5 else 0, "бут/ч"), 
-        "Счетчик": (int(current_time*1200) if s5 else 0, "шт"),
-        "Т_Продукта": (4.0 if s5 else 20.0, "°C")
-    }, s5)
-
-else:
-    # ЛОГИКА ЭТАПОВ (ИРИМШИК)
-    s1 = (current_time < 1.0)        # Смесь
-    s2 = (1.0 <= current_time < 5.0) # Варка
-    s3 = (5.0 <= current_time < 6.0) # Пресс
-    s4 = (current_time >= 6.0)       # Сушка
-    
-    # 1. Ванна (Свертывание)
-    # pH берем из базы (он падает с 5.98)
-    html_content += render_scada_unit("Сыродельная Ванна", "RUN" if s1 else "OFF", {
-        "Т_Смеси": (34.0 if s1 else 20.0, "°C"), 
-        "pH Молока": (ph, ""), 
-        "Фермент": ("ВНЕСЕН" if current_time > 0.2 else "ОЖИДАНИЕ", "")
-    }, s1)
-    html_content += render_pipe(s1)
+            store = None
+            prod_all = query_dataset(PAGE_COLUMNS, {prod_col: selected_product}, page=PAGE)
+            exp_options = sorted(prod_all['experiment_type'].unique()) if 'experiment_type' in prod_all.columns else []
+        selected_exp = st.selectbox("Опыт:", exp_options) if exp_options else None
+        batch_no = 0
+        if store is not None and store.n_batches > 1:
+            batch_no = int(st.number_input("Партия №:", 0, store.n_batches - 1, 0))
     
-    # 2. Варочный Котел
-    # Температура 96.5°C (кипение), Цвет меняется
-    t_cook = 96.5 if s2 else (34.0 if s1 else 80.0)
-    status_cook = "HEAT" if s2 else "OFF"
-    html_content += render_scada_unit("Варочный Котел", status_cook, {
-        "Т_Продукта": (t_cook, "°C"), 
-        "Давление пара": (0.6 if s2 else 0, "МПа"), 
-        "Датчик Цвета": ("ЖЕЛТЫЙ" if current_time > 3 else "БЕЛЫЙ", "")
-    }, s2)
-    html_content += render_pipe(s2)
+        # Слайдер времени
+        if store is not None:
+            # Zero-copy вид траектории из memmap-хранилища (уже отсортирован по времени)
+            prod_df = store.frame(selected_product, selected_exp, batch_no, PAGE_COLUMNS)
+        else:
+            filters = {prod_col: selected_product}
+            if selected_exp is not None:
+                filters['experiment_type'] = selected_exp
+            prod_df = query_dataset(PAGE_COLUMNS, filters, page=PAGE).sort_values('duration_hours')
+        max_t = prod_df['duration_hours'].max() if not prod_df.empty else 12.0
     
-    # 3. Пресс
-    html_content += render_scada_unit("Пресс-Тележка", "RUN" if s3 else "OFF", {
-        "Усилие": (2.5 if s3 else 0, "бар"), 
-        "Слив сывор.": (50 if s3 else 0, "л/мин")
-    }, s3)
-    html_content += render_pipe(s3)
+        # В режиме «диф» слайдер времени живет во фрагменте схемы (перезапуск только схемы)
+        current_time = 0.0
+        if not partial:
+            current_time = st.slider("Время процесса (ч):", 0.0, float(max_t), 0.0, 0.1)
     
-    # 4. Сушка
-    # Влага берется из базы (падает до 18%)
-    html_content += render_scada_unit("Сушильная Камера", "RUN" if s4 else "OFF", {
-        "Т_Воздуха": (45.0 if s4 else 20.0, "°C"), 
-        "Влажность": (moist, "%"), 
-        "Цель": (18.0, "%")
-    }, s4)
-html_content += '</div>'
-
-# ВЫВОД НА ЭКРАН (Стили + HTML)
-st_html(styles + html_content, height=1000, scrolling=True)
+        # Получаем строку данных для текущего времени
+        row = history_row(prod_df, current_time)
+            
+    # В режиме «диф» карточку заполняет фрагмент схемы по своему моменту времени
+    info_box = st.empty()
+    if row is not None and not partial:
+        info_box.info(batch_info(row, current_time))
+    st.caption(memory_note(PAGE))
+    st.caption(query_note(PAGE))
 
-# --- ГРАФИКИ ВНИЗУ ---
-st.markdown("---")
-c1, c2 = st.columns([3, 1])
+# ---------------- SCADA SCHEME ----------------
 
-with c1:
+def render_trend(prod_df, row):
     st.subheader("📈 Тренд процесса")
     if row is not None:
-        chart_df = df[df[prod_col] == selected_product].copy()
+        chart_df = prod_df
         
         target = 'ph' if "Айран" in str(selected_product) else 'влага'
         if target in chart_df.columns:
             color = '#00ff88' if "Айран" in str(selected_product) else '#00bfff'
-            st.line_chart(chart_df, x='duration_hours', y=target, color=color, height=250)
+            # В браузер уходит не больше BUDGET точек: LTTB (форма) или мин-макс (огибающая с выбросами)
+            thin_mode = st.radio("Прореживание:", ["LTTB", "Мин-макс"], horizontal=True, key="trend_mode")
+            mode = 'lttb' if thin_mode == "LTTB" else 'minmax'
+            valid = chart_df[target].notna().to_numpy()
+            t_all = chart_df['duration_hours'].to_numpy()[valid]
+            y_all = chart_df[target].to_numpy()[valid]
+            if live:
+                # Окно живых буферов меняется каждую секунду - прореживаем напрямую
+                idx = thin(t_all, y_all, BUDGET, mode)
+            else:
+                # Уровни масштаба считаются один раз на партию, окно - срез готового уровня
+                pyr = pyramid((selected_product, selected_exp, batch_no, target), t_all, y_all, BUDGET, mode)
+                t_lo, t_hi = (float(t_all[0]), float(t_all[-1])) if len(t_all) else (0.0, 1.0)
+                window = (t_lo, t_hi)
+                if t_hi > t_lo:
+                    window = st.slider("Окно тренда (ч):", t_lo, t_hi, (t_lo, t_hi), key="trend_window")
+                idx = pyr.view(*window)
+            trend_df = pd.DataFrame({'duration_hours': t_all[idx], target: y_all[idx]})
+            st.line_chart(trend_df, x='duration_hours', y=target, color=color, height=250)
+            st.caption(f"Точек на графике: {len(idx):,} из {len(t_all):,}")
         else:
             st.warning(f"Нет данных по параметру '{target}' для графика")
 
-with c2:
+
+def render_kpi(row, forecaster=None):
     st.subheader("📊 KPI")
+    if live and row is not None:
+        target_val = 4.6 if unit == 'ferm' else 18.0
+        eta = float(forecaster.time_to_target(0, target_val))
+        st.metric(f"⏱ До цели ({y_col} {target_val})", f"{eta:.1f} ч" if np.isfinite(eta) else "—",
+                  help="Онлайн-РМНК по модели a + b·ln(t+1), обновляется с каждым показанием")
     if row is not None:
+        get_val = make_getter(row)
         if "Айран" in str(selected_product):
-            acid_val = get_val('кислотность', (7-ph)*40)
+            acid_val = get_val('кислотность', (7 - get_val('ph', 6.6))*40)
             st.metric("Кислотность", f"{acid_val:.0f} °T", "+2°T")
         else:
             st.metric("Выход продукта", "18.5 %", "+0.5%")
             
-        st.metric("Энергопотр.", "125 кВт")
\ No newline at end of file
+        st.metric("Энергопотр.", "125 кВт")
+
+
+if partial:
+    # Фрагмент: тик слайдера (или Live-таймер) перезапускает только схему и KPI,
+    # сайдбар и тренд истории не пересчитываются
+    @st.fragment(run_every=1.0 if live and auto_refresh else None)
+    def scheme_fragment():
+        if live:
+            row, t_now, win_df, forecaster = live_snapshot(ring, unit, y_col)
+        else:
+            if not prod_df.empty and st.toggle("▶️ Воспроизведение партии", key="play"):
+                p1, p2 = st.columns(2)
+                speed = p1.select_slider("Ускорение:", SPEEDS, value=600, format_func=lambda v: f"{v}×", key="play_speed")
+                fps = p2.select_slider("Кадров/с:", [10, 24, 30, 60], value=30, key="play_fps")
+                # Кадры считаются блоком заранее, браузер играет их сам и просит следующую порцию
+                sess = scada_player(selected_product, float(max_t), interp_getter(prod_df), speed, fps,
+                                    (selected_exp, batch_no))
+                note = (f"🎞 {sess['total']:,} кадров, предрасчет {sess['frames_built']:,} кадров "
+                        f"за {sess['build_ms']:.0f} мс")
+                stats = sess['stats']
+                if stats:
+                    note += (f" · браузер: {stats['fps']} FPS (цель {fps}), показано {stats['shown']:,}, "
+                             f"пропущено {stats['dropped']:,}")
+                st.caption(note)
+                # Момент проигрывателя - начало порции, которую играет браузер
+                t_play = sess['chunk'] * speed / (3600.0 * fps)
+                info_box.info(batch_info(history_row(prod_df, t_play), t_play))
+                return
+            t_now = st.slider("Время процесса (ч):", 0.0, float(max_t), 0.0, 0.1, key="scheme_time")
+            row, win_df, forecaster = history_row(prod_df, t_now), prod_df, None
+        if row is not None:
+            info_box.info(batch_info(row, t_now))
+        units, pipes = line_units(selected_product, t_now, make_getter(row))
+        t0 = time.perf_counter()
+        n_diff = scada_line(selected_product, units, pipes)
+        st.caption(f"⚡ Тик схемы: {n_diff} измененных элементов, {(time.perf_counter() - t0) * 1e3:.1f} мс")
+        st.markdown("---")
+        if live:
+            # Окно живых буферов тоже меняется каждый тик: тренд внутри фрагмента
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                render_trend(win_df, row)
+            with c2:
+                render_kpi(row, forecaster)
+        else:
+            with st.container(horizontal=True):
+                render_kpi(row)
+    
+    scheme_fragment()
+    if not live:
+        render_trend(prod_df, row)
+else:
+    # ВЫВОД НА ЭКРАН (Стили + HTML): вся схема заново на каждый перезапуск
+    units, pipes = line_units(selected_product, current_time, make_getter(row))
+    st_html(styles + render_line(units, pipes), height=1000, scrolling=True)
+    
+    # --- ГРАФИКИ ВНИЗУ ---
+    st.markdown("---")
+    c1, c2 = st.columns([3, 1])
+    
+    with c1:
+        render_trend(prod_df, row)
+    
+    with c2:
+        render_kpi(row, forecaster if live else None)
+    
+    # Live: перезапуск скрипта за свежими показаниями
+    if live and auto_refresh:
+        time.sleep(1.0)
+        st.rerun()
@@ -1,12 +1,16 @@
+import time
+
 import streamlit as st
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
-import os
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+from charts import cache_note, chart_key, render_png
+from data import get_dataset, memory_note, query_dataset, query_note
+from models import (TARGET_STATUS, fit_drying_batches, fit_groups, fit_ph_batches, get_model,
+                    solve_time_to_target, stack_batches)
+from plant_sim import LINE_RESOURCES, simulate, tank_sweep
+from thermal import plan_from_log, simulate_plan
 
 # ---------------- Config ----------------
 st.set_page_config(page_title="Научное Моделирование", layout="wide", page_icon="📐")
@@ -48,13 +52,12 @@ def set_dark_style(ax):
     ax.legend(facecolor='#1c2533', labelcolor='white')
 
 # ---------------- Load Data ----------------
-@st.cache_data
-def load_data():
-    if os.path.exists("Scientific_Data_Extended.csv"): return pd.read_csv("Scientific_Data_Extended.csv")
-    if os.path.exists("Scientific_Data.csv"): return pd.read_csv("Scientific_Data.csv")
-    return pd.DataFrame()
+# Для моделей нужны только время и целевые переменные
+PAGE_COLUMNS = ('productname', 'experiment_type', 'duration_hours', 'ph', 'влага')
+
+PAGE = "models"
 
-df = load_data()
+df = get_dataset(('productname',))
 
 st.title("🧬 Математическое ядро Цифрового Двойника")
 
@@ -66,7 +69,7 @@ if df.empty:
 with st.sidebar:
     st.header("⚙️ Входные параметры")
     
-    products = df['productname'].unique()
+    products = sorted(df['productname'].unique())
     prod = st.selectbox("Продукт:", products)
     
     st.markdown("---")
@@ -74,7 +77,10 @@ with st.sidebar:
     batch_volume = st.number_input("Объем партии (л):", 100, 5000, 1000)
     start_temp = st.number_input("Т° молока на входе:", 4, 25, 10)
     
-    model_df = df[df['productname'] == prod].copy()
+    model_df = query_dataset(PAGE_COLUMNS, {'productname': prod}, page=PAGE)
+    st.caption(memory_note(PAGE))
+    st.caption(query_note(PAGE))
+    st.caption(cache_note())
 
 # --- ОПРЕДЕЛЕНИЕ ЦЕЛЕВОЙ ПЕРЕМЕННОЙ ---
 if "Айран" in prod:
@@ -83,7 +89,8 @@ else:
     target_col = 'влага'; target_label = 'Влажность'; target_unit = '%'; target_goal = 18.0
 
 # --- TABS ---
-tab1, tab2, tab3, tab4 = st.tabs(["📋 14 Переменных", "🧠 Выбор Модели (R²)", "🔥 Энергетика (Физика)", "🎛 Оптимизатор"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["📋 14 Переменных", "🧠 Выбор Модели (R²)", "🔥 Энергетика (Физика)", "🎛 Оптимизатор",
+                                        "🏗 Мощность цеха"])
 
 # ==========================================
 # TAB 1: 14 ПЕРЕМЕННЫХ (Вектор состояния)
@@ -118,24 +125,22 @@ with tab2:
     if len(X) < 5:
         st.warning("Недостаточно данных для обучения.")
     else:
+        # Модели берутся из реестра: обучение один раз на выборку, здесь только прогноз
         # --- МОДЕЛЬ 1: Линейная (y = ax + b) ---
-        lin_reg = LinearRegression()
-        lin_reg.fit(X, y)
-        y_pred_lin = lin_reg.predict(X)
-        mae_lin = mean_absolute_error(y, y_pred_lin)
-        r2_lin = r2_score(y, y_pred_lin) # <--- R2 для линейной
+        lin_reg = get_model(X, y, 'linear', key=(prod, None, target_col))
+        y_pred_lin = lin_reg.predict(X.ravel())
+        mae_lin = lin_reg.mae
+        r2_lin = lin_reg.r2 # <--- R2 для линейной
         
         # --- МОДЕЛЬ 2: Логарифмическая (WINNER) ---
-        X_log = np.log(X + 1.0) # +1 защита от log(0)
-        best_reg = LinearRegression()
-        best_reg.fit(X_log, y)
-        y_pred_best = best_reg.predict(X_log)
-        mae_best = mean_absolute_error(y, y_pred_best)
-        r2_best = r2_score(y, y_pred_best) # <--- R2 для логарифмической
+        best_reg = get_model(X, y, 'log', key=(prod, None, target_col))
+        y_pred_best = best_reg.predict(X.ravel())
+        mae_best = best_reg.mae
+        r2_best = best_reg.r2 # <--- R2 для логарифмической
         
         model_name = "Логарифмическая"
-        sign = "+" if best_reg.coef_[0] >= 0 else ""
-        formula = f"{target_label} = {best_reg.intercept_:.2f} {sign}{best_reg.coef_[0]:.3f} \\cdot \\ln(t+1)"
+        sign = "+" if best_reg.slope >= 0 else ""
+        formula = f"{target_label} = {best_reg.intercept:.2f} {sign}{best_reg.slope:.3f} \\cdot \\ln(t+1)"
 
         c1, c2 = st.columns(2)
         with c1:
@@ -162,20 +167,45 @@ with tab2:
         else:
             st.warning(f"⚠️ Требуется уточнение (MAE > {acc_limit})")
             
-        # ГРАФИК
-        fig, ax = plt.subplots(figsize=(10, 5))
-        set_dark_style(ax)
-        ax.scatter(X, y, color='#00bfff', alpha=0.5, label='Факт')
-        
-        sort_idx = X.flatten().argsort()
-        ax.plot(X[sort_idx], y_pred_best[sort_idx], color='#00ff88', linewidth=3, label=f'Модель (R²={r2_best:.3f})')
-        ax.plot(X[sort_idx], y_pred_lin[sort_idx], color='#ff4b4b', linestyle='--', label=f'Линейная (R²={r2_lin:.3f})')
+        # ГРАФИК (картинка из кэша: перестраивается только при смене выборки или моделей)
+        def draw_models():
+            fig, ax = plt.subplots(figsize=(10, 5))
+            set_dark_style(ax)
+            ax.scatter(X, y, color='#00bfff', alpha=0.5, label='Факт')
+            
+            sort_idx = X.flatten().argsort()
+            ax.plot(X[sort_idx], y_pred_best[sort_idx], color='#00ff88', linewidth=3, label=f'Модель (R²={r2_best:.3f})')
+            ax.plot(X[sort_idx], y_pred_lin[sort_idx], color='#ff4b4b', linestyle='--', label=f'Линейная (R²={r2_lin:.3f})')
+            
+            ax.set_xlabel("Время, ч"); ax.set_ylabel(target_label)
+            ax.legend(facecolor='#1c2533', labelcolor='white')
+            return fig
         
-        ax.set_xlabel("Время, ч"); ax.set_ylabel(target_label)
-        ax.legend(facecolor='#1c2533', labelcolor='white')
-        st.pyplot(fig)
+        model_key = chart_key('p3_models', prod, target_label, X, y,
+                              (lin_reg.intercept, lin_reg.slope), (best_reg.intercept, best_reg.slope))
+        st.image(render_png(model_key, draw_models), width="stretch")
         
         st.info(f"**Математическое уравнение:** ${formula}$")
+        
+        # Все опыты продукта одним векторным проходом (групповой МНК)
+        if 'experiment_type' in model_df.columns:
+            with st.expander("📑 Логарифмическая модель по каждому опыту"):
+                by_exp = fit_groups(model_df, 'experiment_type', y_col=target_col, form='log')
+                by_exp = by_exp.rename(columns={'a': 'a (своб. член)', 'b': 'b (при ln(t+1))', 'r2': 'R²', 'mae': 'MAE', 'n': 'Точек'})
+                st.dataframe(by_exp.round(4), width="stretch")
+            
+            # Физические параметры генератора (pH0, k / w_start, w_final, k) - нелинейная оценка
+            with st.expander("⚗️ Кинетические параметры по опытам"):
+                keys, t_b, y_b, mask_b = stack_batches(model_df, 'experiment_type', y_col=target_col)
+                if target_col == 'ph':
+                    est = fit_ph_batches(t_b, y_b, mask_b)
+                    st.latex(r"pH = pH_0 - k \cdot \ln(t+1)")
+                    kin = pd.DataFrame({'pH₀': est['ph0'], 'k': est['k'], 'R²': est['r2'], 'MAE': est['mae']}, index=keys)
+                else:
+                    est = fit_drying_batches(t_b, y_b, mask_b)
+                    st.latex(r"W = W_{final} + (W_{start} - W_{final}) \cdot e^{-k t}")
+                    kin = pd.DataFrame({'W_start, %': est['w_start'], 'W_final, %': est['w_final'], 'k, 1/ч': est['k'], 'RMSE': est['rmse']}, index=keys)
+                st.dataframe(kin.round(4), width="stretch")
 
 # ==========================================
 # TAB 3: ЭНЕРГЕТИКА (Физика стадий)
@@ -210,6 +240,42 @@ with tab3:
         st.metric("Т° после охлаждения", f"{temp_ferm} °C")
         st.metric("Отвод тепла", f"{q_cool_kwh:.2f} кВт·ч")
         st.latex(r"Q_{cool} = m \cdot c_p \cdot (T_{past} - T_{ferm})")
+    
+    # Профиль нагрузки во времени: все партии плана цеха сразу (thermal.py)
+    st.divider()
+    st.subheader("📈 Профиль нагрузки цеха")
+    st.caption("Нагрев паром ограничен мощностью теплообменника, после выдержки - охлаждение ледяной водой. "
+               "Старты партий берутся из модели цеха (вкладка «Мощность цеха»).")
+    
+    e1, e2, e3, e4 = st.columns(4)
+    e_ayran = int(e1.number_input("Линий Айрана:", 0, 50, 1, key="energy_ayran"))
+    e_irim = int(e2.number_input("Линий Иримшика:", 0, 50, 1, key="energy_irim"))
+    e_days = int(e3.number_input("Горизонт, сутки:", 1, 30, 1, key="energy_days"))
+    regen = e4.slider("Рекуперация, %:", 0, 90, 0, 5, key="energy_regen") / 100.0
+    
+    if e_ayran + e_irim == 0:
+        st.warning("Нужна хотя бы одна линия.")
+    else:
+        t0 = time.perf_counter()
+        log = simulate({'Айран': e_ayran, 'Сары ірімшік': e_irim}, hours=e_days * 24.0,
+                       volume_l=float(batch_volume)).stage_log()
+        plan = plan_from_log(log, float(batch_volume), float(start_temp))
+        energy = simulate_plan(plan, regen=regen)
+        energy_ms = (time.perf_counter() - t0) * 1e3
+        
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Пик тепла (15 мин)", f"{energy['peak']['heat']:.0f} кВт")
+        m2.metric("Пик холода (15 мин, эл.)", f"{energy['peak']['cool']:.0f} кВт")
+        m3.metric("Тепло за период", f"{energy['kwh']['heat'] / 1e3:.2f} МВт·ч")
+        m4.metric("На партию", f"{energy['kwh']['heat'] / max(len(plan), 1):.1f} кВт·ч")
+        
+        st.area_chart(energy['profile'], height=250)
+        st.caption(f"{len(plan):,} партий, шаг 15 с: {energy_ms:.0f} мс; охлаждение в кВт электричества (COP 3)"
+                   + (f"; не завершено за 8 ч: {energy['unfinished']}" if energy['unfinished'] else ""))
+        
+        with st.expander("🌡 Одна партия: нагрев, выдержка, охлаждение"):
+            st.line_chart(energy['trace'], height=250)
+            st.dataframe(energy['batches'].round(3), width="stretch", hide_index=True)
 
 # ==========================================
 # TAB 4: ОПТИМИЗАТОР (Reverse Engineering)
@@ -220,13 +286,12 @@ with tab4:
     train_df_opt = model_df[['duration_hours', target_col]].dropna()
     
     if len(train_df_opt) > 5:
-        X_opt = np.log(train_df_opt[['duration_hours']].values + 1.0)
         y_opt = train_df_opt[target_col].values
         
-        opt_model = LinearRegression()
-        opt_model.fit(X_opt, y_opt)
+        # Та же модель, что во вкладке «Выбор Модели» (из реестра, без повторного обучения)
+        opt_model = get_model(train_df_opt['duration_hours'].values, y_opt, 'log', key=(prod, None, target_col))
         
-        a = opt_model.intercept_; b = opt_model.coef_[0]
+        a = opt_model.intercept; b = opt_model.slope
         
         c1, c2 = st.columns([1, 2])
         with c1:
@@ -238,20 +303,96 @@ with tab4:
             
             target_val = st.number_input(f"Целевой {target_label}:", min_v, max_v, def_v)
             
-            if abs(b) > 0.001:
-                t_res = np.exp((target_val - a) / b) - 1.0
-                st.success(f"⏱ Время: **{max(0, t_res):.2f} ч**")
+            t_res = solve_time_to_target(a, b, target_val)['t_hit']
+            if np.isfinite(t_res):
+                st.success(f"⏱ Время: **{float(t_res):.2f} ч**")
             else:
                 st.error("Модель не видит зависимости от времени.")
         
         with c2:
-            fig_o, ax_o = plt.subplots(figsize=(10, 4))
-            set_dark_style(ax_o)
-            t_g = np.linspace(0, 12, 100).reshape(-1,1)
-            p_g = opt_model.predict(np.log(t_g+1))
-            ax_o.plot(t_g, p_g, color='#be5bf7', linewidth=3)
-            ax_o.axhline(target_val, color='yellow', linestyle=':')
-            st.pyplot(fig_o)
+            def draw_optimizer():
+                fig_o, ax_o = plt.subplots(figsize=(10, 4))
+                set_dark_style(ax_o)
+                t_g = np.linspace(0, 12, 100)
+                p_g = opt_model.predict(t_g)
+                ax_o.plot(t_g, p_g, color='#be5bf7', linewidth=3)
+                ax_o.axhline(target_val, color='yellow', linestyle=':')
+                return fig_o
+            
+            opt_key = chart_key('p3_optimizer', a, b, float(target_val))
+            st.image(render_png(opt_key, draw_optimizer), width="stretch")
+            
+        # Все танки смены: коэффициенты опытов (партий), старт со сдвигом загрузки
+        st.subheader("🏭 Прогноз окончания по всем танкам")
+        by_fleet = [c for c in ('experiment_type', 'batch_id') if c in model_df.columns]
+        if by_fleet:
+            coefs = fit_groups(model_df, by_fleet, y_col=target_col, form='log')
+            f1, f2 = st.columns(2)
+            n_tanks = int(f1.number_input("Танков в работе:", 1, 100_000, 1000, step=100))
+            load_step = f2.number_input("Интервал загрузки, мин:", 0.0, 120.0, 1.0, step=1.0)
+            tank = np.arange(n_tanks)
+            coef = coefs.iloc[tank % len(coefs)]
+            elapsed = (n_tanks - 1 - tank) * load_step / 60.0
+            now = np.datetime64(pd.Timestamp.now().floor('min'), 'us')
+            start = now - np.round(elapsed * 3.6e9).astype('timedelta64[us]')
+            
+            t0 = time.perf_counter()
+            fleet = solve_time_to_target(coef['a'].to_numpy(), coef['b'].to_numpy(), target_val, elapsed, start)
+            solve_ms = (time.perf_counter() - t0) * 1e3
+            
+            fleet_df = pd.DataFrame({
+                'Танк': tank + 1,
+                'Опыт': coef.index.get_level_values(0) if len(by_fleet) > 1 else coef.index,
+                'Старт': start,
+                'Прошло, ч': elapsed,
+                'Осталось, ч': fleet['remaining'],
+                'Окончание': fleet['eta'],
+                'Статус': pd.Categorical.from_codes(fleet['status'], TARGET_STATUS),
+            }).sort_values(['Статус', 'Осталось, ч'])
+            counts = np.bincount(fleet['status'], minlength=len(TARGET_STATUS))
+            m1, m2, m3 = st.columns(3)
+            for col_m, label, cnt in zip((m1, m2, m3), TARGET_STATUS, counts):
+                col_m.metric(label.capitalize(), f"{cnt:,}")
+            st.dataframe(fleet_df.round(2), width="stretch", hide_index=True)
+            st.caption(f"Векторный расчет {n_tanks:,} партий: {solve_ms:.1f} мс (сортировка - по заголовку колонки)")
             
     else:
-        st.warning("Недостаточно данных для работы Оптимизатора.")
\ No newline at end of file
+        st.warning("Недостаточно данных для работы Оптимизатора.")
+
+# ==========================================
+# TAB 5: МОЩНОСТЬ ЦЕХА (дискретно-событийная модель)
+# ==========================================
+with tab5:
+    st.header("🏗 Пропускная способность цеха")
+    st.caption("Партии идут по стадиям мнемосхемы; аппарат держит партию, пока не освободится следующий. "
+               "Танк ферментации освобождается после розлива.")
+    
+    c1, c2, c3, c4 = st.columns(4)
+    n_ayran = int(c1.number_input("Линий Айрана:", 0, 50, 1))
+    n_irim = int(c2.number_input("Линий Иримшика:", 0, 50, 1))
+    n_tanks = int(c3.number_input("Танков ферментации на линию:", 1, 50, LINE_RESOURCES['Айран']['Танк ферментации']))
+    days = int(c4.number_input("Горизонт, сутки:", 1, 365, 30))
+    
+    if n_ayran + n_irim == 0:
+        st.warning("Нужна хотя бы одна линия.")
+    else:
+        t0 = time.perf_counter()
+        sim = simulate({'Айран': n_ayran, 'Сары ірімшік': n_irim}, hours=days * 24.0, volume_l=float(batch_volume),
+                       overrides={'Танк ферментации': n_tanks * n_ayran} if n_ayran else None)
+        sim_ms = (time.perf_counter() - t0) * 1e3
+        
+        st.subheader("📦 Выпуск")
+        st.dataframe(sim.product_report(float(batch_volume)).round(2), width="stretch", hide_index=True)
+        st.subheader("⚙️ Ресурсы")
+        st.dataframe(sim.resource_report().round(2), width="stretch", hide_index=True)
+        st.caption(f"{days} сут. модельного времени: {sim.events:,} событий, {sim_ms:.0f} мс "
+                   "(загрузка включает время блокировки партией)")
+        
+        if n_ayran:
+            st.subheader("🧪 Сколько танков нужно розливу")
+            sweep = tank_sweep(range(1, 17), hours=days * 24.0, volume_l=float(batch_volume), n_lines=n_ayran)
+            st.line_chart(sweep.set_index('Танков')[['Загрузка розлива, %', 'Загрузка танков, %']], height=250)
+            best = sweep['Загрузка розлива, %'].max()
+            enough = int(sweep.loc[sweep['Загрузка розлива, %'] >= 0.99 * best, 'Танков'].iloc[0])
+            st.info(f"Розлив выходит на максимум ({best:.0f} %) с **{enough}** танками на линию; "
+                    "дальше ограничивает приемка/пастеризация.")
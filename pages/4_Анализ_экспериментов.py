@@ -1,8 +1,13 @@
+import time
+
 import streamlit as st
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from charts import cache_note, chart_key, render_png
+from spc import H_CUSUM, L_EWMA, REF_BATCHES, TAG_LABELS, SpcChart, kinetic_history
+
 # ---------------- Config ----------------
 st.set_page_config(page_title="Анализ экспериментов", layout="wide", page_icon="🔬")
 
@@ -60,13 +65,18 @@ st.markdown("""
 # --- Данные и уравнения (из Отчета) ---
 t = np.linspace(2, 10, 100)
 
-# Уравнения регрессии
-ph_control = 4.605 - 0.125 * np.log(t)
-ph_exp1 = 4.535 - 0.102 * np.log(t)
-ph_exp2 = 4.506 - 0.125 * np.log(t)
+# Уравнения регрессии: pH = a - b·ln(t)
+EQUATIONS = {'control': (4.605, 0.125), 'exp1': (4.535, 0.102), 'exp2': (4.506, 0.125)}
+ph_control = EQUATIONS['control'][0] - EQUATIONS['control'][1] * np.log(t)
+ph_exp1 = EQUATIONS['exp1'][0] - EQUATIONS['exp1'][1] * np.log(t)
+ph_exp2 = EQUATIONS['exp2'][0] - EQUATIONS['exp2'][1] * np.log(t)
+
+# Графики детерминированы: картинка строится один раз на набор коэффициентов и сетку времени
+st.sidebar.caption(cache_note())
 
 # --- Вкладки ---
-tab1, tab2, tab3 = st.tabs(["📊 Общее сравнение", "🧪 Опыт 1 (Стабилизация)", "🔥 Опыт 2 (Ускорение)"])
+tab1, tab2, tab3, tab4 = st.tabs(["📊 Общее сравнение", "🧪 Опыт 1 (Стабилизация)", "🔥 Опыт 2 (Ускорение)",
+                                  "📉 Контрольные карты"])
 
 # === TAB 1: СРАВНЕНИЕ ===
 with tab1:
@@ -75,18 +85,20 @@ with tab1:
     col_gr, col_txt = st.columns([2, 1])
     
     with col_gr:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        set_dark_plot_style(ax, "Кривые сквашивания", "Время (ч)", "pH")
-        
-        ax.plot(t, ph_control, label="Контроль", color="#00bfff", linewidth=2.5) # Синий
-        ax.plot(t, ph_exp1, label="Опыт 1 (Добавка 1)", color="#00ff88", linewidth=2.5, linestyle="--") # Зеленый
-        ax.plot(t, ph_exp2, label="Опыт 2 (Добавка 2)", color="#ff4b4b", linewidth=2.5, linestyle="-.") # Красный
+        def draw_compare():
+            fig, ax = plt.subplots(figsize=(10, 6))
+            set_dark_plot_style(ax, "Кривые сквашивания", "Время (ч)", "pH")
+            
+            ax.plot(t, ph_control, label="Контроль", color="#00bfff", linewidth=2.5) # Синий
+            ax.plot(t, ph_exp1, label="Опыт 1 (Добавка 1)", color="#00ff88", linewidth=2.5, linestyle="--") # Зеленый
+            ax.plot(t, ph_exp2, label="Опыт 2 (Добавка 2)", color="#ff4b4b", linewidth=2.5, linestyle="-.") # Красный
+            
+            # Линия готовности
+            ax.axhline(y=4.6, color='yellow', alpha=0.5, linestyle=':', label='pH = 4.6 (Конец)')
+            ax.legend(facecolor='#1c2533', labelcolor='white')
+            return fig
         
-        # Линия готовности
-        ax.axhline(y=4.6, color='yellow', alpha=0.5, linestyle=':', label='pH = 4.6 (Конец)')
-        ax.legend(facecolor='#1c2533', labelcolor='white')
-        
-        st.pyplot(fig)
+        st.image(render_png(chart_key('p4_compare', t, EQUATIONS, 4.6), draw_compare), width="stretch")
         
     with col_txt:
         st.subheader("Выводы")
@@ -109,7 +121,7 @@ with tab1:
             "Опыт 2 pH": round(4.506 - 0.125 * log_t, 3)
         })
     
-    st.dataframe(pd.DataFrame(data_table), use_container_width=True)
+    st.dataframe(pd.DataFrame(data_table), width="stretch")
 
 # === TAB 2: ОПЫТ 1 ===
 with tab2:
@@ -125,11 +137,14 @@ with tab2:
         
     with c2:
         # Индивидуальный график
-        fig2, ax2 = plt.subplots(figsize=(6, 4))
-        set_dark_plot_style(ax2, "Модель Опыта 1", "Время", "pH")
-        ax2.plot(t, ph_exp1, color="#00ff88", linewidth=3)
-        ax2.fill_between(t, ph_exp1, 4.2, color="#00ff88", alpha=0.1)
-        st.pyplot(fig2)
+        def draw_exp1():
+            fig2, ax2 = plt.subplots(figsize=(6, 4))
+            set_dark_plot_style(ax2, "Модель Опыта 1", "Время", "pH")
+            ax2.plot(t, ph_exp1, color="#00ff88", linewidth=3)
+            ax2.fill_between(t, ph_exp1, 4.2, color="#00ff88", alpha=0.1)
+            return fig2
+        
+        st.image(render_png(chart_key('p4_exp1', t, EQUATIONS['exp1']), draw_exp1), width="stretch")
 
 # === TAB 3: ОПЫТ 2 ===
 with tab3:
@@ -145,8 +160,72 @@ with tab3:
         
     with c2:
         # Индивидуальный график
-        fig3, ax3 = plt.subplots(figsize=(6, 4))
-        set_dark_plot_style(ax3, "Модель Опыта 2", "Время", "pH")
-        ax3.plot(t, ph_exp2, color="#ff4b4b", linewidth=3)
-        ax3.fill_between(t, ph_exp2, 4.2, color="#ff4b4b", alpha=0.1)
-        st.pyplot(fig3)
\ No newline at end of file
+        def draw_exp2():
+            fig3, ax3 = plt.subplots(figsize=(6, 4))
+            set_dark_plot_style(ax3, "Модель Опыта 2", "Время", "pH")
+            ax3.plot(t, ph_exp2, color="#ff4b4b", linewidth=3)
+            ax3.fill_between(t, ph_exp2, 4.2, color="#ff4b4b", alpha=0.1)
+            return fig3
+        
+        st.image(render_png(chart_key('p4_exp2', t, EQUATIONS['exp2']), draw_exp2), width="stretch")
+
+# === TAB 4: КОНТРОЛЬНЫЕ КАРТЫ (SPC) ===
+with tab4:
+    st.header("Статистическое управление процессом: EWMA и CUSUM")
+    st.caption(f"Точка карты - партия: среднее отклонение от эталонного профиля опыта (первые {REF_BATCHES} партий) в σ. "
+               "В базе по одной партии на опыт, поэтому история партий строится кинетикой закваски (kinetics.py). "
+               f"Границы EWMA ±{L_EWMA}σ и CUSUM H = {H_CUSUM}σ: без дрейфа ~1 ложный сигнал на 500 партий карты.")
+    
+    c1, c2, c3 = st.columns(3)
+    n_hist = int(c1.number_input("Партий в истории (на опыт):", REF_BATCHES + 50, 3000, 365, key="spc_n"))
+    fade = c2.slider("Ослабление закваски к концу, %:", 0, 80, 0, 5, key="spc_fade")
+    fade_from = int(c3.number_input("Дрейф с партии:", 0, 3000, n_hist // 2, key="spc_from"))
+    
+    # Карты живут в сессии: кнопка дописывает партии, история не пересчитывается
+    spc_key = (n_hist, fade, fade_from)
+    spc_state = st.session_state.get("spc")
+    if spc_state is None or spc_state['key'] != spc_key:
+        t0 = time.perf_counter()
+        hist = kinetic_history(n_hist + 100, starter_fade=fade / 100.0, fade_from=fade_from)
+        chart = SpcChart().fit(hist[hist['batch_id'] < n_hist])
+        spc_state = {'key': spc_key, 'hist': hist, 'chart': chart, 'next': n_hist,
+                     'note': f"история {n_hist * 11:,} партий: {time.perf_counter() - t0:.2f} с"}
+        st.session_state["spc"] = spc_state
+    chart, hist = spc_state['chart'], spc_state['hist']
+    
+    if st.button("➕ Следующие 10 партий", disabled=spc_state['next'] >= n_hist + 100):
+        t0 = time.perf_counter()
+        nxt = spc_state['next']
+        chart.update(hist[(hist['batch_id'] >= nxt) & (hist['batch_id'] < nxt + 10)])
+        spc_state['next'] = nxt + 10
+        spc_state['note'] = f"дозапись 10 партий: {(time.perf_counter() - t0) * 1e3:.0f} мс"
+    st.caption(f"⏱ {spc_state['note']}; партий на опыт: {spc_state['next']}")
+    
+    summary = chart.summary()
+    st.dataframe(summary.round(4), width="stretch", hide_index=True)
+    
+    labels = [f"{g[0]} · {g[1]} · {TAG_LABELS.get(g[2], g[2])}" for g in chart.groups]
+    pick = st.selectbox("Карта:", range(len(labels)), format_func=lambda i: labels[i], key="spc_pick")
+    ser = chart.series(chart.groups[pick])
+    
+    def draw_spc():
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 7), sharex=True)
+        b = ser['batch_id'].to_numpy()
+        ax1.plot(b, ser['ewma'], color="#00bfff", linewidth=1.5, label="EWMA")
+        ax1.plot(b, ser['limit'], color="yellow", linestyle=":", label="±L·σ")
+        ax1.plot(b, -ser['limit'], color="yellow", linestyle=":")
+        bad = ser['ewma_ooc'].to_numpy()
+        ax1.scatter(b[bad], ser['ewma'][bad], color="#ff4b4b", s=14, zorder=3, label="Вне границ")
+        set_dark_plot_style(ax1, "EWMA отклонения партии", "", "σ")
+        ax2.plot(b, ser['cusum_hi'], color="#00ff88", linewidth=1.5, label="CUSUM ↑")
+        ax2.plot(b, ser['cusum_lo'], color="#be5bf7", linewidth=1.5, label="CUSUM ↓")
+        ax2.axhline(y=H_CUSUM, color="yellow", linestyle=":", label="H")
+        bad = ser['cusum_ooc'].to_numpy()
+        ax2.scatter(b[bad], np.maximum(ser['cusum_hi'], ser['cusum_lo'])[bad], color="#ff4b4b", s=14, zorder=3,
+                    label="Сигнал")
+        set_dark_plot_style(ax2, "Двусторонний CUSUM", "Партия", "σ")
+        fig.tight_layout()
+        return fig
+    
+    st.image(render_png(chart_key('p4_spc', labels[pick], ser[['batch_id', 'ewma', 'limit', 'cusum_hi', 'cusum_lo']].to_numpy()),
+                        draw_spc), width="stretch")
@@ -1,8 +1,13 @@
+import time
+
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
+import plotly.graph_objects as go
 from mpl_toolkits.mplot3d import Axes3D
 
+from sweep import T_REF, TEMP_STEP, GridSpec, surface, temp_grid
+
 # ---------------- Config ----------------
 st.set_page_config(page_title="3D Моделирование", layout="wide", page_icon="🧊")
 
@@ -79,11 +84,68 @@ def set_teacher_style_3d(ax, title, xlabel, ylabel, zlabel):
     ax.invert_xaxis()
     ax.invert_yaxis()
 
+def teacher_surface_figure(dose, t, Z, title, zlabel, cbar_label):
+    """Стиль преподавателя в WebGL (Plotly): белый фон, jet, шкала справа, инверсия X/Y.
+    Сетка уходит в браузер один раз (float32 в бинарном виде), вращение - без сервера."""
+    fig = go.Figure(go.Surface(
+        x=dose.astype(np.float32), y=t.astype(np.float32), z=np.ascontiguousarray(Z.T, dtype=np.float32),
+        colorscale='Jet', opacity=0.95, colorbar=dict(title=dict(text=cbar_label), len=0.6),
+    ))
+    axis = dict(color='black', backgroundcolor='white', gridcolor='#dddddd')
+    # Камера как view_init(elev=20, azim=135) у matplotlib
+    elev, azim, r = np.radians(20), np.radians(135), 2.2
+    fig.update_layout(
+        title=dict(text=f"<b>{title}</b>", x=0.5, font=dict(color='black', size=16)),
+        paper_bgcolor='white', height=750, margin=dict(l=0, r=0, t=50, b=0),
+        scene=dict(
+            # !!! ИНВЕРСИЯ ОСЕЙ (как в set_teacher_style_3d) !!!
+            xaxis=dict(title=dict(text="Доза, %"), autorange='reversed', **axis),
+            yaxis=dict(title=dict(text="Время, ч"), autorange='reversed', **axis),
+            zaxis=dict(title=dict(text=zlabel), **axis),
+            camera=dict(eye=dict(x=r * np.cos(elev) * np.cos(azim), y=r * np.cos(elev) * np.sin(azim), z=r * np.sin(elev))),
+        ),
+    )
+    return fig
+
+def render_surface(dose, t, Z, title, zlabel, cbar_label):
+    """Поверхность в выбранном режиме + время подготовки на сервере"""
+    t0 = time.perf_counter()
+    if surface_mode == "WebGL":
+        st.plotly_chart(teacher_surface_figure(dose, t, Z, title, zlabel, cbar_label), width="stretch")
+    else:
+        T, D = np.meshgrid(t, dose)
+        fig = plt.figure(figsize=(12, 10))
+        ax = fig.add_subplot(111, projection='3d')
+        
+        # X=Dose, Y=Time
+        surf = ax.plot_surface(D, T, Z, cmap='jet', edgecolor='k', linewidth=0.2, alpha=0.9)
+        
+        set_teacher_style_3d(ax, title, "\nДоза, %", "\nВремя, ч", "\n" + zlabel)
+        ax.view_init(elev=20, azim=135)
+        
+        cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=10, pad=0.1)
+        cbar.set_label(cbar_label)
+        st.pyplot(fig)
+        plt.close(fig)
+    st.caption(f"⏱ Подготовка на сервере: {(time.perf_counter() - t0) * 1e3:.0f} мс · сетка {Z.shape[0]}×{Z.shape[1]}")
+
 # ---------------- Main App ----------------
 
 st.title("🧊 3D Моделирование: Поверхности отклика")
 st.markdown("Визуализация влияния дозировок добавок на процесс.")
 
+# Разрешение сетки поверхностей: объем (температура × доза × время) считается один раз
+# по формулам DB.py и кэшируется, вкладки берут из него срез при выбранной температуре
+GRID_PRESETS = {"40 × 40": 40, "200 × 200": 200, "500 × 500": 500}
+with st.sidebar:
+    grid_n = GRID_PRESETS[st.select_slider("Сетка поверхностей:", list(GRID_PRESETS), value="200 × 200")]
+    surface_mode = st.radio("Режим 3D:", ["WebGL", "Matplotlib"], horizontal=True,
+                            help="WebGL - вращение и масштаб в браузере; Matplotlib - PNG с сервера")
+
+def temp_slider(product, lo, hi, key):
+    return st.slider("Температура процесса, °C", lo, hi, T_REF[product], TEMP_STEP, key=key,
+                     help="Уставка DB.py - исходная модель; иначе скорость × Q10^((T - уставка)/10)")
+
 # Данные моделей (2D для сравнения)
 t = np.linspace(2, 10, 100)
 ph_control = 4.605 - 0.125 * np.log(t)
@@ -120,43 +182,21 @@ with tab_ayran:
     with subtab2:
         st.subheader("Поверхность отклика: Опыт 1")
         
-        t_3d = np.linspace(2, 10, 40)
-        dose_3d = np.linspace(1, 3, 40)
-        T, D = np.meshgrid(t_3d, dose_3d)
-        
-        Z_ph = 4.8 - (0.12 * np.log(T)) - (0.02 * D) + (0.01 * T * D/10)
-        
-        fig = plt.figure(figsize=(12, 10))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        surf = ax.plot_surface(D, T, Z_ph, cmap='jet', edgecolor='k', linewidth=0.2, alpha=0.9)
+        temp_1 = temp_slider('ayran', 36.0, 48.0, "temp_ayran_dry")
+        spec_1 = GridSpec('ayran', 'dry', (2.0, 10.0), grid_n, (1.0, 3.0), grid_n, *temp_grid(36.0, 48.0))
+        dose_3d, t_3d, Z_ph = surface(spec_1, temp_1)
         
-        set_teacher_style_3d(ax, "Реконструкция модели (pH справа)", "\nДоза, %", "\nВремя, ч", "\npH")
-        ax.view_init(elev=20, azim=135)
-        
-        cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=10, pad=0.1)
-        cbar.set_label('pH')
-        st.pyplot(fig)
+        render_surface(dose_3d, t_3d, Z_ph, "Реконструкция модели (pH справа)", "pH", 'pH')
 
     # 3D ОПЫТ 2
     with subtab3:
         st.subheader("Поверхность отклика: Опыт 2")
         
-        dose_3d_2 = np.linspace(1, 4, 40)
-        T2, D2 = np.meshgrid(t_3d, dose_3d_2)
-        Z_ph_2 = 4.8 - (0.13 * np.log(T2)) - (0.05 * D2) 
+        temp_2 = temp_slider('ayran', 36.0, 48.0, "temp_ayran_wet")
+        spec_2 = GridSpec('ayran', 'wet', (2.0, 10.0), grid_n, (1.0, 4.0), grid_n, *temp_grid(36.0, 48.0))
+        dose_3d_2, t_3d_2, Z_ph_2 = surface(spec_2, temp_2)
         
-        fig = plt.figure(figsize=(12, 10))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        surf = ax.plot_surface(D2, T2, Z_ph_2, cmap='jet', edgecolor='k', linewidth=0.2, alpha=0.9)
-        
-        set_teacher_style_3d(ax, "Модель ускорения (pH справа)", "\nДоза, %", "\nВремя, ч", "\npH")
-        ax.view_init(elev=20, azim=135)
-        
-        cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=10, pad=0.1)
-        cbar.set_label('pH')
-        st.pyplot(fig)
+        render_surface(dose_3d_2, t_3d_2, Z_ph_2, "Модель ускорения (pH справа)", "pH", 'pH')
 
 # ==========================================
 # 2. САРЫ ІРІМШІК
@@ -194,52 +234,21 @@ with tab_irimshik:
         st.subheader("Поверхность отклика: Опыт 1 (Доза до 4%)")
         st.info("Влияние добавки в концентрации до 4% на влажность.")
         
-        # Сетка до 4%
-        t_ir_3d = np.linspace(0, 5, 40)
-        dose_ir_3d = np.linspace(0, 4, 40)
-        T_ir, D_ir = np.meshgrid(t_ir_3d, dose_ir_3d)
-        
-        # Формула
-        W_start = 75.0 - D_ir
-        k_speed = 0.3 + (0.04 * D_ir)
-        Moisture = 18.0 + (W_start - 18.0) * np.exp(-k_speed * T_ir)
+        # Сетка до 4% (формула сушки DB.py)
+        temp_ir = temp_slider('irimshik', 86.0, 100.0, "temp_irim_4")
+        spec_ir = GridSpec('irimshik', None, (0.0, 5.0), grid_n, (0.0, 4.0), grid_n, *temp_grid(86.0, 100.0))
+        dose_ir_3d, t_ir_3d, Moisture = surface(spec_ir, temp_ir)
         
-        fig = plt.figure(figsize=(12, 10))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        # X=Dose, Y=Time
-        surf = ax.plot_surface(D_ir, T_ir, Moisture, cmap='jet', edgecolor='k', linewidth=0.2, alpha=0.9)
-        
-        set_teacher_style_3d(ax, "Опыт 1: Умеренное уваривание", "\nДоза, %", "\nВремя, ч", "\nВлажность, %")
-        ax.view_init(elev=20, azim=135)
-        
-        cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=10, pad=0.1)
-        cbar.set_label('Влажность %')
-        st.pyplot(fig)
+        render_surface(dose_ir_3d, t_ir_3d, Moisture, "Опыт 1: Умеренное уваривание", "Влажность, %", 'Влажность %')
 
     # 3D МОДЕЛЬ ОПЫТ 2 (до 5%)
     with subtab_ir3:
         st.subheader("Поверхность отклика: Опыт 2 (Доза до 5%)")
         st.warning("Влияние максимальной концентрации добавки (5%).")
         
-        # Сетка до 5%
-        dose_ir_3d_5 = np.linspace(0, 5, 40)
-        T_ir_5, D_ir_5 = np.meshgrid(t_ir_3d, dose_ir_3d_5)
-        
-        # Формула
-        W_start_5 = 75.0 - D_ir_5
-        k_speed_5 = 0.3 + (0.04 * D_ir_5)
-        Moisture_5 = 18.0 + (W_start_5 - 18.0) * np.exp(-k_speed_5 * T_ir_5)
-        
-        fig = plt.figure(figsize=(12, 10))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        # X=Dose, Y=Time
-        surf = ax.plot_surface(D_ir_5, T_ir_5, Moisture_5, cmap='jet', edgecolor='k', linewidth=0.2, alpha=0.9)
-        
-        set_teacher_style_3d(ax, "Опыт 2: Интенсивное уваривание", "\nДоза, %", "\nВремя, ч", "\nВлажность, %")
-        ax.view_init(elev=20, azim=135)
+        # Сетка до 5% (формула сушки DB.py)
+        temp_ir_5 = temp_slider('irimshik', 86.0, 100.0, "temp_irim_5")
+        spec_ir_5 = GridSpec('irimshik', None, (0.0, 5.0), grid_n, (0.0, 5.0), grid_n, *temp_grid(86.0, 100.0))
+        dose_ir_3d_5, t_ir_3d_5, Moisture_5 = surface(spec_ir_5, temp_ir_5)
         
-        cbar = fig.colorbar(surf, ax=ax, shrink=0.5, aspect=10, pad=0.1)
-        cbar.set_label('Влажность %')
-        st.pyplot(fig)
\ No newline at end of file
+        render_surface(dose_ir_3d_5, t_ir_3d_5, Moisture_5, "Опыт 2: Интенсивное уваривание", "Влажность, %", 'Влажность %')
\ No newline at end of file
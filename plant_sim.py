@@ -0,0 +1,322 @@
+# plant_sim.py
+# ============================================
+# Дискретно-событийная модель цеха: линии, танки, общее оборудование
+# ============================================
+#
+# Партия идет по маршруту стадий; каждая стадия занимает единицу ресурса
+# (танк, аппарат, линия). Очередь событий - куча (heapq) по времени.
+# Блокировка: партия держит текущий ресурс, пока не получит следующий, поэтому
+# узкое место тормозит всю линию выше по потоку. Танк ферментации освобождается
+# только после розлива (продукт уходит из танка на линию розлива).
+#
+# Длительности - окна стадий мнемосхемы SCADA и формулы DB.py:
+# ферментация Айрана до pH 4.6 при скорости k сценария, сушка Иримшика до
+# влаги 20 % при скорости k(доза).
+
+import heapq
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+import DB
+from models import solve_time_to_target
+
+PH_TARGET = 4.6             # конец ферментации (как у оптимизатора и Live-прогноза)
+MOISTURE_TARGET = 20.0      # конец сушки, %
+PASTEUR_FLOW = 5000.0       # л/ч (пастеризатор мнемосхемы)
+FILL_RATE = 6000.0          # бут/ч (линия розлива)
+BOTTLE_L = 0.5
+
+# Стадия маршрута: ресурс, длительность (ч), держать предыдущий ресурс до конца стадии
+Stage = namedtuple('Stage', ['name', 'resource', 'hours', 'hold_prev'])
+
+# Ресурсы на одну линию; общие для всех линий - отдельно
+LINE_RESOURCES = {
+    'Айран': {'Танк нормализации': 1, 'Гомогенизатор': 1, 'Танк ферментации': 4, 'Линия розлива': 1},
+    'Сары ірімшік': {'Сыродельная ванна': 1, 'Варочный котел': 2, 'Пресс-тележка': 1, 'Сушильная камера': 3},
+}
+SHARED_RESOURCES = {'Пастеризатор': 1}
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # параметры -> результат (LRU)
+_MAX_CACHE = 32
+
+
+def ferment_hours(scenario='Контроль'):
+    """Часы процесса до pH 4.6 для сценария Айрана (pH = 5.98 - k·ln(t+1))"""
+    k = {name: k for name, _, _, _, k in DB.SCENARIOS_AYRAN}[scenario]
+    return float(solve_time_to_target(5.98, -k, PH_TARGET)['t_hit'])
+
+
+def drying_hours(scenario='Контроль'):
+    """Часы процесса до влаги 20 % для сценария Иримшика (W = 18 + (W0 - 18)·exp(-k·t))"""
+    dose = dict(DB.SCENARIOS_IRIM)[scenario]
+    w_start, k_speed = 75.0 - dose * 0.8, 0.3 + 0.02 * dose
+    return float(np.log((w_start - 18.0) / (MOISTURE_TARGET - 18.0)) / k_speed)
+
+
+def routes(volume_l=1000.0, ayran_scenario='Контроль', irim_scenario='Контроль'):
+    """Маршруты продуктов по окнам стадий SCADA"""
+    return {
+        'Айран': [
+            Stage('Приемка', 'Танк нормализации', 0.5, False),
+            Stage('Гомогенизация', 'Гомогенизатор', 0.5, False),
+            Stage('Пастеризация', 'Пастеризатор', volume_l / PASTEUR_FLOW, False),
+            # Охлаждение (1.5-2 ч) и брожение до pH 4.6 - в танке ферментации
+            Stage('Ферментация', 'Танк ферментации', 0.5 + max(ferment_hours(ayran_scenario) - 2.0, 0.0), False),
+            Stage('Розлив', 'Линия розлива', volume_l / BOTTLE_L / FILL_RATE, True),
+        ],
+        'Сары ірімшік': [
+            Stage('Смесь', 'Сыродельная ванна', 1.0, False),
+            Stage('Варка', 'Варочный котел', 4.0, False),
+            Stage('Пресс', 'Пресс-тележка', 1.0, False),
+            Stage('Сушка', 'Сушильная камера', max(drying_hours(irim_scenario) - 6.0, 0.5), False),
+        ],
+    }
+
+
+def capacities(lines, overrides=None):
+    """Мощности ресурсов: на линию × число линий продукта, общее оборудование - как есть"""
+    caps = dict(SHARED_RESOURCES)
+    for product, n_lines in lines.items():
+        for res, cap in LINE_RESOURCES[product].items():
+            caps[res] = cap * n_lines
+    caps.update(overrides or {})
+    return caps
+
+
+class Resource:
+    """Пул одинаковых единиц оборудования с очередью FIFO и счетчиками занятости"""
+
+    __slots__ = ('name', 'capacity', 'busy', 'queue', 'area', 'q_area', 't_last', 'waits', 'served')
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.busy = 0
+        self.queue = deque()
+        self.area = 0.0         # ∫ занято dt
+        self.q_area = 0.0       # ∫ длина очереди dt
+        self.t_last = 0.0
+        self.waits = []
+        self.served = 0
+
+    def account(self, now):
+        dt = now - self.t_last
+        self.area += self.busy * dt
+        self.q_area += len(self.queue) * dt
+        self.t_last = now
+
+
+class PlantSim:
+    """Модель цеха: маршруты {продукт: [Stage]}, мощности {ресурс: шт},
+    интервалы запуска партий {продукт: ч или None - запуск по готовности приемки}"""
+
+    def __init__(self, routes, caps, intervals=None):
+        self.routes = routes
+        self.resources = {name: Resource(name, cap) for name, cap in caps.items()}
+        self.intervals = intervals or {}
+        self.products = list(routes)
+        self._heap = []
+        self._seq = 0
+        self.now = 0.0
+        # Партии: продукт, шаг маршрута, занятые ресурсы, старт
+        self.b_product, self.b_step, self.b_held, self.b_start = [], [], [], []
+        self.done = []          # (продукт, старт, конец)
+        self.log = []           # (партия, продукт, стадия, начало, конец)
+        self.events = 0
+
+    # --- очередь событий ---
+    def _schedule(self, t, kind, batch):
+        self._seq += 1
+        heapq.heappush(self._heap, (t, self._seq, kind, batch))
+
+    def _new_batch(self, p):
+        b = len(self.b_product)
+        self.b_product.append(p)
+        self.b_step.append(0)
+        self.b_held.append([])
+        self.b_start.append(self.now)
+        self._request(b)
+
+    # --- ресурсы ---
+    def _request(self, b):
+        stage = self.routes[self.products[self.b_product[b]]][self.b_step[b]]
+        res = self.resources[stage.resource]
+        res.account(self.now)
+        if res.busy < res.capacity:
+            res.busy += 1
+            res.waits.append(0.0)
+            self._start(b, stage, res)
+        else:
+            res.queue.append((self.now, b))
+
+    def _release(self, res):
+        res.account(self.now)
+        res.busy -= 1
+        res.served += 1
+        if res.queue:
+            t_req, b = res.queue.popleft()
+            res.busy += 1
+            res.waits.append(self.now - t_req)
+            self._start(b, self.routes[self.products[self.b_product[b]]][self.b_step[b]], res)
+
+    def _start(self, b, stage, res):
+        held = self.b_held[b]
+        if held and not stage.hold_prev:
+            # Продукт перешел на следующий аппарат - предыдущий свободен
+            self._release(held.pop())
+        held.append(res)
+        self._schedule(self.now + stage.hours, 'end', b)
+        self.log.append((b, self.b_product[b], self.b_step[b], self.now, self.now + stage.hours))
+        if self.b_step[b] == 0 and self.intervals.get(self.products[self.b_product[b]]) is None:
+            # Запуск по готовности: следующая партия ждет освобождения приемки
+            self._new_batch(self.b_product[b])
+
+    def _end(self, b):
+        p = self.b_product[b]
+        route = self.routes[self.products[p]]
+        self.b_step[b] += 1
+        held = self.b_held[b]
+        if self.b_step[b] == len(route):
+            while held:
+                self._release(held.pop())
+            self.done.append((p, self.b_start[b], self.now))
+            return
+        if route[self.b_step[b] - 1].hold_prev and len(held) > 1:
+            # Стадия держала предыдущий ресурс до своего конца (танк на время розлива)
+            self._release(held.pop(0))
+        self._request(b)
+
+    def run(self, hours):
+        """Прогон до hours часов модельного времени"""
+        for p, product in enumerate(self.products):
+            interval = self.intervals.get(product)
+            if interval is None:
+                self._new_batch(p)
+            else:
+                self._schedule(0.0, 'arrive', p)
+        heap = self._heap
+        while heap and heap[0][0] <= hours:
+            self.now, _, kind, obj = heapq.heappop(heap)
+            self.events += 1
+            if kind == 'end':
+                self._end(obj)
+            else:
+                self._new_batch(obj)
+                self._schedule(self.now + self.intervals[self.products[obj]], 'arrive', obj)
+        self.now = hours
+        for res in self.resources.values():
+            res.account(hours)
+        return self
+
+    # --- отчеты ---
+    def resource_report(self):
+        """Загрузка (с блокировкой), ожидание в очереди и выработка по ресурсам"""
+        days = self.now / 24.0
+        owner = {res: product for product, route in self.routes.items() for _, res, _, _ in route}
+        rows = []
+        for res in self.resources.values():
+            waits = np.asarray(res.waits) * 60.0
+            rows.append({
+                'Ресурс': res.name,
+                'Продукт': owner.get(res.name, '—'),
+                'Мощность': res.capacity,
+                'Загрузка, %': 100.0 * res.area / (res.capacity * self.now),
+                'Партий': res.served,
+                'Партий/сутки': res.served / days,
+                'Ожидание ср., мин': waits.mean() if len(waits) else 0.0,
+                'Ожидание P95, мин': np.percentile(waits, 95) if len(waits) else 0.0,
+                'Очередь ср.': res.q_area / self.now,
+            })
+        return pd.DataFrame(rows)
+
+    def product_report(self, volume_l=1000.0):
+        """Выпуск по продуктам: партии, литры в сутки, средний цикл партии"""
+        done = np.array(self.done, dtype=float).reshape(-1, 3)
+        rows = []
+        for p, product in enumerate(self.products):
+            sel = done[done[:, 0] == p]
+            rows.append({
+                'Продукт': product,
+                'Партий': len(sel),
+                'Партий/сутки': len(sel) / (self.now / 24.0),
+                'Литров/сутки': len(sel) * volume_l / (self.now / 24.0),
+                'Цикл партии, ч': float((sel[:, 2] - sel[:, 1]).mean()) if len(sel) else np.nan,
+            })
+        return pd.DataFrame(rows)
+
+    def stage_log(self):
+        """Журнал стадий: партия, продукт, номер и название стадии, начало и конец (ч)"""
+        log = np.array(self.log, dtype=float).reshape(-1, 5)
+        names = [[s.name for s in self.routes[p]] for p in self.products]
+        return pd.DataFrame({
+            'batch': log[:, 0].astype(np.int64),
+            'productname': [self.products[int(p)] for p in log[:, 1]],
+            'stage': [names[int(p)][int(s)] for p, s in log[:, 1:3]],
+            'start_h': log[:, 3],
+            'end_h': log[:, 4],
+        })
+
+
+def simulate(lines=None, hours=720.0, volume_l=1000.0, overrides=None, intervals=None,
+             ayran_scenario='Контроль', irim_scenario='Контроль'):
+    """Прогон цеха с кэшем по параметрам. lines - {продукт: число линий}"""
+    lines = lines or {'Айран': 1, 'Сары ірімшік': 1}
+    key = (tuple(sorted(lines.items())), hours, volume_l, tuple(sorted((overrides or {}).items())),
+           tuple(sorted((intervals or {}).items())), ayran_scenario, irim_scenario)
+    with _lock:
+        sim = _cache.get(key)
+        if sim is not None:
+            _cache.move_to_end(key)
+            return sim
+    active = {p: r for p, r in routes(volume_l, ayran_scenario, irim_scenario).items() if lines.get(p, 0) > 0}
+    sim = PlantSim(active, capacities({p: lines[p] for p in active}, overrides), intervals).run(hours)
+    with _lock:
+        _cache[key] = sim
+        while len(_cache) > _MAX_CACHE:
+            _cache.popitem(last=False)
+    return sim
+
+
+def tank_sweep(tanks=range(1, 13), hours=720.0, volume_l=1000.0, n_lines=1, ayran_scenario='Контроль'):
+    """Сколько танков ферментации держат розлив загруженным: прогон по числу танков"""
+    rows = []
+    for n in tanks:
+        sim = simulate({'Айран': n_lines}, hours, volume_l, {'Танк ферментации': n * n_lines},
+                       ayran_scenario=ayran_scenario)
+        rep = sim.resource_report().set_index('Ресурс')
+        rows.append({
+            'Танков': n,
+            'Загрузка розлива, %': rep.loc['Линия розлива', 'Загрузка, %'],
+            'Загрузка танков, %': rep.loc['Танк ферментации', 'Загрузка, %'],
+            'Партий/сутки': sim.product_report(volume_l)['Партий/сутки'].iloc[0],
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # Замер: месяц работы цеха (2 линии Айрана + 2 линии Иримшика)
+    import time
+
+    t0 = time.perf_counter()
+    sim = simulate({'Айран': 2, 'Сары ірімшік': 2}, hours=720.0)
+    elapsed = time.perf_counter() - t0
+    print(f"📊 Месяц (720 ч), 2+2 линии: {sim.events:,} событий за {elapsed:.2f} с "
+          f"({sim.events / elapsed:,.0f} событий/с)")
+    pd.set_option('display.width', 200)
+    print(sim.resource_report().round(2).to_string(index=False))
+    print(sim.product_report().round(2).to_string(index=False))
+
+    # Месяц крупного цеха: 20 + 20 линий
+    t0 = time.perf_counter()
+    big = simulate({'Айран': 20, 'Сары ірімшік': 20}, hours=720.0, overrides={'Пастеризатор': 10})
+    elapsed = time.perf_counter() - t0
+    print(f"📊 Месяц, 20+20 линий: {big.events:,} событий за {elapsed:.2f} с")
+
+    t0 = time.perf_counter()
+    sweep = tank_sweep()
+    print(f"📊 Танки ферментации vs розлив (1 линия, месяц), {time.perf_counter() - t0:.2f} с:")
+    print(sweep.round(1).to_string(index=False))
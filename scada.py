@@ -0,0 +1,525 @@
+# scada.py
+# ============================================
+# Мнемосхема SCADA: описание линий, полный HTML и режим частичного обновления
+# ============================================
+#
+# Полный режим собирает HTML всей схемы на каждый перезапуск и грузит его в
+# iframe (перезагрузка стилей и разметки). Режим «диф»: разметка и стили линии
+# монтируются один раз компонентом st.components.v2, дальше на каждый тик
+# уходит JSON только с изменившимися значениями тегов и классами статусов.
+
+import html
+import time
+
+import numpy as np
+
+styles = """
+<style>
+    body { background-color: transparent; font-family: sans-serif; }
+    .scada-container {
+        display: flex; flex-wrap: wrap; justify-content: center;
+        align-items: flex-start; padding: 20px; gap: 30px;
+    }
+    .unit-card {
+        background-color: #161b22; border: 1px solid #30363d; border-radius: 4px;
+        width: 260px; min-height: 200px; box-shadow: 0 4px 10px rgba(0,0,0,0.5);
+        position: relative; transition: all 0.3s ease; color: #e6edf3;
+    }
+    .unit-header {
+        background-color: #21262d; padding: 10px 15px; border-bottom: 1px solid #30363d;
+        display: flex; justify-content: space-between; align-items: center;
+    }
+    .unit-title {
+        color: #e6edf3; font-family: monospace; font-weight: bold; font-size: 14px; text-transform: uppercase;
+    }
+    .status-indicator { width: 12px; height: 12px; border-radius: 50%; background-color: #333; }
+    .status-on { background-color: #00ff88; box-shadow: 0 0 10px #00ff88; }
+    .status-heat { background-color: #ff4b4b; box-shadow: 0 0 10px #ff4b4b; animation: blink 1s infinite; }
+    .status-off { background-color: #ff4b4b; }
+    .status-idle { background-color: #555; }
+
+    @keyframes blink { 50% { opacity: 0.5; } }
+
+    .unit-body { padding: 15px; }
+    .tag-row {
+        display: flex; justify-content: space-between; margin-bottom: 8px;
+        font-family: monospace; font-size: 13px; border-bottom: 1px dashed #30363d;
+    }
+    .tag-name { color: #8b949e; }
+    .tag-value { color: #58a6ff; font-weight: bold; }
+    .tag-unit { color: #8b949e; font-size: 11px; margin-left: 5px; }
+    .active-unit { border-color: #00ff88; box-shadow: 0 0 15px rgba(0, 255, 136, 0.15); }
+
+    .pipe-connection { display: flex; align-items: center; justify-content: center; width: 40px; height: 100%; align-self: center; }
+    .flow-arrow { color: #30363d; font-size: 24px; }
+    .flow-active { color: #00ff88; animation: flowPulse 1s infinite; }
+    @keyframes flowPulse { 0% { opacity: 0.3; } 50% { opacity: 1; } 100% { opacity: 0.3; } }
+</style>
+"""
+
+STATUS_CLASSES = {"RUN": "status-on", "HEAT": "status-heat", "OFF": "status-off"}
+
+
+def status_class(status):
+    return STATUS_CLASSES.get(status, "status-idle")
+
+
+def format_value(val):
+    # Форматирование значения
+    if isinstance(val, (int, float, np.floating)):
+        return f"{val:.2f}" if val < 100 else f"{val:.1f}"
+    return str(val)
+
+
+# ==========================================
+# ЛИНИИ: установки, их статусы и теги на момент current_time
+# ==========================================
+
+def _sel(cond, a, b):
+    """a, где cond, иначе b: скаляр для одного момента, массив для всех кадров сразу"""
+    if np.ndim(cond) == 0:
+        return a if cond else b
+    return np.where(cond, a, b)
+
+
+def _between(t, lo, hi=np.inf):
+    return (t >= lo) & (t < hi)
+
+
+def _int(x):
+    return np.floor(x).astype(np.int64) if np.ndim(x) else int(x)
+
+
+def line_units(product, current_time, get_val):
+    """Установки линии [(название, статус, теги {имя: (значение, ед.)}, активна)] и
+    активность труб между ними. get_val(колонка, по умолчанию) - показание базы/датчика.
+    current_time - момент (число) или массив моментов (кадры воспроизведения)."""
+    # Извлекаем параметры из базы
+    temp = get_val('temperature_c', 20.0)
+    ph = get_val('ph', 6.6)
+    moist = get_val('влага', 88.0)
+    press = get_val('pressure_mpa', 0.0)
+    visc = get_val('viscosity_mpa_s', 1.5)
+    fat = get_val('fat_pct', 3.2)
+    if "Айран" in str(product):
+        # ЛОГИКА ЭТАПОВ (АЙРАН)
+        s1 = _between(current_time, 0.0, 0.5) # Приемка
+        s2 = _between(current_time, 0.5, 1.0) # Гомогенизация
+        s3 = _between(current_time, 1.0, 1.5) # Пастеризация
+        s4 = _between(current_time, 2.0, 8.0) # Ферментация (Брожение)
+        s5 = (current_time >= 8.0)            # Розлив
+
+        # 1. Танк Нормализации
+        # Данные: Уровень (эмуляция расхода), Температура (уставка), Жир (из базы)
+        t_norm = _sel(s1, 42.0, _sel(s2, 65.0, 20.0))
+        # 2. Гомогенизатор
+        # Данные: Давление (из базы или 12.5 МПа по стандарту), Мощность (эмуляция)
+        p_disp = _sel(s2 & (press > 0), press, _sel(s2, 12.5, 0))
+        # 4. Ферментатор: pH (из базы!), Кислотность (расчет), Вязкость (из базы!)
+        acid_t = get_val('кислотность', (7 - ph) * 40)
+        units = [
+            ("Танк Нормализации", _sel(s1, "RUN", "OFF"), {
+                "Уровень": (85 - current_time*2, "%"),
+                "Температура": (t_norm, "°C"),
+                "Жирность": (fat, "%"),
+                "Мешалка": (_sel(s1, "ВКЛ", "ВЫКЛ"), "")
+            }, s1),
+            ("Гомогенизатор", _sel(s2, "RUN", "OFF"), {
+                "Давление": (p_disp, "МПа"),
+                "Температура": (_sel(s2, 65.0, 40.0), "°C"),
+                "Мощность": (_sel(s2, 45, 0), "кВт")
+            }, s2),
+            # 3. Пастеризатор: Температура выхода (84°C по схеме), Подача пара (клапан %)
+            ("Пастеризатор", _sel(s3, "RUN", "OFF"), {
+                "Т_Выход": (_sel(s3, 84.0, 65.0), "°C"),
+                "Клапан пара": (_sel(s3, 85, 0), "%"),
+                "Поток": (_sel(s3, 5000, 0), "л/ч")
+            }, s3),
+            ("Танк Ферментации", _sel(s4, "RUN", "OFF"), {
+                "pH Продукта": (ph, ""),
+                "Кислотность": (acid_t, "°T"),
+                "Температура": (temp, "°C"),
+                "Вязкость": (visc, "мПа·с")
+            }, s4),
+            # 5. Линия Розлива: Скорость (эмуляция), Счетчик (эмуляция)
+            ("Линия Розлива", _sel(s5, "RUN", "OFF"), {
+                "Скорость": (_sel(s5, 6000, 0), "бут/ч"),
+                "Счетчик": (_sel(s5, _int(current_time*1200), 0), "шт"),
+                "Т_Продукта": (_sel(s5, 4.0, 20.0), "°C")
+            }, s5),
+        ]
+        return units, [s1, s2, s3, s5]
+
+    # ЛОГИКА ЭТАПОВ (ИРИМШИК)
+    s1 = (current_time < 1.0)             # Смесь
+    s2 = _between(current_time, 1.0, 5.0) # Варка
+    s3 = _between(current_time, 5.0, 6.0) # Пресс
+    s4 = (current_time >= 6.0)            # Сушка
+
+    # 2. Варочный Котел: температура 96.5°C (кипение), цвет меняется
+    t_cook = _sel(s2, 96.5, _sel(s1, 34.0, 80.0))
+    units = [
+        # 1. Ванна (Свертывание): pH берем из базы (он падает с 5.98)
+        ("Сыродельная Ванна", _sel(s1, "RUN", "OFF"), {
+            "Т_Смеси": (_sel(s1, 34.0, 20.0), "°C"),
+            "pH Молока": (ph, ""),
+            "Фермент": (_sel(current_time > 0.2, "ВНЕСЕН", "ОЖИДАНИЕ"), "")
+        }, s1),
+        ("Варочный Котел", _sel(s2, "HEAT", "OFF"), {
+            "Т_Продукта": (t_cook, "°C"),
+            "Давление пара": (_sel(s2, 0.6, 0), "МПа"),
+            "Датчик Цвета": (_sel(current_time > 3, "ЖЕЛТЫЙ", "БЕЛЫЙ"), "")
+        }, s2),
+        # 3. Пресс
+        ("Пресс-Тележка", _sel(s3, "RUN", "OFF"), {
+            "Усилие": (_sel(s3, 2.5, 0), "бар"),
+            "Слив сывор.": (_sel(s3, 50, 0), "л/мин")
+        }, s3),
+        # 4. Сушка: влага берется из базы (падает до 18%)
+        ("Сушильная Камера", _sel(s4, "RUN", "OFF"), {
+            "Т_Воздуха": (_sel(s4, 45.0, 20.0), "°C"),
+            "Влажность": (moist, "%"),
+            "Цель": (18.0, "%")
+        }, s4),
+    ]
+    return units, [s1, s2, s3]
+
+
+# ==========================================
+# ПОЛНЫЙ HTML (iframe на каждый перезапуск)
+# ==========================================
+
+def render_scada_unit(title, status, tags, is_active, uid=None):
+    """Карточка установки; с uid элементы получают id для точечного обновления"""
+    ids = (lambda suffix: f' id="{uid}-{suffix}"') if uid is not None else (lambda suffix: "")
+    active_card_cls = "active-unit" if is_active else ""
+
+    tags_html = ""
+    for j, (k, (val, unit)) in enumerate(tags.items()):
+        tags_html += f"""
+        <div class="tag-row">
+            <span class="tag-name">{k}</span>
+            <div><span class="tag-value"{ids(f"v{j}")}>{html.escape(format_value(val))}</span><span class="tag-unit">{unit}</span></div>
+        </div>
+        """
+
+    return f"""
+    <div class="unit-card {active_card_cls}"{ids("card")}>
+        <div class="unit-header">
+            <span class="unit-title">{title}</span>
+            <div class="status-indicator {status_class(status)}"{ids("status")}></div>
+        </div>
+        <div class="unit-body">{tags_html}</div>
+    </div>
+    """
+
+
+def render_pipe(is_active, uid=None):
+    cls = "flow-active" if is_active else ""
+    pid = f' id="{uid}"' if uid is not None else ""
+    return f'<div class="pipe-connection"><div class="flow-arrow {cls}"{pid}>➤</div></div>'
+
+
+def render_line(units, pipes, with_ids=False):
+    """Вся схема: установки, между ними трубы"""
+    html_content = '<div class="scada-container">'
+    for i, unit in enumerate(units):
+        html_content += render_scada_unit(*unit, uid=f"u{i}" if with_ids else None)
+        if i < len(pipes):
+            html_content += render_pipe(pipes[i], uid=f"p{i}" if with_ids else None)
+    return html_content + '</div>'
+
+
+# ==========================================
+# РЕЖИМ «ДИФ»: статичная разметка + JSON изменений
+# ==========================================
+
+_JS = """
+export default function (component) {
+    const { data, parentElement, setTriggerValue } = component;
+    const root = parentElement.querySelector('.scada-container');
+    if (!root || !data) return;
+    // Диф применим только к той версии, от которой он посчитан
+    if (data.base !== null && root.dataset.version !== String(data.base)) {
+        setTriggerValue('resync', data.version);
+        return;
+    }
+    for (const [id, text] of Object.entries(data.text)) {
+        const el = parentElement.getElementById ? parentElement.getElementById(id) : root.querySelector('#' + id);
+        if (el) el.textContent = text;
+    }
+    for (const [id, cls] of Object.entries(data.cls)) {
+        const el = parentElement.getElementById ? parentElement.getElementById(id) : root.querySelector('#' + id);
+        if (el) el.className = cls;
+    }
+    root.dataset.version = String(data.version);
+}
+"""
+
+_components = {}
+
+
+def line_state(units, pipes):
+    """Состояние схемы: тексты значений и классы элементов по id"""
+    text, cls = {}, {}
+    for i, (title, status, tags, is_active) in enumerate(units):
+        cls[f"u{i}-card"] = "unit-card active-unit" if is_active else "unit-card "
+        cls[f"u{i}-status"] = f"status-indicator {status_class(status)}"
+        for j, (val, _) in enumerate(tags.values()):
+            text[f"u{i}-v{j}"] = format_value(val)
+    for i, active in enumerate(pipes):
+        cls[f"p{i}"] = "flow-arrow flow-active" if active else "flow-arrow "
+    return text, cls
+
+
+def diff_state(prev, new):
+    """Только изменившиеся элементы"""
+    return {k: v for k, v in new.items() if prev.get(k) != v}
+
+
+def _component(line, units, pipes):
+    """Компонент линии: разметка (по составу установок) и стили регистрируются один раз"""
+    if line not in _components:
+        import streamlit as st
+        css = styles.replace("<style>", "").replace("</style>", "")
+        _components[line] = st.components.v2.component(
+            f"scada_{line}", html=render_line(units, pipes, with_ids=True), css=css, js=_JS)
+    return _components[line]
+
+
+def scada_line(product, units, pipes, key="scada"):
+    """Схема в режиме «диф» (вызывается внутри st.fragment): первый показ - полное
+    состояние, дальше - только изменения. Возвращает число элементов в дифе."""
+    import streamlit as st
+
+    line = 'ayran' if "Айран" in str(product) else 'irimshik'
+    key = f"{key}_{line}"
+    text, cls = line_state(units, pipes)
+    version, sent_text, sent_cls = st.session_state.get(key, (0, None, None))
+    if sent_text is None:
+        data = {'version': version + 1, 'base': None, 'text': text, 'cls': cls}
+    else:
+        data = {'version': version + 1, 'base': version,
+                'text': diff_state(sent_text, text), 'cls': diff_state(sent_cls, cls)}
+    res = _component(line, units, pipes)(data=data, key=f"{key}_widget", on_resync_change=lambda: None)
+    if res.resync is not None:
+        # Браузер не знает базовую версию (перемонтирование, потерянный тик) - шлем все заново
+        st.session_state[key] = (version + 1, None, None)
+        st.rerun(scope="fragment")
+    st.session_state[key] = (version + 1, text, cls)
+    return len(data['text']) + len(data['cls'])
+
+
+# ==========================================
+# ВОСПРОИЗВЕДЕНИЕ: кадры считаются заранее, браузер проигрывает их сам
+# ==========================================
+
+SPEEDS = (1, 10, 60, 300, 600, 1800, 3600)  # ускорение: секунд процесса за секунду
+CHUNK_SECONDS = 5           # кадров в одной порции - на 5 с показа
+MAX_FRAMES = 250_000        # кадров в одном предрасчете (~20 МБ float32)
+
+
+def _codes(arr, n, label=lambda v: v):
+    """Категориальный столбец кадров: (подписи, коды)"""
+    labels, codes = np.unique(np.broadcast_to(arr, (n,)), return_inverse=True)
+    return [label(v) for v in labels.tolist()], codes.astype(np.int32)
+
+
+def frame_table(product, t, get_val):
+    """Все кадры одним векторным проходом: числа тегов (float32), строковые теги и
+    классы статусов (коды). t - моменты кадров, get_val(колонка, по умолчанию) -
+    значения базы на этих моментах (массивы)."""
+    t = np.asarray(t, dtype=float)
+    n = len(t)
+    units, pipes = line_units(product, t, get_val)
+    num, cat, cls = {}, {}, {}
+    for i, (title, status, tags, is_active) in enumerate(units):
+        cls[f"u{i}-card"] = _codes(np.where(is_active, "unit-card active-unit", "unit-card "), n)
+        cls[f"u{i}-status"] = _codes(status, n, lambda v: f"status-indicator {status_class(v)}")
+        for j, (val, _) in enumerate(tags.values()):
+            val = np.broadcast_to(val, (n,))
+            if val.dtype.kind in "iuf":
+                num[f"u{i}-v{j}"] = val.astype(np.float32)
+            else:
+                cat[f"u{i}-v{j}"] = _codes(val, n)
+    for i, active in enumerate(pipes):
+        cls[f"p{i}"] = _codes(np.where(active, "flow-arrow flow-active", "flow-arrow "), n)
+    return {'t': t.astype(np.float32), 'num': num, 'cat': cat, 'cls': cls}
+
+
+def encode_chunk(table, a, b, offset=0):
+    """Порция кадров [a, b) таблицы (начало таблицы - кадр offset) в JSON-структуру"""
+    sl = slice(a - offset, b - offset)
+    rnd = lambda arr: np.round(arr[sl].astype(float), 3).tolist()
+    return {
+        'start': a, 'n': b - a, 't': rnd(table['t']),
+        'num': {k: rnd(v) for k, v in table['num'].items()},
+        'cat': {k: [labels, codes[sl].tolist()] for k, (labels, codes) in table['cat'].items()},
+        'cls': {k: [labels, codes[sl].tolist()] for k, (labels, codes) in table['cls'].items()},
+    }
+
+
+_PLAYER_JS = """
+export default function (component) {
+    const { data, parentElement, setTriggerValue } = component;
+    const root = parentElement.querySelector('.scada-container');
+    if (!root || !data) return;
+    const byId = (id) => parentElement.getElementById ? parentElement.getElementById(id) : root.querySelector('#' + id);
+    let p = root.__player;
+    if (!p || p.session !== data.session) {
+        if (p && p.raf) cancelAnimationFrame(p.raf);
+        // Новая сессия (или перемонтирование) - с начала присланной порции
+        p = root.__player = { session: data.session, chunks: {}, t0: null, last: -1, shown: 0, dropped: 0,
+                              requested: -1, done: false, raf: null, win: [], start: data.chunk.start };
+    }
+    p.chunks[data.chunk.start] = data.chunk;
+    p.fps = data.fps; p.total = data.total;
+    const fmt = (v) => v < 100 ? v.toFixed(2) : v.toFixed(1);
+    const chunkFor = (f) => Object.values(p.chunks).find((c) => f >= c.start && f < c.start + c.n);
+    const report = (frame) => {
+        const fps = p.win.length > 1 ? 1000 * (p.win.length - 1) / (p.win[p.win.length - 1] - p.win[0]) : 0;
+        return { frame: frame, fps: Math.round(fps * 10) / 10, shown: p.shown, dropped: p.dropped };
+    };
+    function draw(c, i) {
+        for (const [id, arr] of Object.entries(c.num)) { const el = byId(id); if (el) el.textContent = fmt(arr[i]); }
+        for (const [id, [labels, codes]] of Object.entries(c.cat)) { const el = byId(id); if (el) el.textContent = labels[codes[i]]; }
+        for (const [id, [labels, codes]] of Object.entries(c.cls)) { const el = byId(id); if (el) el.className = labels[codes[i]]; }
+    }
+    function tick(now) {
+        if (p.t0 === null) p.t0 = now;
+        // Кадр по часам, а не по счетчику: отставание браузера = пропущенные кадры
+        const due = p.start + Math.floor((now - p.t0) / 1000 * p.fps);
+        if (due >= p.total) {
+            p.done = true; p.raf = null;
+            setTriggerValue('need', report(p.total));
+            return;
+        }
+        const c = chunkFor(due);
+        if (c && due !== p.last) {
+            if (p.last >= 0 && due > p.last + 1) p.dropped += due - p.last - 1;
+            draw(c, due - c.start);
+            p.last = due; p.shown += 1;
+            p.win.push(now); while (p.win.length > 1 && now - p.win[0] > 2000) p.win.shift();
+            const stats = byId('player-stats');
+            if (stats) stats.textContent = `⏱ ${c.t[due - c.start].toFixed(2)} ч · ${report(due).fps} FPS · пропущено ${p.dropped}`;
+            // Следующая порция - заранее, с середины текущей
+            const next = c.start + c.n;
+            if (next < p.total && !p.chunks[next] && p.requested !== next && due - c.start >= c.n / 2) {
+                p.requested = next;
+                setTriggerValue('need', report(next));
+            }
+            for (const k of Object.keys(p.chunks)) if (p.chunks[k].start + p.chunks[k].n <= due) delete p.chunks[k];
+        }
+        p.raf = requestAnimationFrame(tick);
+    }
+    if (!p.raf && !p.done) p.raf = requestAnimationFrame(tick);
+    return () => { if (p.raf) cancelAnimationFrame(p.raf); p.raf = null; };
+}
+"""
+
+_players = {}
+
+
+def _player(line, units, pipes):
+    """Компонент проигрывателя линии: та же разметка + строка статистики"""
+    if line not in _players:
+        import streamlit as st
+        css = styles.replace("<style>", "").replace("</style>", "")
+        css += ".player-stats { font-family: monospace; color: #8b949e; text-align: center; }"
+        markup = render_line(units, pipes, with_ids=True) + '<div class="player-stats" id="player-stats"></div>'
+        _players[line] = st.components.v2.component(f"scada_player_{line}", html=markup, css=css, js=_PLAYER_JS)
+    return _players[line]
+
+
+def scada_player(product, t_max, get_vals, speed, fps, source, key="player"):
+    """Воспроизведение партии (внутри st.fragment): кадры с шагом speed/(3600·fps) ч.
+
+    get_vals(t) -> get_val(колонка, по умолчанию) для массива моментов t; source -
+    идентификатор партии. Браузер играет порцию сам (requestAnimationFrame) и
+    заранее просит следующую; Python перезапускается раз в порцию, а не на кадр.
+    Возвращает состояние сессии: кадров всего, время предрасчета, статистика браузера.
+    """
+    import streamlit as st
+
+    line = 'ayran' if "Айран" in str(product) else 'irimshik'
+    dt_h = speed / (3600.0 * fps)
+    total = int(t_max / dt_h) + 1
+    chunk_n = fps * CHUNK_SECONDS
+    ident = (product, source, speed, fps)
+    sess = st.session_state.get(key)
+    if sess is None or sess['ident'] != ident:
+        sess = {'ident': ident, 'session': (sess or {}).get('session', 0) + 1, 'chunk': 0, 'offset': None,
+                'table': None, 'build_ms': 0.0, 'stats': None, 'total': total, 'frames_built': 0}
+    a = sess['chunk']
+    b = min(a + chunk_n, total)
+    if sess['table'] is None or not (sess['offset'] <= a and b <= sess['offset'] + len(sess['table']['t'])):
+        # Предрасчет блока кадров одним векторным проходом
+        t0 = time.perf_counter()
+        frames = np.arange(a, min(a + max(MAX_FRAMES, chunk_n), total))
+        t = frames * dt_h
+        sess['table'] = frame_table(product, t, get_vals(t))
+        sess['offset'] = a
+        sess['build_ms'] = (time.perf_counter() - t0) * 1e3
+        sess['frames_built'] = len(frames)
+    units, pipes = line_units(product, 0.0, get_vals(np.zeros(1)))
+    data = {'session': sess['session'], 'fps': fps, 'total': total,
+            'chunk': encode_chunk(sess['table'], a, b, sess['offset'])}
+    res = _player(line, units, pipes)(data=data, key=f"{key}_{line}", on_need_change=lambda: None)
+    st.session_state[key] = sess
+    need = res.need
+    if need is not None and need.get('frame', -1) != sess['chunk']:
+        # Браузер просит следующую порцию (или сообщает об окончании)
+        sess['stats'] = need
+        if need['frame'] < total:
+            sess['chunk'] = int(need['frame'])
+            st.rerun(scope="fragment")
+    return sess
+
+
+if __name__ == "__main__":
+    # Замер: полный HTML схемы на тик vs JSON-диф (слайдер времени с шагом 0.1 ч)
+    import json
+
+    ph = lambda t: 5.98 - 0.688 * np.log(t + 1)
+    ticks = np.arange(0.0, 10.0, 0.1)
+    for product in ("Айран", "Сары ірімшік"):
+        full_bytes, diff_bytes, prev = 0, 0, None
+        t0 = time.perf_counter()
+        for t in ticks:
+            units, pipes = line_units(product, t, lambda col, default: ph(t) if col == 'ph' else default)
+            full_bytes += len((styles + render_line(units, pipes)).encode())
+        t_full = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for t in ticks:
+            units, pipes = line_units(product, t, lambda col, default: ph(t) if col == 'ph' else default)
+            text, cls = line_state(units, pipes)
+            if prev is None:
+                diff = {'text': text, 'cls': cls}
+            else:
+                diff = {'text': diff_state(prev[0], text), 'cls': diff_state(prev[1], cls)}
+            prev = (text, cls)
+            diff_bytes += len(json.dumps(diff, ensure_ascii=False).encode())
+        t_diff = time.perf_counter() - t0
+        print(f"📊 {product}, {len(ticks)} тиков: полный HTML {full_bytes / len(ticks) / 1e3:.1f} КБ/тик "
+              f"({t_full / len(ticks) * 1e6:.0f} мкс), диф {diff_bytes / len(ticks):.0f} Б/тик "
+              f"({t_diff / len(ticks) * 1e6:.0f} мкс)")
+
+    # Замер: кадры воспроизведения партии Айрана (10 ч, 30 кадров/с) - один векторный
+    # проход vs line_units на каждый кадр
+    t_db = np.linspace(0.0, 10.0, 50)
+    ph_db = 5.98 - 0.688 * np.log(t_db + 1)
+    get_vals = lambda t: (lambda col, default: np.interp(t, t_db, ph_db) if col == 'ph' else default)
+    for speed in (3600, 60, 4):
+        t = np.arange(int(10.0 / (speed / (3600.0 * 30))) + 1) * speed / (3600.0 * 30)
+        t0 = time.perf_counter()
+        table = frame_table("Айран", t[:MAX_FRAMES], get_vals(t[:MAX_FRAMES]))
+        t_vec = time.perf_counter() - t0
+        n_loop = min(len(t), 2000)
+        t0 = time.perf_counter()
+        for tf in t[:n_loop]:
+            line_state(*line_units("Айран", float(tf), get_vals(tf)))
+        t_loop = (time.perf_counter() - t0) / n_loop * min(len(t), MAX_FRAMES)
+        chunk = json.dumps(encode_chunk(table, 0, min(30 * CHUNK_SECONDS, len(t))), ensure_ascii=False)
+        print(f"📊 Воспроизведение {speed}×: {len(t):,} кадров, предрасчет {min(len(t), MAX_FRAMES):,} - "
+              f"вектор {t_vec * 1e3:.0f} мс, покадрово ~{t_loop * 1e3:.0f} мс; порция {CHUNK_SECONDS} с "
+              f"= {len(chunk) / 1e3:.0f} КБ JSON, один перезапуск Python на {30 * CHUNK_SECONDS} кадров")
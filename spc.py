@@ -0,0 +1,282 @@
+# spc.py
+# ============================================
+# Статистическое управление процессом: карты EWMA и двусторонний CUSUM
+# ============================================
+#
+# Отсчет карты - партия: среднее отклонение ее точек от эталонного профиля своего
+# опыта (среднее первых ref_batches партий в тот же момент процесса) в единицах σ
+# этой величины между партиями. Точки одной партии не независимы (сдвиг закваски
+# сдвигает всю кривую), поэтому карта ведется по партиям, а не по точкам.
+# Все ряды считаются одним векторным проходом без цикла по точкам:
+#   EWMA:  z_t = (1-λ)^t·z_0 + λ·Σ (1-λ)^(t-i)·x_i - кумсумма по блокам
+#          (блок ограничен так, чтобы (1-λ)^(-n) не переполнялся);
+#   CUSUM: C_t = max(0, C_(t-1) + y_t) = P_t - min(0, min P_j), P - кумсумма
+#          (решение рекурсии Линдли через накопленный минимум).
+# update() дописывает новые точки, продолжая ряды с сохраненного состояния.
+
+import numpy as np
+import pandas as pd
+
+TAGS = ('ph', 'кислотность', 'влага')
+TAG_LABELS = {'ph': 'pH', 'кислотность': 'Кислотность, °T', 'влага': 'Влага, %'}
+
+# Учебные L = 3, H = 5 дают ARL0 ~560 и ~470 по отдельности, но по правилу «EWMA или CUSUM»
+# - ~250 партий, а на кинетической истории (хвосты тяжелее нормальных, σ из 50 партий) - ~140.
+# Границы ниже и фаза I в 150 партий подобраны под ~500 партий между ложными тревогами
+# на истории без дрейфа (медиана по историям; разброс 400-1300 - от оценки σ в фазе I).
+LAMBDA = 0.2                # вес EWMA
+L_EWMA = 3.3                # ширина границ EWMA, σ
+K_CUSUM = 0.5               # допуск CUSUM, σ (ловит сдвиг ~1σ)
+H_CUSUM = 7.0               # порог CUSUM, σ
+REF_BATCHES = 150           # партий фазы I (эталонный профиль и σ)
+
+
+def ewma(x, lam=LAMBDA, z0=None):
+    """EWMA строк x (ряды × точки) с начальными значениями z0"""
+    x = np.asarray(x, dtype=float)
+    g, n = x.shape
+    z = np.zeros(g) if z0 is None else np.asarray(z0, dtype=float)
+    out = np.empty_like(x)
+    block = max(1, int(100.0 / -np.log10(1.0 - lam)))
+    for b0 in range(0, n, block):
+        seg = x[:, b0:b0 + block]
+        p = (1.0 - lam) ** np.arange(1, seg.shape[1] + 1)
+        # z_i = p_i·(z_0 + λ·Σ_(j<=i) x_j / p_j), p_i = (1-λ)^i
+        out[:, b0:b0 + seg.shape[1]] = p * (z[:, None] + lam * np.cumsum(seg / p, axis=1))
+        z = out[:, b0 + seg.shape[1] - 1]
+    return out
+
+
+def cusum(y, c0=None):
+    """C_t = max(0, C_(t-1) + y_t) для строк y с начальными значениями c0 >= 0"""
+    y = np.asarray(y, dtype=float)
+    c0 = np.zeros(len(y)) if c0 is None else np.asarray(c0, dtype=float)
+    s = np.cumsum(y, axis=1) + c0[:, None]
+    return s - np.minimum(np.minimum.accumulate(s, axis=1), 0.0)
+
+
+class SpcChart:
+    """Карты EWMA и CUSUM для всех пар (продукт, опыт, показатель).
+
+    fit(df) - эталон по первым ref_batches партиям и расчет по всей истории;
+    update(df) - дописать следующие (завершенные) партии без пересчета истории.
+    df: колонки by (продукт и опыт: «Контроль» есть у обоих продуктов), batch_id
+    (необязательна), duration_hours и показатели.
+    """
+
+    def __init__(self, lam=LAMBDA, L=L_EWMA, k=K_CUSUM, h=H_CUSUM, ref_batches=REF_BATCHES,
+                 by=('productname', 'experiment_type')):
+        self.lam, self.L, self.k, self.h = lam, L, k, h
+        self.ref_batches = ref_batches
+        self.by = list(by)
+        self.tags = list(TAGS)
+
+    def _long(self, df):
+        """Таблица -> длинный вид (группа, партия, шаг времени, значение) по рядам карты"""
+        tags = [t for t in self.tags if t in df.columns]
+        df = df.assign(batch_id=df['batch_id'] if 'batch_id' in df.columns else 0)
+        long = df.melt(id_vars=[*self.by, 'batch_id', 'duration_hours'], value_vars=tags,
+                       var_name='tag', value_name='value').dropna(subset=['value'])
+        long['step'] = np.rint(long['duration_hours'].to_numpy(dtype=float) / self.dt).astype(np.int64)
+        return long
+
+    def _batches(self, long):
+        """Отклонения точек от эталона -> среднее по (ряд, партия); ряд - номер в self.groups"""
+        keys = [*self.by, 'tag']
+        gid = pd.Series(np.arange(len(self.groups)), index=pd.MultiIndex.from_tuples(self.groups, names=keys))
+        g = gid.reindex(pd.MultiIndex.from_frame(long[keys])).to_numpy()
+        ref = self.ref.reindex(pd.MultiIndex.from_frame(long[[*keys, 'step']])).to_numpy()
+        r = long['value'].to_numpy() - ref
+        ok = np.isfinite(g) & np.isfinite(r)
+        per = pd.DataFrame({'group': g[ok].astype(np.int64), 'batch_id': long['batch_id'].to_numpy()[ok], 'r': r[ok]})
+        return per.groupby(['group', 'batch_id'], sort=True)['r'].mean().reset_index()
+
+    def fit(self, df, tags=TAGS):
+        self.by = [c for c in self.by if c in df.columns]
+        self.tags = [t for t in tags if t in df.columns]
+        times = np.unique(df['duration_hours'].to_numpy(dtype=float))
+        self.dt = float(np.diff(times).min()) if len(times) > 1 else 1.0
+        long = self._long(df)
+        keys = [*self.by, 'tag']
+
+        # Фаза I: эталонный профиль (продукт, опыт, показатель, шаг) и σ партий вокруг него
+        batches = np.sort(long['batch_id'].unique())
+        phase1 = long[long['batch_id'].isin(batches[:self.ref_batches])]
+        self.ref = phase1.groupby([*keys, 'step'], observed=True)['value'].mean()
+        level = phase1.groupby(keys, observed=True)['value'].apply(lambda v: float(np.abs(v).mean()))
+        self.groups = list(level.index)
+        self.gid = {g: i for i, g in enumerate(self.groups)}
+        spread = self._batches(phase1).groupby('group')['r'].std(ddof=1)
+        spread = spread.reindex(range(len(self.groups))).fillna(0.0).to_numpy()
+        # Пол σ: детерминированная история (одна партия, нет шума) не дает нулевых границ
+        self.sigma = np.maximum(spread, 1e-3 * level.to_numpy())
+
+        n_g = len(self.groups)
+        self.z = np.zeros(n_g)
+        self.cp = np.zeros(n_g)
+        self.cm = np.zeros(n_g)
+        self.n = np.zeros(n_g, dtype=np.int64)
+        self.parts = []
+        return self.update(df)
+
+    def update(self, df):
+        """Дописать партии df (позже уже учтенных) ко всем рядам; возвращает self"""
+        per = self._batches(self._long(df))
+        if per.empty:
+            return self
+        g = per['group'].to_numpy()
+        x = per['r'].to_numpy() / self.sigma[g]
+
+        # Матрица (ряды × партии) с хвостами у коротких рядов; строки уже по партиям
+        counts = np.bincount(g, minlength=len(self.groups))
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        col = np.arange(len(g)) - starts[g]
+        mat = np.zeros((len(self.groups), int(counts.max())))
+        mat[g, col] = x
+
+        z = ewma(mat, self.lam, self.z)
+        cp = cusum(mat - self.k, self.cp)
+        cm = cusum(-mat - self.k, self.cm)
+        # Номер точки в ряду -> ширина границ EWMA (узкие в начале карты)
+        n_pt = self.n[g] + col + 1
+        lim = self.L * np.sqrt(self.lam / (2 - self.lam) * (1 - (1 - self.lam) ** (2 * n_pt)))
+
+        part = pd.DataFrame({
+            'group': g, 'batch_id': per['batch_id'].to_numpy(), 'x': x,
+            'ewma': z[g, col], 'limit': lim, 'cusum_hi': cp[g, col], 'cusum_lo': cm[g, col],
+        })
+        part['ewma_ooc'] = np.abs(part['ewma']) > part['limit']
+        part['cusum_ooc'] = (part['cusum_hi'] > self.h) | (part['cusum_lo'] > self.h)
+        self.parts.append(part)
+
+        last = np.flatnonzero(counts)
+        self.z[last] = z[last, counts[last] - 1]
+        self.cp[last] = cp[last, counts[last] - 1]
+        self.cm[last] = cm[last, counts[last] - 1]
+        self.n += counts
+        return self
+
+    def points(self):
+        """Все точки всех рядов"""
+        return pd.concat(self.parts, ignore_index=True) if self.parts else pd.DataFrame()
+
+    def series(self, group):
+        """Точки одного ряда (опыт, ..., показатель) по порядку"""
+        pts = self.points()
+        return pts[pts['group'] == self.gid[tuple(group)]].reset_index(drop=True)
+
+    def summary(self):
+        """Сводка по рядам: точки, партии, σ, выходы за границы и первая партия с сигналом"""
+        pts = self.points()
+        agg = pts.groupby('group').agg(
+            n=('x', 'size'), batches=('batch_id', 'nunique'),
+            ewma_ooc=('ewma_ooc', 'sum'), cusum_ooc=('cusum_ooc', 'sum'))
+        alarm = pts['ewma_ooc'] | pts['cusum_ooc']
+        signal = pts[alarm].groupby('group')['batch_id'].min()
+        # Сигнал - вход в тревогу: серия точек за границей после одного сдвига считается один раз
+        onsets = (alarm & ~alarm.groupby(pts['group']).shift(fill_value=False)).groupby(pts['group']).sum()
+        rows = []
+        for i, key in enumerate(self.groups):
+            a = agg.loc[i] if i in agg.index else None
+            rows.append({
+                **dict(zip([*self.by, 'tag'], key)),
+                'Точек': int(a['n']) if a is not None else 0,
+                'Партий': int(a['batches']) if a is not None else 0,
+                'σ': float(self.sigma[i]),
+                'EWMA вне границ': int(a['ewma_ooc']) if a is not None else 0,
+                'CUSUM вне границ': int(a['cusum_ooc']) if a is not None else 0,
+                'Сигналов': int(onsets.get(i, 0)),
+                'Первый сигнал (партия)': signal.get(i, np.nan),
+            })
+        out = pd.DataFrame(rows)
+        out['tag'] = out['tag'].map(TAG_LABELS).fillna(out['tag'])
+        return out.rename(columns={'productname': 'Продукт', 'experiment_type': 'Опыт', 'tag': 'Показатель'})
+
+
+def kinetic_history(n_batches=300, seed=0, t_step=0.5, starter_fade=0.0, fade_from=None):
+    """История партий всех опытов по кинетике закваски (kinetics.py) с разбросом партий.
+
+    starter_fade - доля потери активности закваски, нарастающая линейно с партии
+    fade_from до последней (сценарий дрейфа для проверки карт). Влага Иримшика - по
+    формуле сушки DB.py с разбросом скорости 5 % между партиями.
+    """
+    import kinetics
+
+    params = kinetics.batch_params(n_batches, seed=seed)
+    n_sc = len(kinetics.scenario_params()['dose'])
+    batch = np.tile(np.arange(n_batches), n_sc)
+    if starter_fade:
+        start = n_batches // 2 if fade_from is None else fade_from
+        fade = np.clip((batch - start) / max(n_batches - 1 - start, 1), 0.0, 1.0) * starter_fade
+        params['x0'] = params['x0'] * (1.0 - fade)
+    sim = kinetics.simulate(params)
+    every = max(int(round(t_step * 60)), 1)
+    t = sim['t'][::every]
+    ph = sim['pH'][:, ::every].astype(float)
+
+    ayran = params['ayran'][:, None]
+    dose = params['dose'][:, None]
+    acid = np.where(ayran, 20 + (5.98 - ph) * 40, 20 + (5.98 - ph) * 10)
+    rng = np.random.default_rng(seed + 1)
+    k_speed = (0.3 + 0.02 * dose) * (1.0 + rng.normal(0.0, 0.05, (len(batch), 1)))
+    moisture = np.where(ayran, np.nan, 18.0 + (75.0 - dose * 0.8 - 18.0) * np.exp(-k_speed * t))
+
+    n_t = len(t)
+    return pd.DataFrame({
+        'productname': np.repeat(np.where(params['ayran'], 'Айран', 'Сары ірімшік'), n_t),
+        'experiment_type': np.repeat(params['name'], n_t),
+        'batch_id': np.repeat(batch, n_t),
+        'duration_hours': np.tile(t, len(batch)),
+        'ph': ph.ravel(),
+        'кислотность': acid.ravel(),
+        'влага': moisture.ravel(),
+    })
+
+
+if __name__ == "__main__":
+    # Замер: история 2 года (730 партий на каждый из 11 опытов) -> все карты одним проходом;
+    # дозапись одной партии; проверка векторных EWMA/CUSUM против рекурсии;
+    # ARL0 - партий между ложными тревогами на истории без дрейфа
+    import time
+
+    rng = np.random.default_rng(0)
+    x = rng.normal(0, 1, (4, 5000))
+    z_ref, c_ref = np.zeros_like(x), np.zeros_like(x)
+    z = c = np.zeros(4)
+    for i in range(x.shape[1]):
+        z = LAMBDA * x[:, i] + (1 - LAMBDA) * z
+        c = np.maximum(0.0, c + x[:, i] - K_CUSUM)
+        z_ref[:, i], c_ref[:, i] = z, c
+    print(f"   - сверка с рекурсией: EWMA {np.abs(ewma(x) - z_ref).max():.1e}, "
+          f"CUSUM {np.abs(cusum(x - K_CUSUM) - c_ref).max():.1e}")
+
+    t0 = time.perf_counter()
+    hist = kinetic_history(730, starter_fade=0.5, fade_from=365)
+    t_hist = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    chart = SpcChart().fit(hist[hist['batch_id'] < 729])
+    t_fit = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    chart.update(hist[hist['batch_id'] == 729])
+    t_upd = time.perf_counter() - t0
+    pts = chart.points()
+    print(f"📊 {hist['batch_id'].nunique() * 11:,} партий ({len(hist):,} строк), {len(chart.groups)} карт: "
+          f"история {t_hist:.2f} с, EWMA + CUSUM всех карт {t_fit:.2f} с, дозапись партии {t_upd * 1e3:.0f} мс")
+
+    # Закваска слабеет с партии 365 (до -50 % к партии 729): доля партий с сигналом до и после
+    ayran = [i for i, g in enumerate(chart.groups) if g[0] == 'Айран' and g[2] == 'ph']
+    sig = pts[pts['group'].isin(ayran)]
+    ooc = sig['ewma_ooc'] | sig['cusum_ooc']
+    before = ooc[sig['batch_id'] < 365].mean()
+    after = ooc[sig['batch_id'] >= 547].mean()
+    first = sig[ooc & (sig['batch_id'] >= 365)].groupby('group')['batch_id'].min()
+    print(f"   - pH Айрана (8 карт): точек за границей до дрейфа {before:.1%}, в последней четверти {after:.1%}; "
+          f"первый сигнал дрейфа - партия {int(first.median())} (медиана; закваска -{0.5 * (first.median() - 365) / 364:.0%})")
+
+    calm = SpcChart().fit(kinetic_history(2000, seed=1)).points()
+    noisy = calm.groupby('group')['x'].transform('std') > 0     # без детерминированных рядов
+    pts = calm[noisy & (calm['batch_id'] >= REF_BATCHES)]
+    alarm = pts['ewma_ooc'] | pts['cusum_ooc']
+    n_sig = int((alarm & ~alarm.groupby(pts['group']).shift(fill_value=False)).sum())
+    print(f"   - без дрейфа: {n_sig} ложных сигналов на {len(pts):,} партий фазы II "
+          f"({alarm.mean():.1%} точек за границей) -> ARL0 ~{len(pts) / max(n_sig, 1):.0f} партий")
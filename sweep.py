@@ -0,0 +1,213 @@
+# sweep.py
+# ============================================
+# Поверхности отклика: расчет объема (температура × доза × время) по формулам DB.py
+# ============================================
+#
+# Ферментация Айрана: pH = 5.98 - k(доза)·f(T)·ln(t+1), k(доза) - интерполяция
+# по сценариям DB.SCENARIOS_AYRAN своего типа добавки (контроль = доза 0).
+# Уваривание Иримшика: W = 18 + (75 - 0.8·доза - 18)·exp(-(0.3 + 0.02·доза)·f(T)·t).
+# DB.py ведет процесс при постоянной уставке (42 / 96 °C), поэтому температура
+# входит через коэффициент f(T) = Q10^((T - T_уставки)/10): при уставке f = 1
+# и объем совпадает с генератором.
+
+import threading
+from collections import OrderedDict, namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import DB
+from workers import cpu_count, get_pool
+
+Q10 = 2.0                                    # удвоение скорости на +10 °C (допущение)
+T_REF = {'ayran': 42.0, 'irimshik': 96.0}    # уставки термостата DB.py
+TEMP_STEP = 0.5                              # шаг слайдера температуры = шаг узлов сетки, °C
+
+# Спецификация сетки - ключ кэша. variant: 'dry' / 'wet' (тип добавки Айрана)
+GridSpec = namedtuple('GridSpec', ['product', 'variant', 't_range', 'n_t',
+                                   'dose_range', 'n_dose', 'temp_range', 'n_temp'])
+
+_CHUNK_ROWS = 2000          # строк (температура, доза) на одну задачу пула
+# В текущем процессе объем считается за ~11 нс/ячейку (500×500×25 - 0.07 с), а пул
+# тратит на запуск и раздачу задач ~0.1-1.5 с: он окупается только на очень больших
+# объемах, и результат пишется в общую память, а не пересылается pickle
+_POOL_MIN_CELLS = 50_000_000
+_MAX_BYTES = 512 * 2 ** 20  # предел памяти кэша объемов
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # GridSpec -> объем float32 (LRU)
+
+
+def axes(spec):
+    """Узлы сетки: время, доза, температура"""
+    t = np.linspace(*spec.t_range, spec.n_t)
+    dose = np.linspace(*spec.dose_range, spec.n_dose)
+    temp = np.linspace(*spec.temp_range, spec.n_temp) if spec.n_temp > 1 else np.array([np.mean(spec.temp_range)])
+    return t, dose, temp
+
+
+def temp_grid(lo, hi, step=TEMP_STEP):
+    """(temp_range, n_temp) для GridSpec: узлы lo + k·step, уставка и каждое
+    положение слайдера с тем же шагом - точные узлы"""
+    return (lo, hi), int(round((hi - lo) / step)) + 1
+
+
+def _k_ayran(dose, variant):
+    """Скорость сквашивания k(доза) по сценариям DB.py одного типа добавки"""
+    table = [(0.0, DB.SCENARIOS_AYRAN[0][4])] + [(d, k) for name, type_, d, _, k in DB.SCENARIOS_AYRAN
+                                                  if type_ == variant and d > 0]
+    doses, ks = np.array(table).T
+    return np.interp(dose, doses, ks)
+
+
+def evaluate(product, variant, t, dose, temp):
+    """pH (ayran) или влага (irimshik) для массивов t, dose, temp (с трансляцией)"""
+    f = Q10 ** ((np.asarray(temp) - T_REF[product]) / 10.0)
+    if product == 'ayran':
+        return 5.98 - _k_ayran(dose, variant) * f * np.log(t + 1.0)
+    w_start = 75.0 - dose * 0.8
+    return 18.0 + (w_start - 18.0) * np.exp(-(0.3 + 0.02 * dose) * f * t)
+
+
+def _rows(spec, r0, r1):
+    """Строки r0:r1 развернутой сетки (температура × доза) по всему времени"""
+    t, dose, temp = axes(spec)
+    rows = np.arange(r0, r1)
+    ti, di = np.divmod(rows, spec.n_dose)
+    return evaluate(spec.product, spec.variant, t, dose[di][:, None], temp[ti][:, None]).astype(np.float32)
+
+
+def _fill(spec, r0, r1, shm_name):
+    """Задача пула: строки r0:r1 пишутся прямо в общий объем, назад уходит только None"""
+    # Трекер ресурсов у пула общий с родителем: блок удаляет только родитель (unlink)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((spec.n_temp * spec.n_dose, spec.n_t), dtype=np.float32, buffer=shm.buf)
+        out[r0:r1] = _rows(spec, r0, r1)
+        del out
+    finally:
+        shm.close()
+
+
+def sweep(spec, workers=None):
+    """Объем (n_temp, n_dose, n_t) для спецификации сетки.
+
+    По умолчанию объем считается в текущем процессе блоками строк. Пул (workers > 1
+    или workers=None на многоядерной машине) включается только от _POOL_MIN_CELLS
+    ячеек; процессы пишут свои строки в общую память. Готовые объемы хранятся в LRU
+    по GridSpec с пределом памяти; вкладки страниц берут из них срезы.
+    """
+    spec = GridSpec(*spec)
+    with _lock:
+        vol = _cache.get(spec)
+        if vol is not None:
+            _cache.move_to_end(spec)
+            return vol
+
+    n_rows = spec.n_temp * spec.n_dose
+    bounds = [(r, min(r + _CHUNK_ROWS, n_rows)) for r in range(0, n_rows, _CHUNK_ROWS)]
+    workers = workers or cpu_count()
+    if workers == 1 or len(bounds) == 1 or n_rows * spec.n_t < _POOL_MIN_CELLS:
+        vol = np.empty((n_rows, spec.n_t), dtype=np.float32)
+        for r0, r1 in bounds:
+            vol[r0:r1] = _rows(spec, r0, r1)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=n_rows * spec.n_t * 4)
+        try:
+            list(get_pool(workers).map(_fill, *zip(*[(spec, r0, r1, shm.name) for r0, r1 in bounds])))
+            vol = np.ndarray((n_rows, spec.n_t), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+    vol = vol.reshape(spec.n_temp, spec.n_dose, spec.n_t)
+    vol.flags.writeable = False     # общий для всех сессий
+
+    with _lock:
+        _cache[spec] = vol
+        while sum(v.nbytes for v in _cache.values()) > _MAX_BYTES and len(_cache) > 1:
+            _cache.popitem(last=False)
+    return vol
+
+
+def surface(spec, temp):
+    """Срез объема при температуре temp: оси (доза, время) и Z (доза × время).
+
+    В узле сетки - вид кэшированного объема без копии, между узлами - линейная
+    интерполяция двух соседних уровней температуры.
+    """
+    t, dose, temps = axes(spec)
+    vol = sweep(spec)
+    pos = float(np.interp(temp, temps, np.arange(len(temps))))
+    i = int(np.floor(pos))
+    w = pos - i
+    if w < 1e-9 or i + 1 >= len(temps):
+        return dose, t, vol[min(i, len(temps) - 1)]
+    return dose, t, ((1.0 - w) * vol[i] + w * vol[i + 1]).astype(np.float32)
+
+
+if __name__ == "__main__":
+    # Замер: объем 500×500×20 (pH Айрана, сухая добавка) vs прежняя сетка 40×40 на каждый перезапуск
+    import time
+
+    spec = GridSpec('ayran', 'dry', (2.0, 10.0), 500, (1.0, 3.0), 500, *temp_grid(36.0, 48.0))
+    cpus = cpu_count()
+    _cache.clear()
+    t0 = time.perf_counter()
+    vol = sweep(spec)
+    print(f"📊 Объем {spec.n_temp}×{spec.n_dose}×{spec.n_t} ({vol.nbytes / 1e6:.0f} МБ), "
+          f"по умолчанию (в процессе, ядер {cpus}): {time.perf_counter() - t0:.3f} с")
+    # Пул принудительно (порог 0): холодный запуск и повтор на прогретом пуле, строки - через общую память
+    threshold, _POOL_MIN_CELLS = _POOL_MIN_CELLS, 0
+    for run in ("холодный", "прогретый"):
+        _cache.clear()
+        t0 = time.perf_counter()
+        same = np.array_equal(sweep(spec, workers=max(cpus, 2)), vol)
+        print(f"   - пул {max(cpus, 2)} процессов, {run}: {time.perf_counter() - t0:.3f} с (совпадает: {same})")
+    _POOL_MIN_CELLS = threshold
+    t0 = time.perf_counter()
+    dose, t, z = surface(spec, 42.0)
+    print(f"   - срез из кэша (42 °C): {(time.perf_counter() - t0) * 1e3:.3f} мс, форма {z.shape}")
+
+    # Сверка с генератором: при уставке 42 °C точки сценариев совпадают с DB.py
+    df = DB.build_dataframe()
+    ref = df[(df['productname'] == 'Айран') & (df['experiment_type'] == 'Опыт 1 (Сухая 2%)')]
+    calc = evaluate('ayran', 'dry', ref['duration_hours'].to_numpy(), 2.0, 42.0)
+    print(f"   - макс. расхождение с DB.py (Сухая 2%, 42 °C): {np.abs(calc - ref['ph'].to_numpy()).max():.2e}")
+    # Срез поверхности при уставке - узел сетки: совпадает с формулой без интерполяции
+    t_ax, d_ax = axes(spec)[:2]
+    exact = evaluate('ayran', 'dry', t_ax[None, :], d_ax[:, None], 42.0)
+    print(f"   - срез 42 °C vs формула: {np.abs(z - exact).max():.2e} (float32)")
+
+    t0 = time.perf_counter()
+    T, D = np.meshgrid(np.linspace(2, 10, 40), np.linspace(1, 3, 40))
+    Z = 4.8 - (0.12 * np.log(T)) - (0.02 * D) + (0.01 * T * D / 10)
+    print(f"   - прежний расчет 40×40 на перезапуск: {(time.perf_counter() - t0) * 1e3:.3f} мс")
+
+    # Замер: PNG matplotlib (стиль преподавателя) vs фигура Plotly WebGL (сетка уходит бинарно)
+    import io
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    for n in (40, 200, 500):
+        dose, t, z = surface(spec._replace(n_t=n, n_dose=n), 42.0)
+        t0 = time.perf_counter()
+        T, D = np.meshgrid(t, dose)
+        fig = plt.figure(figsize=(12, 10))
+        ax = fig.add_subplot(111, projection='3d')
+        ax.plot_surface(D, T, z, cmap='jet', edgecolor='k', linewidth=0.2, alpha=0.9)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
+        t_png = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        fig = go.Figure(go.Surface(x=dose.astype(np.float32), y=t.astype(np.float32),
+                                   z=np.ascontiguousarray(z.T, dtype=np.float32), colorscale='Jet'))
+        payload = pio.to_json(fig)
+        t_gl = time.perf_counter() - t0
+        print(f"📊 Поверхность {n}×{n}: matplotlib PNG {t_png * 1e3:.0f} мс ({buf.tell() / 1e3:.0f} КБ, "
+              f"по факту {min(n, 50)}×{min(n, 50)} граней); Plotly WebGL {t_gl * 1e3:.0f} мс "
+              f"({len(payload) / 1e3:.0f} КБ, все {n * n:,} точек, вращение в браузере)")
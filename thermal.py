@@ -0,0 +1,221 @@
+# thermal.py
+# ============================================
+# Тепловой расчет смены: нагрев, выдержка, охлаждение всех партий плана сразу
+# ============================================
+#
+# Партия (m, кг) в аппарате с паровой рубашкой и контуром ледяной воды:
+#   нагрев:     m·cp·dT/dt = min(P_max, UA_н·(T_пара - T)) - UA_пот·(T - T_цеха)
+#   выдержка:   T = T_паст, подвод тепла = потери
+#   охлаждение: m·cp·dT/dt = -UA_охл·(T - T_воды) - UA_пот·(T - T_цеха)
+# Рекуперация r: входящее молоко подогревается горячим продуктом на r·(T_паст - T_вх),
+# продукт на столько же остывает без затрат холода.
+# Интегрирование - RK4 с постоянным шагом, вектором по всем партиям; мощность
+# каждого шага сразу раскладывается по минутным корзинам графика нагрузки.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CP_MILK = 3.9               # кДж/(кг·К), как во вкладке «Энергетика»
+DENSITY = 1.03              # кг/л
+T_STEAM = 140.0             # °C, пар в рубашке
+T_WATER = 2.0               # °C, ледяная вода
+T_SHOP = 20.0               # °C, цех
+P_HEAT_MAX = 150.0          # кВт на 1000 л (производительность парогенератора)
+UA_HEAT = 5.0               # кВт/К на 1000 л
+UA_COOL = 4.0               # кВт/К на 1000 л
+UA_LOSS = 0.05              # кВт/К на 1000 л (теплопотери в цех)
+COP = 3.0                   # холодильный коэффициент: кВт электричества = кВт холода / COP
+DEMAND_MIN = 15             # интервал учета пиковой мощности, мин
+
+# Продукт: (T пастеризации/варки, T после охлаждения, выдержка, ч) - из техкарты вкладки «Энергетика»
+PRODUCT_TEMPS = {'Айран': (84.0, 42.0, 10 / 60), 'Сары ірімшік': (96.0, 20.0, 15 / 60)}
+# Стадия журнала plant_sim, с которой начинается тепловая обработка
+HEAT_STAGE = {'Айран': 'Пастеризация', 'Сары ірімшік': 'Варка'}
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # отпечаток плана -> результат (LRU)
+_MAX_CACHE = 16
+
+
+def _plan_key(plan, *params):
+    h = hashlib.blake2b(digest_size=16)
+    for col in ('start_h', 'volume_l', 't_in', 't_past', 't_cool', 'hold_h'):
+        h.update(np.ascontiguousarray(plan[col].to_numpy(dtype=float)).tobytes())
+    h.update(repr(params).encode())
+    return h.hexdigest()
+
+
+def plan_from_log(log, volume_l=1000.0, t_in=10.0):
+    """План тепловой обработки из журнала стадий plant_sim: старт нагрева каждой партии"""
+    stage = log['productname'].map(HEAT_STAGE)
+    rows = log[log['stage'] == stage]
+    temps = rows['productname'].map(PRODUCT_TEMPS)
+    return pd.DataFrame({
+        'batch': rows['batch'].to_numpy(),
+        'productname': rows['productname'].to_numpy(),
+        'start_h': rows['start_h'].to_numpy(dtype=float),
+        'volume_l': float(volume_l),
+        't_in': float(t_in),
+        't_past': [t[0] for t in temps],
+        't_cool': [t[1] for t in temps],
+        'hold_h': [t[2] for t in temps],
+    })
+
+
+def simulate_plan(plan, regen=0.0, dt_s=15.0, bin_min=1.0, max_hours=8.0):
+    """Профили всех партий плана.
+
+    plan - DataFrame: start_h, volume_l, t_in, t_past, t_cool, hold_h.
+    Возвращает {'batches': кВт·ч и длительности по партиям, 'profile': кВт по
+    минутам (тепло - пар, холод - электричество чиллера), 'peak': пики за
+    DEMAND_MIN минут, 'trace': температура и мощность первой партии}.
+    Результат кэшируется по отпечатку плана и параметрам.
+    """
+    key = _plan_key(plan, regen, dt_s, bin_min, max_hours)
+    with _lock:
+        res = _cache.get(key)
+        if res is not None:
+            _cache.move_to_end(key)
+            return res
+
+    n = len(plan)
+    scale = plan['volume_l'].to_numpy(dtype=float) / 1000.0
+    mcp = plan['volume_l'].to_numpy(dtype=float) * DENSITY * CP_MILK        # кДж/К
+    t_in = plan['t_in'].to_numpy(dtype=float)
+    t_past = plan['t_past'].to_numpy(dtype=float)
+    t_cool = plan['t_cool'].to_numpy(dtype=float)
+    hold_left = plan['hold_h'].to_numpy(dtype=float).copy()
+    start = plan['start_h'].to_numpy(dtype=float)
+    p_max, ua_h, ua_c, ua_l = P_HEAT_MAX * scale, UA_HEAT * scale, UA_COOL * scale, UA_LOSS * scale
+
+    dt = dt_s / 3600.0
+    temp = t_in + regen * (t_past - t_in)           # подогрев рекуператором
+    phase = np.zeros(n, dtype=np.int8)              # 0 нагрев, 1 выдержка, 2 охлаждение, 3 готово
+    heat_kwh = np.zeros(n)
+    cool_kwh = np.zeros(n)
+    t_heat_end = np.full(n, np.nan)
+    t_done = np.full(n, np.nan)
+
+    bin_h = bin_min / 60.0
+    n_bins = int(np.ceil((start.max(initial=0.0) + max_hours) / bin_h)) + 1
+    heat_prof = np.zeros(n_bins)
+    cool_prof = np.zeros(n_bins)
+    trace = []
+
+    def rhs(T, heating, cooling):
+        q_h = np.where(heating, np.minimum(p_max, ua_h * (T_STEAM - T)), 0.0)
+        q_c = np.where(cooling, ua_c * (T - T_WATER), 0.0)
+        return (q_h - q_c - ua_l * (T - T_SHOP)) * 3600.0 / mcp, q_h, q_c
+
+    n_steps = int(max_hours / dt)
+    for step in range(n_steps):
+        active = phase < 3
+        if not active.any():
+            break
+        tau = step * dt
+        heating, holding, cooling = phase == 0, phase == 1, phase == 2
+        # RK4 для нагрева/охлаждения; на выдержке температура стоит, тепло = потери
+        k1, q_h, q_c = rhs(temp, heating, cooling)
+        k2 = rhs(temp + 0.5 * dt * k1, heating, cooling)[0]
+        k3 = rhs(temp + 0.5 * dt * k2, heating, cooling)[0]
+        k4 = rhs(temp + dt * k3, heating, cooling)[0]
+        moving = heating | cooling
+        temp = np.where(moving, temp + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4), temp)
+        q_h = np.where(holding, ua_l * (temp - T_SHOP), q_h)
+        heat_kwh += q_h * dt
+        cool_kwh += q_c * dt
+        # Нагрузка цеха: тепло (пар) и электричество чиллера в корзину времени шага
+        # (средняя мощность корзины = энергия шагов / длительность корзины)
+        idx = ((start + tau) / bin_h + 1e-9).astype(np.int64)
+        w = dt / bin_h
+        heat_prof += np.bincount(idx[active], weights=q_h[active] * w, minlength=n_bins)[:n_bins]
+        cool_prof += np.bincount(idx[active], weights=q_c[active] * (w / COP), minlength=n_bins)[:n_bins]
+        if n:
+            trace.append((tau, temp[0], q_h[0], q_c[0] / COP))
+
+        # Переходы стадий
+        reached = heating & (temp >= t_past)
+        temp = np.where(reached, t_past, temp)
+        t_heat_end = np.where(reached, tau + dt, t_heat_end)
+        hold_left = np.where(holding, hold_left - dt, hold_left)
+        released = holding & (hold_left <= 0)
+        # Рекуператор: продукт отдает тепло входящему молоку без затрат холода
+        temp = np.where(released, np.maximum(t_past - regen * (t_past - t_in), t_cool), temp)
+        finished = cooling & (temp <= t_cool + 0.5)
+        t_done = np.where(finished, tau + dt, t_done)
+        phase = np.where(reached, 1, np.where(released, 2, np.where(finished, 3, phase))).astype(np.int8)
+        # Охлаждать не нужно (рекуперация довела до уставки) - партия готова
+        skip = released & (temp <= t_cool + 0.5)
+        phase[skip] = 3
+        t_done = np.where(skip, tau + dt, t_done)
+
+    # Электричество для тепла считается отдельно (пар); пик - по средней за DEMAND_MIN минут
+    per = max(int(round(DEMAND_MIN / bin_min)), 1)
+    def peak(profile):
+        if len(profile) < per:
+            return float(profile.mean()) if len(profile) else 0.0
+        return float(np.convolve(profile, np.ones(per) / per, mode='valid').max())
+
+    batches = pd.DataFrame({
+        'Партия': plan['batch'].to_numpy() if 'batch' in plan else np.arange(n),
+        'Продукт': plan['productname'].to_numpy() if 'productname' in plan else '',
+        'Старт, ч': start,
+        'Нагрев, ч': t_heat_end,
+        'Цикл, ч': t_done,
+        'Тепло, кВт·ч': heat_kwh,
+        'Холод (эл.), кВт·ч': cool_kwh / COP,
+    })
+    profile = pd.DataFrame({'Тепло (пар), кВт': heat_prof, 'Холод (эл.), кВт': cool_prof},
+                           index=pd.Index(np.arange(n_bins) * bin_h, name='Время, ч'))
+    profile = profile.loc[:profile.sum(axis=1).to_numpy().nonzero()[0].max(initial=0)]
+    trace = pd.DataFrame(trace, columns=['Время, ч', 'T, °C', 'Тепло, кВт', 'Холод (эл.), кВт']).set_index('Время, ч')
+    res = {
+        'batches': batches,
+        'profile': profile,
+        'peak': {'heat': peak(heat_prof), 'cool': peak(cool_prof), 'total': peak(heat_prof + cool_prof)},
+        'kwh': {'heat': float(heat_kwh.sum()), 'cool': float(cool_kwh.sum() / COP)},
+        'trace': trace,
+        'unfinished': int((phase < 3).sum()),
+    }
+    with _lock:
+        _cache[key] = res
+        while len(_cache) > _MAX_CACHE:
+            _cache.popitem(last=False)
+    return res
+
+
+if __name__ == "__main__":
+    # Замер: 10 000 партий (смена крупного цеха, старт каждые 3 с) + сверка с Q = m·cp·ΔT
+    import time
+
+    n = 10_000
+    rng = np.random.default_rng(0)
+    product = np.where(rng.random(n) < 0.7, 'Айран', 'Сары ірімшік')
+    temps = np.array([PRODUCT_TEMPS[p] for p in product])
+    plan = pd.DataFrame({'batch': np.arange(n), 'productname': product,
+                         'start_h': np.sort(rng.uniform(0, 8, n)), 'volume_l': 1000.0, 't_in': 10.0,
+                         't_past': temps[:, 0], 't_cool': temps[:, 1], 'hold_h': temps[:, 2]})
+    t0 = time.perf_counter()
+    res = simulate_plan(plan)
+    elapsed = time.perf_counter() - t0
+    print(f"📊 {n:,} партий, шаг 15 с: {elapsed:.2f} с; пик (15 мин) тепло {res['peak']['heat'] / 1e3:,.1f} МВт, "
+          f"холод {res['peak']['cool'] / 1e3:,.1f} МВт(эл.); всего {res['kwh']['heat'] / 1e3:,.0f} МВт·ч тепла, "
+          f"незавершено {res['unfinished']}")
+    t0 = time.perf_counter()
+    simulate_plan(plan)
+    print(f"   - повтор плана из кэша: {(time.perf_counter() - t0) * 1e3:.2f} мс")
+
+    # Одна партия Айрана 1000 л, 10 °C: ODE vs стационарная формула вкладки (плюс потери)
+    one = plan.iloc[:1].assign(productname='Айран', t_past=84.0, t_cool=42.0, hold_h=10 / 60, start_h=0.0)
+    r1 = simulate_plan(one)
+    q_formula = 1000 * DENSITY * CP_MILK * (84.0 - 10.0) / 3600
+    b = r1['batches'].iloc[0]
+    print(f"   - партия Айрана: нагрев {b['Нагрев, ч'] * 60:.0f} мин, цикл {b['Цикл, ч'] * 60:.0f} мин; "
+          f"тепло {b['Тепло, кВт·ч']:.1f} кВт·ч (формула m·cp·ΔT: {q_formula:.1f}); пик {r1['peak']['heat']:.0f} кВт")
+    r2 = simulate_plan(one, regen=0.6)
+    print(f"   - с рекуперацией 60%: тепло {r2['batches'].iloc[0]['Тепло, кВт·ч']:.1f} кВт·ч, "
+          f"холод (эл.) {r2['batches'].iloc[0]['Холод (эл.), кВт·ч']:.1f} vs {b['Холод (эл.), кВт·ч']:.1f} кВт·ч")
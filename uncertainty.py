@@ -0,0 +1,189 @@
+# uncertainty.py
+# ============================================
+# Монте-Карло: полосы неопределенности прогноза и вероятность тревог
+# ============================================
+#
+# Траектория: y(t) = a + b·ln(t+1) (та же модель, что у прогноза main.py),
+# (a, b) ~ N(среднее, ковариация) - разброс стартового значения и скорости k = -b.
+# Шум датчика pH - шум ОВП генератора DB.py: orp = 200 - 30·pH + N(0, 2 мВ),
+# pH датчика пересчитывается из ОВП, поэтому его шум 2/30 ≈ 0.067, а полосы ОВП
+# получаются из полос pH без отдельной выборки.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from models import fit_groups
+from workers import cpu_count, get_pool
+
+ORP_NOISE_MV = 2.0          # как в DB.py
+MOISTURE_NOISE = 0.5        # шум влагомера, % (допущение)
+
+# Тревоги светофора: (название, сравнение, порог, действует с часа процесса)
+ALARMS = {
+    'ph': [('ПЕРЕКИСАНИЕ', '<', 4.0, 0.0), ('НЕДОКВАС', '>', 5.0, 6.0)],
+    'влага': [('ПЕРЕСУШКА', '<', 15.0, 0.0)],
+}
+
+T_GRID = np.linspace(0.0, 10.0, 101)
+PERCENTILES = (5, 25, 50, 75, 95)
+_BINS = 4000                # бины гистограммы для слияния перцентилей из процессов
+_CHUNK = 50_000             # траекторий за один векторный шаг (ограничение памяти)
+OVERVIEW_PATHS = 20_000     # светофор главной страницы: ~0.1 с, ошибка вероятности < 0.4 п.п.
+
+_lock = threading.Lock()
+_cache = OrderedDict()      # (ключ партии, параметры) -> результат (LRU)
+_MAX_CACHE = 128
+
+
+def param_distribution(df, target_col, by=('experiment_type', 'batch_id')):
+    """Среднее и ковариация (a, b) лог-модели: разброс между опытами/партиями
+    плюс стандартная ошибка МНК (при одной группе остается только она)"""
+    by = [c for c in by if c in df.columns]
+    sub = df[['duration_hours', target_col]].dropna()
+    x = np.log(sub['duration_hours'].to_numpy(dtype=float) + 1.0)
+    y = sub[target_col].to_numpy(dtype=float)
+    # МНК по всей выборке и его ковариация
+    mx, sxx = x.mean(), ((x - x.mean()) ** 2).sum()
+    b = ((x - mx) * (y - y.mean())).sum() / sxx
+    a = y.mean() - b * mx
+    s2 = ((y - a - b * x) ** 2).sum() / max(len(x) - 2, 1)
+    cov = s2 * np.array([[1.0 / len(x) + mx * mx / sxx, -mx / sxx], [-mx / sxx, 1.0 / sxx]])
+    if by:
+        coefs = fit_groups(df, by, y_col=target_col, form='log')
+        if len(coefs) >= 3:
+            cov = cov + np.cov(coefs[['a', 'b']].to_numpy().T)
+    return np.array([a, b]), cov
+
+
+def _paths(mean, cov, t, n, target_col, rng):
+    """n траекторий измерения датчика (float32)"""
+    ab = rng.multivariate_normal(mean, cov, size=n, method="cholesky").astype(np.float32)
+    y = ab[:, :1] + ab[:, 1:] * np.log(t + 1.0).astype(np.float32)
+    # pH датчика = (200 - ОВП) / 30 -> шум ОВП / 30; влагомер - собственный шум
+    noise_sd = ORP_NOISE_MV / 30.0 if target_col == 'ph' else MOISTURE_NOISE
+    noise = rng.standard_normal(y.shape, dtype=np.float32)
+    noise *= noise_sd
+    y += noise
+    return y
+
+
+def _worker(mean, cov, t, n, target_col, seed, lo, hi):
+    """Часть траекторий: гистограмма по времени и счетчики тревог (сливаются суммой)"""
+    rng = np.random.default_rng(seed)
+    alarms = ALARMS.get(target_col, [])
+    hist = np.zeros(len(t) * _BINS, dtype=np.int64)
+    now = np.zeros((len(alarms), len(t)), dtype=np.int64)      # тревога в момент t
+    ever = np.zeros((len(alarms), len(t)), dtype=np.int64)     # тревога хоть раз к моменту t
+    row = np.arange(len(t), dtype=np.int64) * _BINS
+    scale = np.float32(_BINS / (hi - lo))
+    for start in range(0, n, _CHUNK):
+        y = _paths(mean, cov, t, min(_CHUNK, n - start), target_col, rng)
+        idx = np.clip((y - np.float32(lo)) * scale, 0, _BINS - 1).astype(np.int64)
+        idx += row
+        hist += np.bincount(idx.ravel(), minlength=len(t) * _BINS)
+        for j, (_, op, thr, t_min) in enumerate(alarms):
+            cond = (y < thr) if op == '<' else (y > thr)
+            cond &= t >= t_min
+            now[j] += cond.sum(0)
+            ever[j] += np.maximum.accumulate(cond.view(np.uint8), axis=1).sum(0, dtype=np.int64)
+    return hist.reshape(len(t), _BINS), now, ever
+
+
+def _percentiles(hist, lo, hi):
+    """Перцентили по времени из гистограммы (середина бина)"""
+    cdf = np.cumsum(hist, axis=1) / hist.sum(1, keepdims=True)
+    centers = lo + (np.arange(_BINS) + 0.5) * (hi - lo) / _BINS
+    return {p: centers[np.argmax(cdf >= p / 100.0, axis=1)] for p in PERCENTILES}
+
+
+def forecast_bands(mean, cov, target_col, n=200_000, t=T_GRID, workers=None, seed=0, key=None):
+    """Полосы перцентилей и вероятности тревог по n траекториям.
+
+    По умолчанию расчет идет векторно в текущем процессе: пул не ускоряет его
+    (1M траекторий - 4.5 с в процессе против 5.95 с на 2 процессах), поэтому
+    workers > 1 - только явный выбор для замеров. Результат кэшируется по
+    key (например, (продукт, опыт)) и параметрам распределения.
+    Возвращает t, bands {колонка: {перцентиль: массив}}, p_now/p_ever {тревога: массив}.
+    """
+    mean = np.asarray(mean, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    cache_key = (key, target_col, n, seed, len(t), float(t[-1]),
+                 tuple(np.round(mean, 10)), tuple(np.round(cov.ravel(), 14)))
+    with _lock:
+        res = _cache.get(cache_key)
+        if res is not None:
+            _cache.move_to_end(cache_key)
+            return res
+
+    # Границы гистограммы по пилотной выборке (+ запас); хвосты за ними - в крайние бины
+    pilot = _paths(mean, cov, t, 2000, target_col, np.random.default_rng(seed + 1))
+    pad = 0.25 * float(pilot.max() - pilot.min()) + 1e-6
+    lo, hi = float(pilot.min()) - pad, float(pilot.max()) + pad
+
+    workers = workers or 1
+    sizes = [n // workers + (i < n % workers) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    if workers == 1:
+        parts = [_worker(mean, cov, t, n, target_col, seeds[0], lo, hi)]
+    else:
+        pool = get_pool(workers)
+        parts = list(pool.map(_worker, *zip(*[(mean, cov, t, m, target_col, s, lo, hi)
+                                              for m, s in zip(sizes, seeds)])))
+
+    bands = {target_col: _percentiles(sum(p[0] for p in parts), lo, hi)}
+    if target_col == 'ph':
+        # ОВП = 200 - 30·pH датчика: монотонное преобразование, перцентили зеркалятся
+        bands['orp_mv'] = {p: 200.0 - 30.0 * bands['ph'][100 - p] for p in PERCENTILES}
+    now = sum(p[1] for p in parts) / n
+    ever = sum(p[2] for p in parts) / n
+    names = [a[0] for a in ALARMS.get(target_col, [])]
+    res = {
+        't': t,
+        'bands': bands,
+        'p_now': dict(zip(names, now)),
+        'p_ever': dict(zip(names, ever)),
+        'n': n,
+    }
+    with _lock:
+        _cache[cache_key] = res
+        while len(_cache) > _MAX_CACHE:
+            _cache.popitem(last=False)
+    return res
+
+
+def alarm_probability(res, time_h):
+    """Вероятность каждой тревоги в момент time_h (ближайший узел сетки)"""
+    i = int(np.abs(res['t'] - time_h).argmin())
+    return {name: float(p[i]) for name, p in res['p_now'].items()}
+
+
+if __name__ == "__main__":
+    # Замер: 10^6 траекторий pH × 101 точка, в одном процессе и в пуле
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    mean = np.array([5.98, -0.688])
+    cov = np.array([[0.02 ** 2, 0.0], [0.0, 0.05 ** 2]])
+    cpus = cpu_count()
+    for workers in sorted({1, max(cpus, 2)}):
+        t0 = time.perf_counter()
+        res = forecast_bands(mean, cov, 'ph', n=n, workers=workers, key=('bench', workers))
+        elapsed = time.perf_counter() - t0
+        print(f"📊 {n:,} траекторий × {len(T_GRID)} точек, процессов {workers} (ядер {cpus}): "
+              f"{elapsed:.2f} с ({n / elapsed:,.0f} траекторий/с)")
+    t0 = time.perf_counter()
+    forecast_bands(mean, cov, 'ph', n=n, workers=1, key=('bench', 1))
+    print(f"   - повтор из кэша: {(time.perf_counter() - t0) * 1e3:.2f} мс")
+    t0 = time.perf_counter()
+    forecast_bands(mean, cov, 'ph', n=OVERVIEW_PATHS, key=('bench', 'overview'))
+    print(f"   - первый показ главной страницы ({OVERVIEW_PATHS:,} траекторий, по умолчанию): "
+          f"{(time.perf_counter() - t0) * 1e3:.0f} мс")
+    i = int(np.abs(T_GRID - 8.0).argmin())
+    band = res['bands']['ph']
+    print(f"   - pH(8 ч): P5 {band[5][i]:.3f}, P50 {band[50][i]:.3f}, P95 {band[95][i]:.3f}; "
+          f"P(ПЕРЕКИСАНИЕ) {res['p_now']['ПЕРЕКИСАНИЕ'][i]:.3f}, ОВП P50 {res['bands']['orp_mv'][50][i]:.1f} мВ")
+    # Аналитическая проверка медианы: a + b·ln(9)
+    print(f"   - аналитическая медиана pH(8 ч): {mean[0] + mean[1] * np.log(9.0):.3f}")
@@ -0,0 +1,30 @@
+# workers.py
+# ============================================
+# Общий пул процессов для тяжелых векторных расчетов
+# ============================================
+
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_lock = threading.Lock()
+_pool = None
+
+
+def cpu_count():
+    """Ядра, доступные процессу (с учетом affinity/cgroup)"""
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+
+def get_pool(workers):
+    """Пул на процесс: создается один раз и переиспользуется между перезапусками страниц"""
+    global _pool
+    with _lock:
+        if _pool is None or _pool._max_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver: дочерние процессы не наследуют потоки Streamlit
+            method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(workers, mp_context=mp.get_context(method))
+        return _pool